@@ -0,0 +1,69 @@
+"""Bulk ingestion throughput over a directory, a tar archive and a WARC file
+
+Run from the repository root:
+    python benchmarks/bench_ingest.py [page_count] [workers]
+
+A synthetic dump of Lyrical Nonsense-like pages is written to a temporary
+directory in each input format and ingested with run_ingest.
+"""
+import gzip
+import io
+import os
+import sqlite3
+import sys
+import tarfile
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from bench_line_classifier import synthetic_page
+
+def page_bytes(number):
+    return synthetic_page(number).replace("<html>", f"<html><head><title>Song {number} Lyrics</title></head>").encode("utf-8")
+
+def write_inputs(directory, page_count):
+    pages_dir = os.path.join(directory, "pages")
+    os.makedirs(pages_dir)
+    tar_path = os.path.join(directory, "pages.tar")
+    warc_path = os.path.join(directory, "pages.warc")
+    with tarfile.open(tar_path, "w") as archive, open(warc_path, "wb") as warc, gzip.open(warc_path + ".gz", "wb") as warc_gz:
+        for number in range(page_count):
+            body = page_bytes(number)
+            with open(os.path.join(pages_dir, f"{number}.html"), "wb") as f:
+                f.write(body)
+            member = tarfile.TarInfo(f"pages/{number}.html")
+            member.size = len(body)
+            archive.addfile(member, io.BytesIO(body))
+            block = b"HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n\r\n" + body
+            record = (
+                f"WARC/1.0\r\nWARC-Type: response\r\nWARC-Record-ID: <urn:uuid:{number}>\r\n"
+                f"WARC-Target-URI: https://www.lyrical-nonsense.com/song/{number}/\r\n"
+                f"Content-Type: application/http; msgtype=response\r\nContent-Length: {len(block)}\r\n\r\n"
+            ).encode("ascii") + block + b"\r\n\r\n"
+            warc.write(record)
+            warc_gz.write(record)
+    return {"directory": pages_dir, "tar": tar_path, "warc": warc_path, "warc.gz": warc_path + ".gz"}
+
+def run(page_count=5000, workers=None):
+    workers = workers or os.cpu_count() or 1
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        inputs = write_inputs(directory, page_count)
+        expected = main.extract_lyrics_from_html(page_bytes(0).decode("utf-8"))
+        for label, path in inputs.items():
+            output = os.path.join(directory, f"{label}.sqlite3")
+            start = time.perf_counter()
+            counts = main.run_ingest([path], output, workers=workers, resume=False)
+            elapsed = time.perf_counter() - start
+            with sqlite3.connect(output) as db:
+                lyrics = db.execute("SELECT lyrics FROM pages WHERE name LIKE ? OR url LIKE ?", ("%/0.html", "%/song/0/")).fetchone()[0]
+            assert lyrics == expected, label
+            assert counts["lyrics"] == page_count, counts
+            results[label] = page_count / elapsed * 60
+            print(f"{label:>9}: {results[label]:10.0f} pages/min with {workers} worker(s)")
+    return results
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000, int(sys.argv[2]) if len(sys.argv) > 2 else None)
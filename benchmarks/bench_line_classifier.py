@@ -0,0 +1,86 @@
+"""Line classification speed over a corpus of saved lyrics pages
+
+Run from the repository root with a directory of saved .html pages:
+    python benchmarks/bench_line_classifier.py path/to/pages
+
+Without arguments a synthetic corpus is generated.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from bs4 import BeautifulSoup
+
+REPEATS = 20
+
+def legacy_classify(line):
+    """The keyword scans extract_clean_lyrics used before LyricsLineClassifier"""
+    if not line:
+        return "blank"
+    if any(keyword in line.lower() for keyword in ['lyrics', '歌詞', 'romaji', 'romanized']):
+        return "header"
+    if any(keyword in line.lower() for keyword in ['favorite', 'view favorites', 'copy link', 'artist:', 'tie-in:', 'status', 'comments', 'transliterated by:', 'join our', 'send me a coffee', 'home', 'artists', 'series', 'reviews', 'support ln', 'about', 'join us', 'submit', 'video', 'related']):
+        return "stop"
+    if line[0].isdigit() and '.' in line[:3]:
+        return "numbered"
+    if len(line) < 200 and not line.startswith(('http', 'www', '©', 'copyright')):
+        return "continuation"
+    return "noise"
+
+def synthetic_page(song_number):
+    lines = []
+    for i in range(1, 41):
+        lines.append(f"<p>{i}.</p><p>強くなれる理由を知った {song_number}</p><p>tsuyoku nareru riyuu wo shitta</p>")
+    return (
+        "<html><body><nav>Home Artists Series Reviews</nav><div class=\"lyrics\"><h2>Romaji Lyrics</h2>"
+        + "".join(lines)
+        + "<p>Transliterated by: someone</p></div><footer>About | Support LN | Join us</footer></body></html>"
+    )
+
+def load_corpus(directory=None):
+    """Return the text lines of every page in the corpus"""
+    if directory:
+        pages = []
+        for name in sorted(os.listdir(directory)):
+            if name.endswith((".html", ".htm")):
+                with open(os.path.join(directory, name), encoding="utf-8", errors="replace") as f:
+                    pages.append(f.read())
+    else:
+        pages = [synthetic_page(i) for i in range(200)]
+
+    corpus = []
+    for html in pages:
+        # Classify every line of the page, as the fallback pass can see all of them
+        text = BeautifulSoup(html, main.HTML_PARSER).get_text("\n", strip=True)
+        corpus.append([line.strip() for line in text.split("\n")])
+    return corpus
+
+def time_classifier(classify, corpus):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        for lines in corpus:
+            for line in lines:
+                classify(line)
+    return time.perf_counter() - start
+
+def run(directory=None):
+    corpus = load_corpus(directory)
+    line_count = sum(len(lines) for lines in corpus) * REPEATS
+
+    # Both implementations must agree before their speed means anything
+    for lines in corpus:
+        for line in lines:
+            assert legacy_classify(line) == main.line_classifier.classify(line), line
+
+    legacy = time_classifier(legacy_classify, corpus)
+    compiled = time_classifier(main.line_classifier.classify, corpus)
+    print(f"{len(corpus)} pages, {line_count} line classifications")
+    print(f"keyword scans:        {line_count / legacy:12.0f} lines/s")
+    print(f"LyricsLineClassifier: {line_count / compiled:12.0f} lines/s ({legacy / compiled:.1f}x)")
+    return {"legacy_s": legacy, "compiled_s": compiled, "lines": line_count}
+
+if __name__ == "__main__":
+    run(sys.argv[1] if len(sys.argv) > 1 else None)
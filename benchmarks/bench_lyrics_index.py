@@ -0,0 +1,109 @@
+"""Fuzzy lookup latency of the local lyrics index at 100k+ songs
+
+Run from the repository root:
+    python benchmarks/bench_lyrics_index.py [song_count]
+
+Also counts wrong answers: a fuzzy match can be another song, which is why
+searches only skip the network on exact matches.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+SYLLABLES = [
+    consonant + vowel
+    for consonant in ["", "k", "s", "t", "n", "h", "m", "y", "r", "w", "g", "z", "d", "b", "p", "sh", "ch", "ts"]
+    for vowel in "aiueo"
+] + ["n", "kyo", "ryu", "sho", "jou"]
+
+def make_vocabulary(rng, size=3000):
+    # Romaji-like words, as in anime song titles
+    return ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(size)]
+
+def random_title(rng, vocabulary):
+    return " ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 4))).title()
+
+def build_index(song_count, rng):
+    index = main.LyricsIndex()
+    db = index._get_db()
+    titles = []
+    vocabulary = make_vocabulary(rng)
+    # Bulk insert through sqlite, then let the index load itself like it does at startup
+    with db:
+        for song_id in range(1, song_count + 1):
+            title = random_title(rng, vocabulary)
+            titles.append(title)
+            db.execute(
+                "INSERT INTO songs (id, url, source, title, lyrics, added_at) VALUES (?, ?, ?, ?, ?, 0)",
+                (song_id, f"https://example.com/{song_id}/{title.replace(' ', '-').lower()}/", "bench", title, "1. la la la")
+            )
+            db.execute("INSERT INTO song_keys (song_id, key) VALUES (?, ?)", (song_id, main.normalize_title(title)))
+    return index, titles
+
+def misspell(title, rng):
+    # Drop one character and add a stray space, like a typed variant
+    position = rng.randrange(len(title))
+    return (title[:position] + title[position + 1:]).replace(" ", "  ", 1) + " "
+
+def check_lookups(index, queries, exact):
+    """Return (right, wrong, missed) counts for (query, expected title or None) pairs"""
+    right = wrong = missed = 0
+    for query, expected in queries:
+        song = index.lookup(query, exact=exact)
+        if song is None:
+            missed += 1
+        elif expected is not None and main.normalize_title(song["title"]) == main.normalize_title(expected):
+            right += 1
+        else:
+            wrong += 1  # Another song's lyrics, or any song for a title that was never indexed
+    return right, wrong, missed
+
+def run(song_count=100000):
+    rng = random.Random(7)
+    start = time.perf_counter()
+    index, titles = build_index(song_count, rng)
+    index.lookup("warm up")  # Loads the trigram index and the title reader
+    print(f"{song_count} songs indexed in {time.perf_counter() - start:.1f} s")
+
+    targets = [rng.choice(titles) for _ in range(1000)]
+    queries = [misspell(title, rng) for title in targets]
+    start = time.perf_counter()
+    hits = sum(1 for query in queries if index.lookup(query))
+    elapsed = time.perf_counter() - start
+    print(f"fuzzy lookups: {elapsed / len(queries) * 1000:.3f} ms each, {hits}/{len(queries)} matched")
+
+    # The title reader (pykakasi) is part of every lookup; show the index alone too
+    keys = [main.title_keys(query) for query in queries]
+    start = time.perf_counter()
+    for query_keys in keys:
+        index._best_match(query_keys, main.INDEX_MATCH_THRESHOLD)
+    print(f"trigram matching only: {(time.perf_counter() - start) / len(queries) * 1000:.3f} ms each")
+
+    # A hit is only useful if it is the right song: count wrong answers, not just answers
+    indexed = {main.normalize_title(title) for title in titles}
+    vocabulary = make_vocabulary(random.Random(11))
+    unindexed = []
+    while len(unindexed) < 300:
+        title = random_title(rng, vocabulary)
+        if main.normalize_title(title) not in indexed:
+            unindexed.append(title)
+    exact = check_lookups(index, [(title.upper() + " ", title) for title in targets], exact=True)
+    fuzzy = check_lookups(index, list(zip(queries, targets)), exact=False)
+    fuzzy_unindexed = check_lookups(index, [(title, None) for title in unindexed], exact=False)
+    exact_unindexed = check_lookups(index, [(title, None) for title in unindexed], exact=True)
+    print(f"exact lookups of indexed titles: {exact[0]} right, {exact[1]} wrong, {exact[2]} missed")
+    print(f"fuzzy lookups of misspelled titles: {fuzzy[0]} right, {fuzzy[1]} wrong, {fuzzy[2]} missed")
+    print(f"titles never indexed: {fuzzy_unindexed[1]}/{len(unindexed)} fuzzy and {exact_unindexed[1]}/{len(unindexed)} exact lookups returned a song")
+
+    # Searches trust only exact matches (lookup_local_lyrics); those must never be wrong
+    assert exact == (len(targets), 0, 0), f"exact lookups: {exact}"
+    assert exact_unindexed[1] == 0, f"{exact_unindexed[1]} never-indexed titles got an exact match"
+    return {"lookup_ms": elapsed / len(queries) * 1000, "hits": hits, "fuzzy_wrong": fuzzy[1], "fuzzy_unindexed_wrong": fuzzy_unindexed[1]}
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
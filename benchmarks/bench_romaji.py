@@ -0,0 +1,98 @@
+"""Romaji conversion throughput for 1, 100 and 10k songs
+
+Run from the repository root:
+    python benchmarks/bench_romaji.py
+
+The baseline column is the pre-cache convert_to_romaji, which built a new
+kakasi object for every call. pykakasi keeps its dictionary loaded after the
+first call, so the baseline pays the load once too; the difference is the
+per-call setup and the missing line cache.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+
+# A typical anime OP: a few verses and a repeated chorus
+SAMPLE_SONG = "\n".join([
+    "強くなれる理由を知った",
+    "僕を連れて進め",
+    "泥だらけの走馬灯に酔う",
+    "こわばる心",
+    "震える手は掴みたいものがある",
+    "それだけさ",
+    "夜の匂いに空睨んでも",
+    "変わっていけるのは自分自身だけ",
+    "それだけさ",
+    "強くなれる理由を知った",
+    "僕を連れて進め",
+] * 3)
+
+SONG_COUNTS = (1, 100, 10000)
+BASELINE_MAX_SONGS = 500  # The baseline is timed on at most this many songs and reported as a rate
+
+def legacy_convert(text):
+    """convert_to_romaji as it was before the shared converter"""
+    from pykakasi import kakasi
+    kakasi_obj = kakasi()
+    kakasi_obj.setMode("J", "a")
+    kakasi_obj.setMode("K", "a")
+    kakasi_obj.setMode("H", "a")
+    return kakasi_obj.getConverter().do(text)
+
+def bench_baseline(songs):
+    """Convert songs one at a time with a new kakasi object per call"""
+    start = time.perf_counter()
+    for song in songs:
+        legacy_convert(song)
+    return time.perf_counter() - start
+
+def bench_single_calls(songs):
+    """Convert songs one at a time through convert_to_romaji"""
+    start = time.perf_counter()
+    for song in songs:
+        main.convert_to_romaji(song)
+    return time.perf_counter() - start
+
+def bench_batch(songs):
+    """Convert all songs with a single convert_batch_to_romaji call"""
+    start = time.perf_counter()
+    main.convert_batch_to_romaji(songs)
+    return time.perf_counter() - start
+
+def run():
+    # Measure conversion work, not the line cache: memory only, cleared before each run
+    main.romaji_line_cache.db_path = None
+
+    # Dictionary load time is paid once per process
+    start = time.perf_counter()
+    main.get_romaji_converter()
+    load_time = time.perf_counter() - start
+    print(f"Dictionary load: {load_time * 1000:.1f} ms")
+
+    # The baseline must produce the same romaji before its speed means anything
+    assert legacy_convert(SAMPLE_SONG) == main.convert_to_romaji(SAMPLE_SONG)
+
+    results = {}
+    for count in SONG_COUNTS:
+        # Number each song so no two are identical; the shared chorus still repeats
+        songs = [f"{i}\n{SAMPLE_SONG}" for i in range(count)]
+        baseline_songs = songs[:BASELINE_MAX_SONGS]
+        baseline = bench_baseline(baseline_songs)
+        main.romaji_line_cache.clear()
+        single = bench_single_calls(songs)
+        stats = main.romaji_line_cache.stats()
+        main.romaji_line_cache.clear()
+        batch = bench_batch(songs)
+        baseline_rate = len(baseline_songs) / baseline
+        results[count] = {"baseline_songs_per_s": baseline_rate, "single_s": single, "batch_s": batch, "cache": stats}
+        print(f"{count:>6} songs: baseline {baseline_rate:8.1f} songs/s   single {count / single:8.1f} songs/s"
+              f"   batch {count / batch:8.1f} songs/s ({count / batch / baseline_rate:.0f}x baseline)"
+              f"   (line cache hit rate {stats['hit_rate']:.0%})")
+    return results
+
+if __name__ == "__main__":
+    run()
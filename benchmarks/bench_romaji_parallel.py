@@ -0,0 +1,52 @@
+"""Romaji conversion throughput with 1, 2, 4, ... worker processes
+
+Run from the repository root:
+    python benchmarks/bench_romaji_parallel.py [line_count]
+
+Every line is distinct so the line cache cannot help; the speedup shown is
+from the worker pool alone and should approach the number of cores.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from bench_romaji import SAMPLE_SONG
+
+def distinct_lines(count, rng):
+    fragments = sorted(set(SAMPLE_SONG.split("\n")))
+    return [f"{rng.choice(fragments)}{rng.choice(fragments)} {i}" for i in range(count)]
+
+def worker_counts():
+    counts = [1]
+    while counts[-1] * 2 <= (os.cpu_count() or 1):
+        counts.append(counts[-1] * 2)
+    if counts[-1] != (os.cpu_count() or 1):
+        counts.append(os.cpu_count())
+    return counts
+
+def run(line_count=20000):
+    main.romaji_line_cache.db_path = None  # Memory only, cleared before each run
+    lines = distinct_lines(line_count, random.Random(3))
+    songs = ["\n".join(lines[i:i + 40]) for i in range(0, len(lines), 40)]
+
+    main.romaji_line_cache.clear()
+    expected = main.convert_batch_to_romaji(songs)  # Also loads the dictionary in this process
+    results = {}
+    for workers in worker_counts():
+        if workers > 1:
+            main.get_romaji_pool(workers).submit(int).result()  # Start and warm the workers first
+        main.romaji_line_cache.clear()
+        start = time.perf_counter()
+        converted = main.convert_batch_to_romaji(songs, workers=workers)
+        elapsed = time.perf_counter() - start
+        assert converted == expected, workers
+        results[workers] = line_count / elapsed
+        print(f"{workers:>3} worker(s): {results[workers]:10.0f} lines/s ({results[workers] / results[1]:.2f}x)")
+    return results
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,85 @@
+"""Time to first lyric line versus time to full lyrics on a slow connection
+
+Run from the repository root:
+    python benchmarks/bench_streaming.py [seconds_per_line]
+
+A local server sends a Lyrical Nonsense-like page one lyric line at a
+time. The page is read with stream_lyrics_from_lyrical_nonsense and each
+line is romanized as it arrives.
+"""
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from bench_romaji import SAMPLE_SONG
+
+LINE_DELAY = 0.05  # Seconds between lyric lines on the simulated connection
+
+def page_parts():
+    yield b"<html><head><title>Song Lyrics</title></head><body><nav>Home Artists Series</nav><div class=\"lyrics\"><h2>Lyrics</h2>"
+    for number, line in enumerate(SAMPLE_SONG.split("\n"), 1):
+        yield f"<p>{number}.</p><p>{line}</p>".encode("utf-8")
+    yield b"<p>Transliterated by: someone</p></div><footer>About | Support LN</footer></body></html>"
+
+class SlowPageHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for part in page_parts():
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(part), part))
+            self.wfile.flush()
+            time.sleep(LINE_DELAY)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        pass
+
+def run(line_delay=LINE_DELAY):
+    global LINE_DELAY
+    LINE_DELAY = line_delay
+    # In-memory caches, so every run downloads and converts from scratch
+    main.lyrics_cache = main.LyricsCache()
+    main.romaji_line_cache.db_path = None
+    main.romaji_line_cache.clear()
+    main.get_romaji_converter()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowPageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/lyrics/song/"
+    try:
+        start = time.perf_counter()
+        first_line = None
+        lines = []
+        for line, romaji in main.iter_romanized_lines(main.stream_lyrics_from_lyrical_nonsense(url)):
+            if first_line is None:
+                first_line = time.perf_counter() - start
+            lines.append(line)
+        streamed = time.perf_counter() - start
+
+        # The same page fetched and converted in one go, as before streaming
+        main.lyrics_cache = main.LyricsCache()
+        main.romaji_line_cache.clear()
+        start = time.perf_counter()
+        lyrics = main.get_lyrics_from_lyrical_nonsense(url)
+        main.convert_to_romaji(lyrics)
+        blocking = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    assert "\n".join(lines) == lyrics
+    print(f"{len(lines)} lines, {line_delay * 1000:.0f} ms apart on the wire")
+    print(f"streaming: first line after {first_line * 1000:.0f} ms, last after {streamed * 1000:.0f} ms")
+    print(f"blocking:  all lines after {blocking * 1000:.0f} ms")
+    return {"first_line_s": first_line, "streamed_s": streamed, "blocking_s": blocking}
+
+if __name__ == "__main__":
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else LINE_DELAY)
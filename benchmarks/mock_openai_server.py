@@ -0,0 +1,60 @@
+"""Local stand-in for the OpenAI chat completions endpoint
+
+Answers every verification request with a perfect score, so the ChatGPT
+verification pipeline can be exercised without an API key or network:
+
+    python benchmarks/mock_openai_server.py --port 8765
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python main.py
+
+Requests received are counted and printed, which shows how many calls the
+verdict cache and batching saved.
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LINES_MARKER = "Lines:\n"
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    request_count = 0
+    count_lock = threading.Lock()
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        prompt = body["messages"][-1]["content"]
+        items = json.loads(prompt.split(LINES_MARKER, 1)[1])
+        with self.count_lock:
+            MockOpenAIHandler.request_count += 1
+            print(f"request {MockOpenAIHandler.request_count}: {len(items)} lines")
+
+        verdicts = {"lines": [{"id": item["id"], "score": 10, "correction": None, "note": "ok"} for item in items]}
+        reply = json.dumps({
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": json.dumps(verdicts)}}]
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(port=0):
+    """Start the mock server in a background thread and return it (server.server_port has the port)"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), MockOpenAIHandler)
+    print(f"Mock OpenAI API on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
@@ -0,0 +1,301 @@
+"""Offline benchmark suite for the scraping and conversion hot paths
+
+Run from the repository root:
+    python benchmarks/run_benchmarks.py              # run, record, compare with history
+    python benchmarks/run_benchmarks.py --quick      # fewer repeats
+    python benchmarks/run_benchmarks.py --no-record  # run and compare without saving
+    python benchmarks/run_benchmarks.py --record-fixture URL TITLE
+
+Pages come from benchmarks/fixtures (listed in manifest.json) and the web
+search, HTTP and LyricsPy calls are replaced by stubs, so nothing touches
+the network and every run sees the same input. Each run is appended to
+benchmarks/history.jsonl; a timing more than --threshold slower than the
+median of the previous runs is reported as a regression (exit status 1).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+# Memory-only caches, so earlier runs (or the user's own cache) cannot skew the timings
+os.environ["ROMAJI_LYRICS_DISK_CACHE"] = "0"
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import main
+from bs4 import BeautifulSoup
+
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+HISTORY_PATH = os.path.join(BENCH_DIR, "history.jsonl")
+PARSERS = ("html.parser", "lxml", "html5lib")
+REGRESSION_THRESHOLD = 0.25  # Fraction slower than the history median that counts as a regression
+HISTORY_WINDOW = 10  # Previous runs the median is taken over
+
+# The container strategies in order of preference, each on its own
+STRATEGIES = [
+    ("div.lyrics", lambda soup: soup.find("div", class_="lyrics")),
+    ("div#lyrics", lambda soup: soup.find("div", id="lyrics")),
+    ("main", lambda soup: soup.find("main")),
+    ("article", lambda soup: soup.find("article")),
+    ("numbered div", main.find_div_with_numbered_lyrics),
+    ("lyrics pattern div", main.find_div_with_lyrics_patterns),
+]
+
+def load_fixtures():
+    with open(os.path.join(FIXTURES_DIR, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    fixtures = []
+    for name, info in manifest.items():
+        with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+            fixtures.append(dict(info, name=name, body=f.read()))
+    return fixtures
+
+def install_stubs(fixtures):
+    """Replace the network layer with fixture lookups"""
+    pages = {fixture["url"]: fixture["body"] for fixture in fixtures}
+
+    def stub_search(query, num_results=10, **kwargs):
+        for fixture in fixtures:
+            if "lyrical-nonsense.com" in query and f'"{fixture["title"]}"' in query:
+                return iter([fixture["url"]])
+        return iter([])
+
+    def stub_http_get(url, headers=None, timeout=None, max_bytes=None, stop_when=None, cancel_event=None):
+        body = pages.get(url)
+        if body is None:
+            return main.FetchedPage(url, 404, {}, b"")
+        chunks = []
+        truncated = False
+        # Hand the body over in network-sized chunks so early stopping behaves as it does online
+        for start in range(0, len(body), main.HTTP_CHUNK_BYTES):
+            chunk = body[start:start + main.HTTP_CHUNK_BYTES]
+            chunks.append(chunk)
+            if stop_when and stop_when(chunk):
+                truncated = True
+                break
+        return main.FetchedPage(url, 200, {"Content-Type": "text/html; charset=utf-8"}, b"".join(chunks), truncated)
+
+    main.search = stub_search
+    main.http_get = stub_http_get
+    main.lyricspy.search = lambda title: []
+    main.search_limiter = main.RateLimiter(10 ** 9, 1, name="stub search")
+
+def reset_caches():
+    main.lyrics_cache = main.LyricsCache()
+    main.lyrics_index = main.LyricsIndex()
+    main.romaji_line_cache.clear()
+    main.source_stats = main.SourceStats()  # Learned source ordering would change what later repeats do
+
+def measure(func, repeats):
+    """Return the fastest of repeats timings of func() in milliseconds
+
+    The minimum is the least disturbed by other load on the machine, which
+    keeps run-to-run noise below the regression threshold.
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+def bench_parsing(fixtures, repeats):
+    results = {}
+    default_parser = main.HTML_PARSER
+    try:
+        for parser in PARSERS:
+            try:
+                BeautifulSoup("<p></p>", parser)
+            except Exception:
+                continue  # Backend not installed
+            main.HTML_PARSER = parser
+            for fixture in fixtures:
+                html = fixture["body"].decode("utf-8")
+                results[f"extract_lyrics_from_html[{parser}]/{fixture['name']}"] = measure(
+                    lambda: main.extract_lyrics_from_html(html), repeats)
+
+                def fetch():
+                    main.lyrics_cache = main.LyricsCache()
+                    main.get_lyrics_from_lyrical_nonsense(fixture["url"])
+                results[f"get_lyrics_from_lyrical_nonsense[{parser}]/{fixture['name']}"] = measure(fetch, repeats)
+    finally:
+        main.HTML_PARSER = default_parser
+    return results
+
+def bench_strategies(fixtures, repeats):
+    results = {}
+    for fixture in fixtures:
+        soup = BeautifulSoup(fixture["body"], main.HTML_PARSER)
+        for label, strategy in STRATEGIES:
+            results[f"strategy[{label}]/{fixture['name']}"] = measure(lambda: strategy(soup), repeats)
+        results[f"select_lyrics_container/{fixture['name']}"] = measure(lambda: main.select_lyrics_container(soup), repeats)
+    return results
+
+def bench_extract_clean(fixtures, repeats):
+    results = {}
+    for fixture in fixtures:
+        container = main.select_lyrics_container(BeautifulSoup(fixture["body"], main.HTML_PARSER))
+        results[f"extract_clean_lyrics/{fixture['name']}"] = measure(lambda: main.extract_clean_lyrics(container), repeats)
+    return results
+
+# Run in a fresh interpreter: pykakasi keeps its dictionary loaded for the life of a process
+COLD_ROMAJI_SCRIPT = """
+import sys, time
+sys.path.insert(0, sys.argv[1])
+import main
+lyrics = sys.stdin.read()
+start = time.perf_counter()
+main.convert_to_romaji(lyrics)
+print((time.perf_counter() - start) * 1000)
+"""
+
+def cold_romaji_ms(lyrics):
+    """First conversion in a new process (pykakasi import, dictionary load, every line) in milliseconds"""
+    completed = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", COLD_ROMAJI_SCRIPT, os.path.dirname(BENCH_DIR)],
+        input=lyrics, capture_output=True, text=True, encoding="utf-8", check=True,
+    )
+    return float(completed.stdout.strip().splitlines()[-1])
+
+def bench_romaji(fixtures, repeats):
+    lyrics = main.extract_lyrics_from_html(fixtures[0]["body"].decode("utf-8"))
+
+    def converter_rebuild():
+        # A new kakasi object in this process; the dictionary stays loaded, so this is not a cold start
+        main._romaji_converter = None
+        main.romaji_line_cache.clear()
+        main.convert_to_romaji(lyrics)
+
+    def warm_converter():
+        main.romaji_line_cache.clear()
+        main.convert_to_romaji(lyrics)
+
+    results = {"convert_to_romaji/cold process": min(cold_romaji_ms(lyrics) for _ in range(max(1, repeats // 5)))}
+    results["convert_to_romaji/converter rebuild"] = measure(converter_rebuild, repeats)
+    results["convert_to_romaji/warm converter"] = measure(warm_converter, repeats)
+    main.convert_to_romaji(lyrics)
+    results["convert_to_romaji/warm line cache"] = measure(lambda: main.convert_to_romaji(lyrics), repeats)
+    return results
+
+def bench_end_to_end(fixtures, repeats):
+    # The flow behind the GUI's Search button: every source, then romaji
+    results = {}
+    for fixture in fixtures:
+        def search():
+            reset_caches()
+            record = main.resolve_title(fixture["title"])
+            assert record["lyrics"], f"no lyrics for {fixture['title']}"
+        results[f"resolve_title/{fixture['name']}"] = measure(search, repeats)
+    return results
+
+def check_fixtures(fixtures):
+    # A fixture that no longer exercises its strategy would time the wrong code
+    for fixture in fixtures:
+        soup = BeautifulSoup(fixture["body"], main.HTML_PARSER)
+        for label, strategy in STRATEGIES:
+            if strategy(soup) is not None:
+                if label != fixture["strategy"]:
+                    raise SystemExit(f"{fixture['name']}: expected strategy {fixture['strategy']}, got {label}")
+                break
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def load_history():
+    if not os.path.exists(HISTORY_PATH):
+        return []
+    runs = []
+    with open(HISTORY_PATH, encoding="utf-8") as f:
+        for line in f:
+            try:
+                runs.append(json.loads(line))
+            except ValueError:
+                continue
+    return runs
+
+def find_regressions(results, history, threshold):
+    regressions = []
+    previous = history[-HISTORY_WINDOW:]
+    for name, value in results.items():
+        past = [run["results"][name] for run in previous if name in run.get("results", {})]
+        if not past:
+            continue
+        baseline = statistics.median(past)
+        if baseline > 0 and value > baseline * (1 + threshold):
+            regressions.append((name, baseline, value))
+    return regressions
+
+def record_fixture(url, title):
+    """Download a page into the fixtures directory and add it to the manifest"""
+    response = main.http_get(url)
+    response.raise_for_status()
+    name = url.rstrip("/").rsplit("/", 1)[-1] + ".html"
+    with open(os.path.join(FIXTURES_DIR, name), "wb") as f:
+        f.write(response.content)
+    soup = BeautifulSoup(response.content, main.HTML_PARSER)
+    strategy = next((label for label, find in STRATEGIES if find(soup) is not None), None)
+    manifest_path = os.path.join(FIXTURES_DIR, "manifest.json")
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest[name] = {"title": title, "url": url, "strategy": strategy}
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    print(f"Recorded {name} ({len(response.content)} bytes, strategy: {strategy})")
+
+def run(repeats=20, record=True, threshold=REGRESSION_THRESHOLD):
+    fixtures = load_fixtures()
+    check_fixtures(fixtures)
+    install_stubs(fixtures)
+    reset_caches()
+    main.get_romaji_converter()
+
+    results = {}
+    for bench in (bench_parsing, bench_strategies, bench_extract_clean, bench_romaji, bench_end_to_end):
+        results.update(bench(fixtures, repeats))
+
+    width = max(len(name) for name in results)
+    for name, value in results.items():
+        print(f"{name:<{width}}  {value:9.3f} ms")
+
+    history = load_history()
+    regressions = find_regressions(results, history, threshold)
+    if history:
+        print(f"\nCompared with the median of the last {min(len(history), HISTORY_WINDOW)} run(s):")
+        for name, baseline, value in regressions:
+            print(f"REGRESSION {name}: {baseline:.3f} ms -> {value:.3f} ms (+{(value / baseline - 1) * 100:.0f}%)")
+        if not regressions:
+            print(f"no timing more than {threshold:.0%} slower")
+
+    if record:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "repeats": repeats,
+            "results": results,
+        }
+        with open(HISTORY_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+    return results, regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="5 repeats instead of 20")
+    parser.add_argument("--no-record", action="store_true", help="Do not append this run to the history")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Slowdown that counts as a regression (default: 0.25)")
+    parser.add_argument("--record-fixture", nargs=2, metavar=("URL", "TITLE"), help="Save a live page as a new fixture and exit")
+    args = parser.parse_args()
+    if args.record_fixture:
+        record_fixture(*args.record_fixture)
+        sys.exit(0)
+    _, regressions = run(repeats=5 if args.quick else 20, record=not args.no_record, threshold=args.threshold)
+    sys.exit(1 if regressions else 0)
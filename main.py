@@ -1,369 +1,3851 @@
-from googlesearch import search
-import requests
-from bs4 import BeautifulSoup
-import lyricspy
-from pykakasi import kakasi
-import tkinter as tk
-from tkinter import ttk
 import threading
-import openai
 import os
 import time
-from datetime import datetime, timedelta
 import sys # Added for sys.modules
+import argparse
+import json
+import sqlite3
+import unicodedata
+from collections import OrderedDict, deque
+from queue import Empty, Queue
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeoutError
+import codecs
+import hashlib
+import math
+import re
+import importlib
+import importlib.util
+from html import unescape
+from html.parser import HTMLParser
+import random
+import socket
+import gzip
+import mmap
+import zlib
+from urllib.parse import urlsplit
 
-# Add these global variables at the top after imports
-last_api_call = None
-api_call_count = 0
+class LazyModule:
+    """Stand-in for a module that is only imported when one of its attributes is first used
+
+    requests, BeautifulSoup, LyricsPy and aiohttp together take longer to
+    import than the rest of the program, and the window does not need any
+    of them before the first search.
+    """
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def load(self):
+        """Import the module now (if it is not already) and return it"""
+        if self._module is None:
+            self.__dict__["_module"] = importlib.import_module(self._name)
+        return self._module
+
+    def available(self):
+        """True if the module is installed, without importing it"""
+        return self._module is not None or importlib.util.find_spec(self._name) is not None
+
+    def __getattr__(self, attribute):
+        return getattr(self.load(), attribute)
+
+requests = LazyModule("requests")
+bs4 = LazyModule("bs4")
+lyricspy = LazyModule("lyricspy")
+asyncio = LazyModule("asyncio")  # Only the async API and RateLimiter.acquire_async use the event loop
+aiohttp = LazyModule("aiohttp")  # Only the async API needs aiohttp; the GUI and CLI work without it
+
+# Loaded by warm_up() in the background once the window is up, so the first search does not wait for them
+WARM_UP_MODULES = ("requests", "bs4", "googlesearch", "lyricspy", "pykakasi")
+WARM_UP_DELAY_MS = 200  # After the window is first drawn
+WARM_UP_ENABLED = os.environ.get("ROMAJI_LYRICS_WARM_UP", "1") != "0"
+STARTUP_REPORT_TOP = 15  # Imports listed by the startup-report command
+
+# Local HTTP/JSON service (python main.py serve)
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8780
+SERVICE_MAX_CONCURRENCY = 16  # Requests worked on at once; the rest wait briefly, then get 503
+SERVICE_QUEUE_TIMEOUT = 1.0  # Seconds a request may wait for a free slot
+SERVICE_TIMEOUT = 30  # Seconds before a request is answered with 504 (searches are cancelled)
+SERVICE_MAX_BODY_BYTES = 5 * 1024 * 1024
+
+# OpenAI API quota for ChatGPT verification
 MAX_API_CALLS_PER_HOUR = 50  # Adjust as needed
 API_COOLDOWN_SECONDS = 2  # Minimum time between calls
+API_QUEUE_TIMEOUT = 120  # Seconds a verification request may wait for its turn
+
+# googlesearch quota shared by every find_*/search_* function
+SEARCH_MAX_CALLS_PER_MINUTE = 30
+SEARCH_COOLDOWN_SECONDS = 0.5
+SEARCH_QUEUE_TIMEOUT = 60  # Seconds a query may wait for its turn before it is skipped
+
+# The async API runs blocking work (googlesearch, lyricspy, parsing) on a thread pool of its own
+ASYNC_BLOCKING_WORKERS = 8
+
+# ChatGPT verification (point OPENAI_BASE_URL at a local mock server for testing)
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+OPENAI_MODEL = "gpt-3.5-turbo"
+VERIFY_TOKEN_BUDGET = 1500  # Prompt tokens per request; songs are split into line chunks to fit
+VERIFY_MAX_RESPONSE_TOKENS = 2000
+VERIFY_CONCURRENCY = 4  # Verification requests in flight at once
+
+# Shared romaji converter (the first kakasi object loads the dictionary; later ones still cost ~3 ms each to set up)
+_romaji_converter = None
+_romaji_converter_lock = threading.RLock()
+_romaji_pool = None  # Worker processes for large batches, started on first use
+_romaji_pool_workers = 0
+_romaji_pool_users = {}  # pool -> batches mapping on it; a replaced pool is shut down once this drops to 0
+_romaji_pool_lock = threading.Lock()
+_title_kakasi = None  # Separate instance for title readings (kana and romaji in one call)
+_title_kakasi_lock = threading.Lock()
+
+# On-disk caches live here (set ROMAJI_LYRICS_DISK_CACHE=0 to keep everything in memory)
+CACHE_DIR = os.environ.get("ROMAJI_LYRICS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".romaji_lyrics_finder"))
+DISK_CACHE_ENABLED = os.environ.get("ROMAJI_LYRICS_DISK_CACHE", "1") != "0"
+ROMAJI_LINE_CACHE_SIZE = 20000  # Lines kept in memory
+ROMAJI_POOL_MIN_LINES = 500  # Fewer uncached lines than this are converted in-process
+ROMAJI_SHARDS_PER_WORKER = 4  # Shards per worker process, so a slow shard cannot hold up the rest
+SEARCH_CACHE_TTL = 7 * 24 * 3600  # Seconds a resolved search URL stays valid
+SEARCH_MISS_CACHE_TTL = 3600  # Seconds a search that found nothing is remembered
+PAGE_CACHE_FRESH_SECONDS = 24 * 3600  # Cached lyrics are revalidated with the server after this
+PAGE_CACHE_MAX_BYTES = 50 * 1024 * 1024  # Least recently used pages are evicted above this size
+INDEX_MATCH_THRESHOLD = 0.6  # Minimum trigram similarity (Dice) for a fuzzy index match
+
+# Learned source ordering: each source and site query is ranked by expected time to a hit
+SOURCE_LATENCY_EWMA_ALPHA = 0.2  # Weight of the newest latency sample
+SOURCE_DEFAULT_LATENCY = 2.0  # Seconds assumed for a source that has not run yet
+SOURCE_PRIOR_HITS = 1  # Hit rate starts at 1 in 2, so new sources get tried
+SOURCE_PRIOR_ATTEMPTS = 2
+SOURCE_PRUNE_AFTER = 20  # Completed attempts without a single hit before a site query is skipped
+SOURCE_EXPLORE_RATE = 0.05  # Chance that a skipped source is tried anyway, in case it has improved
+
+# Offline mode answers only from the caches and never touches the network
+offline_mode = False
+
+# lxml builds the tree several times faster than the pure-Python parser
+HTML_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+
+# GUI update settings
+UI_DRAIN_INTERVAL_MS = 50  # Updates posted by worker threads are applied by the Tk main loop on this timer
+UI_MAX_EVENTS_PER_DRAIN = 1000  # Leave the rest for the next tick so input stays responsive
+KARAOKE_LINES_PER_MINUTE = 30  # Default karaoke tempo
+
+# Per-stage timings and counters; off unless ROMAJI_LYRICS_METRICS=1, --metrics or the GUI's "Show timings"
+METRICS_ENABLED = os.environ.get("ROMAJI_LYRICS_METRICS", "0") == "1"
+METRICS_BUCKETS = (0.001, 0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # Histogram bounds in seconds
+METRICS_PREFIX = "romaji_lyrics"  # Prometheus metric name prefix
+
+# Shared HTTP client settings
+HTTP_TIMEOUT = 15  # Seconds for connect and for each read
+HTTP_POOL_SIZE = 10  # Keep-alive connections kept per host
+HTTP_MAX_PER_HOST = 4  # Requests allowed in flight to one host at a time
+HTTP_RETRIES = 3  # Extra attempts after a connection error, timeout or retryable status
+HTTP_BACKOFF_SECONDS = 0.5  # Base delay; attempt n waits a random time up to base * 2**n
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+HTTP_MAX_RESPONSE_BYTES = 5 * 1024 * 1024  # Larger bodies are abandoned mid-download
+HTTP_CHUNK_BYTES = 16 * 1024  # Read size; smaller chunks let streaming parsers stop sooner
+
+# urllib3 only decodes brotli when one of these packages is installed
+BROTLI_AVAILABLE = any(importlib.util.find_spec(name) for name in ("brotli", "brotlicffi"))
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate, br' if BROTLI_AVAILABLE else 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1'
+}
+
+_http_session = None
+_http_lock = threading.Lock()
+_async_executor = None
+_async_executor_lock = threading.Lock()
+_host_semaphores = {}
+
+def set_offline_mode(enabled):
+    """Switch cache-only mode on or off"""
+    global offline_mode
+    offline_mode = bool(enabled)
+
+class SearchCancelled(Exception):
+    """Raised inside a search when its CancelToken has been set"""
+
+class _NullSpan:
+    # What Metrics.span returns while metrics are off: entering and leaving it does nothing
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # A cancelled search is not a failure of the stage it was in
+        failed = exc_type is not None and not issubclass(exc_type, SearchCancelled)
+        self.metrics.observe(self.stage, time.perf_counter() - self.start, error=failed)
+        return False
+
+class Metrics:
+    """Latency histograms per pipeline stage plus event counters
+
+    Instrumented code wraps each stage in "with metrics.span(stage):" and
+    calls metrics.increment(name, **labels) for events. While disabled,
+    span() hands back a shared no-op context manager and increment()
+    returns at once, so the instrumentation costs one attribute check.
+    """
+
+    def __init__(self, enabled=False, buckets=METRICS_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+
+    def enable(self, enabled=True):
+        self.enabled = bool(enabled)
+
+    def span(self, stage):
+        """Context manager that records the time spent inside it under stage"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage)
+
+    def observe(self, stage, seconds, error=False):
+        """Record one timing for stage"""
+        if not self.enabled:
+            return
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = self._stages[stage] = {"count": 0, "errors": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(self.buckets)}
+            entry["count"] += 1
+            entry["sum"] += seconds
+            entry["max"] = max(entry["max"], seconds)
+            if error:
+                entry["errors"] += 1
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    entry["buckets"][i] += 1
+                    break
+
+    def increment(self, name, value=1, **labels):
+        """Add value to the counter name with the given labels"""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+    def snapshot(self):
+        """Return the stages and counters as plain, JSON-ready data"""
+        with self._lock:
+            stages = {}
+            for stage, entry in self._stages.items():
+                cumulative = 0
+                buckets = []
+                for bound, count in zip(self.buckets, entry["buckets"]):
+                    cumulative += count
+                    buckets.append([bound, cumulative])
+                stages[stage] = {
+                    "count": entry["count"],
+                    "errors": entry["errors"],
+                    "total_seconds": entry["sum"],
+                    "max_seconds": entry["max"],
+                    "buckets": buckets,
+                }
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+        return {"enabled": self.enabled, "stages": stages, "counters": counters}
+
+metrics = Metrics(enabled=METRICS_ENABLED)
+
+class CancelToken(threading.Event):
+    """An Event that also runs callbacks when it is set
+
+    Code that blocks (a socket read, a child search) registers a callback
+    that interrupts it, so cancelling takes effect at once instead of at the
+    next is_set() check. Works anywhere a plain threading.Event is accepted.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._callbacks = []
+        self._callback_lock = threading.Lock()
+
+    def add_callback(self, callback):
+        """Run callback when the token is set (right away if it already is)"""
+        with self._callback_lock:
+            if not self.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self._callback_lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def set(self):
+        with self._callback_lock:
+            if self.is_set():
+                return
+            super().set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Cancel callback error: {e}")
+
+    def child(self):
+        """Return a new token that is cancelled along with this one (but can also be cancelled alone)"""
+        token = CancelToken()
+        self.add_callback(token.set)
+        return token
+
+def link_cancel(cancel_event, callback):
+    """Register callback on a CancelToken; returns an undo function (a no-op for plain Events and None)"""
+    if isinstance(cancel_event, CancelToken):
+        cancel_event.add_callback(callback)
+        return lambda: cancel_event.remove_callback(callback)
+    return lambda: None
+
+class SearchSession:
+    """One search from click to last line of output, with the token that cancels it
+
+    Creating a session with previous= cancels that one, so its HTTP
+    requests are aborted and its sources stop; callers drop any output
+    still coming from a session that is no longer the latest.
+    """
+
+    def __init__(self, query, previous=None):
+        self.query = query
+        self.token = CancelToken()
+        self.thread = None
+        if previous is not None:
+            previous.cancel()
+
+    def start(self, target, *args):
+        """Run target(session, *args) on a daemon thread"""
+        self.thread = threading.Thread(target=target, args=(self,) + args, daemon=True, name=f"search: {self.query}")
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        self.token.set()
+
+    @property
+    def cancelled(self):
+        return self.token.is_set()
+
+class _FlightCall:
+    __slots__ = ("done", "result", "error", "cancelled")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.cancelled = False
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is running wait and get the same result, or the same
+    exception. Results are shared, not copied, so callers must not modify
+    them. If the leader was cancelled, its result is whatever the cancelled
+    work returned, so waiting callers run the call again themselves.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, cancel_event=None):
+        """Return func(), or the result of the call for key already in flight
+
+        Raises SearchCancelled if cancel_event is set while waiting for
+        another caller's call.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _FlightCall()
+            if leader:
+                return self._lead(key, call, func, cancel_event)
+
+            metrics.increment("coalesced", flight=self.name)
+            # Wake up regularly so a cancelled caller stops waiting promptly
+            while not call.done.wait(0.2):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise SearchCancelled(key)
+            if call.cancelled:
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+    def _lead(self, key, call, func, cancel_event):
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            call.cancelled = cancel_event is not None and cancel_event.is_set()
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self):
+        """Number of keys with a call running"""
+        with self._lock:
+            return len(self._calls)
+
+class AsyncSingleFlight:
+    """asyncio counterpart of SingleFlight
+
+    The call runs as a task of its own, so a caller that is cancelled stops
+    waiting without cancelling the work the other callers share. If the
+    task itself is cancelled, the callers still waiting start it again.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._tasks = {}
+
+    async def do(self, key, coroutine_func):
+        """Return await coroutine_func(), or the result of the call for key already in flight"""
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)  # Tasks belong to one event loop
+        while True:
+            task = self._tasks.get(flight_key)
+            if task is None:
+                task = loop.create_task(coroutine_func())
+                self._tasks[flight_key] = task
+                task.add_done_callback(lambda finished: self._forget(flight_key, finished))
+            else:
+                metrics.increment("coalesced", flight=self.name)
+            try:
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise  # This caller was cancelled; the shared task carries on
+                # The shared task was cancelled: run the call again
+
+    def _forget(self, flight_key, task):
+        if self._tasks.get(flight_key) is task:
+            del self._tasks[flight_key]
+
+    def in_flight(self):
+        """Number of keys with a call running"""
+        return len(self._tasks)
+
+# Concurrent lookups of the same title or page share one search, download and conversion
+search_flight = SingleFlight("search")
+page_flight = SingleFlight("page")
+resolve_flight = SingleFlight("resolve")
+async_search_flight = AsyncSingleFlight("async_search")
+async_page_flight = AsyncSingleFlight("async_page")
+async_resolve_flight = AsyncSingleFlight("async_resolve")
+
+class RateLimitExceeded(Exception):
+    """Raised when a rate-limited call could not get a slot before its deadline"""
+
+class RateLimiter:
+    """Thread-safe, asyncio-aware limiter: a sliding-window quota plus a minimum spacing
+
+    At most max_calls calls are allowed in any period seconds, and calls are
+    at least min_interval seconds apart. Callers that arrive early wait for
+    their turn, in arrival order, instead of being rejected; acquire()
+    only gives up at its timeout or when cancel_event is set.
+    """
+
+    def __init__(self, max_calls, period, min_interval=0.0, name="rate limiter"):
+        self.max_calls = max_calls
+        self.period = period
+        self.min_interval = min_interval
+        self.name = name
+        self._calls = deque()
+        self._last_call = None
+        self._waiters = deque()
+        self._cond = threading.Condition()
+
+    def _expire(self, now):
+        while self._calls and now - self._calls[0] >= self.period:
+            self._calls.popleft()
+
+    def _delay(self, now):
+        # Seconds until the next call may start (0 when it may start now)
+        self._expire(now)
+        delay = 0.0
+        if len(self._calls) >= self.max_calls:
+            delay = self._calls[0] + self.period - now
+        if self._last_call is not None:
+            delay = max(delay, self._last_call + self.min_interval - now)
+        return delay
+
+    def _record(self, now):
+        self._calls.append(now)
+        self._last_call = now
+
+    def acquire(self, timeout=None, cancel_event=None):
+        """Wait for a slot; returns False if the timeout passes or cancel_event is set first"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        ticket = object()
+        with self._cond:
+            self._waiters.append(ticket)
+            try:
+                while True:
+                    if cancel_event is not None and cancel_event.is_set():
+                        return False
+                    now = time.monotonic()
+                    wait_for = None
+                    if self._waiters[0] is ticket:
+                        wait_for = self._delay(now)
+                        if wait_for <= 0:
+                            self._record(now)
+                            return True
+                        # No point waiting for a slot that opens after the deadline
+                        if deadline is not None and now + wait_for > deadline:
+                            return False
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            return False
+                        wait_for = remaining if wait_for is None else min(wait_for, remaining)
+                    if cancel_event is not None:
+                        # Poll so a cancelled caller leaves the queue promptly
+                        wait_for = 0.1 if wait_for is None else min(wait_for, 0.1)
+                    self._cond.wait(wait_for)
+            finally:
+                self._waiters.remove(ticket)
+                self._cond.notify_all()
+
+    async def acquire_async(self, timeout=None):
+        """Coroutine version of acquire() that sleeps on the event loop instead of blocking it"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                # Threads already queued go first
+                delay = self._delay(now) if not self._waiters else 0.05
+                if delay <= 0:
+                    self._record(now)
+                    return True
+            if deadline is not None:
+                if now + delay > deadline:
+                    return False
+            await asyncio.sleep(delay)
+
+    def used(self):
+        """Calls made in the current window"""
+        with self._cond:
+            self._expire(time.monotonic())
+            return len(self._calls)
+
+    def remaining(self):
+        """Calls still allowed in the current window"""
+        return max(0, self.max_calls - self.used())
+
+openai_limiter = RateLimiter(MAX_API_CALLS_PER_HOUR, 3600, API_COOLDOWN_SECONDS, name="OpenAI API")
+search_limiter = RateLimiter(SEARCH_MAX_CALLS_PER_MINUTE, 60, SEARCH_COOLDOWN_SECONDS, name="web search")
+
+def search(query, num_results=10):
+    """googlesearch's search(), imported on first use"""
+    from googlesearch import search as google_search
+    return google_search(query, num_results=num_results)
+
+def rate_limited_search(query, num_results, cancel_event=None, acquired=False):
+    """Run a googlesearch query once the shared search quota allows it
+
+    Pass acquired=True when the caller already holds a search_limiter slot
+    (the async API waits for it with acquire_async).
+    """
+    if not acquired:
+        with metrics.span("search_queue"):
+            acquired = search_limiter.acquire(timeout=SEARCH_QUEUE_TIMEOUT, cancel_event=cancel_event)
+    if not acquired:
+        if cancel_event is not None and cancel_event.is_set():
+            raise SearchCancelled(query)
+        raise RateLimitExceeded(f"No {search_limiter.name} slot for: {query}")
+    metrics.increment("searches")
+    results = search(query, num_results=num_results)
+    if metrics.enabled:
+        results = _timed_results(results, "search")
+    if cancel_event is None:
+        return results
+    return _until_cancelled(results, cancel_event)
+
+def _timed_results(results, stage):
+    # googlesearch does its work lazily, while the results are iterated
+    seconds = 0.0
+    failed = False
+    iterator = iter(results)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                result = next(iterator)
+            except StopIteration:
+                return
+            except Exception:
+                failed = True
+                raise
+            finally:
+                seconds += time.perf_counter() - start
+            yield result
+    finally:
+        metrics.observe(stage, seconds, error=failed)
+
+def _until_cancelled(results, cancel_event):
+    # googlesearch uses its own requests; stop consuming them once cancelled
+    for result in results:
+        if cancel_event.is_set():
+            return
+        yield result
+
+class ResponseTooLarge(Exception):
+    """Raised when a response body exceeds the configured size cap"""
+
+class FetchedPage:
+    """A downloaded HTTP response (truncated is True when the download was stopped early)"""
+
+    def __init__(self, url, status_code, headers, content, truncated=False):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.truncated = truncated
+
+    @property
+    def text(self):
+        # Trust an explicit charset, otherwise assume UTF-8 (what lyrics sites serve)
+        encoding = None
+        content_type = self.headers.get('Content-Type', '')
+        if 'charset=' in content_type:
+            encoding = content_type.split('charset=')[-1].split(';')[0].strip().strip('"\'')
+        try:
+            return self.content.decode(encoding or 'utf-8', errors='replace')
+        except LookupError:
+            return self.content.decode('utf-8', errors='replace')
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error for url: {self.url}")
+
+_http_request_context = threading.local()  # The cancel token of the http_get running on this thread
+
+class _CancellableConnectionMixin:
+    # Lets a CancelToken shut the socket down mid-request: a blocked connect
+    # or read then fails at once instead of running into the timeout
+    def request(self, *args, **kwargs):
+        token = getattr(_http_request_context, "cancel_event", None)
+        if token is not None:
+            _http_request_context.undo.append(link_cancel(token, self._abort_socket))
+        return super().request(*args, **kwargs)
+
+    def connect(self):
+        super().connect()
+        # http.client drops self.sock when the response owns the connection, so keep our own reference
+        self._cancel_sock = self.sock
+
+    def _abort_socket(self):
+        sock = self.sock or getattr(self, "_cancel_sock", None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+_cancellable_adapter_class = None
+
+def get_cancellable_adapter_class():
+    """Return an HTTPAdapter subclass whose connections can be aborted by the CancelToken passed to http_get
+
+    The class derives from requests and urllib3 classes, so it is only
+    built (and they are only imported) when the first session is created.
+    """
+    global _cancellable_adapter_class
+    if _cancellable_adapter_class is None:
+        from requests.adapters import HTTPAdapter
+        from urllib3.connection import HTTPConnection, HTTPSConnection
+        from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+        class CancellableHTTPConnection(_CancellableConnectionMixin, HTTPConnection):
+            pass
+
+        class CancellableHTTPSConnection(_CancellableConnectionMixin, HTTPSConnection):
+            pass
+
+        class CancellableHTTPConnectionPool(HTTPConnectionPool):
+            ConnectionCls = CancellableHTTPConnection
+
+        class CancellableHTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = CancellableHTTPSConnection
+
+        class CancellableHTTPAdapter(HTTPAdapter):
+            def init_poolmanager(self, *args, **kwargs):
+                super().init_poolmanager(*args, **kwargs)
+                self.poolmanager.pool_classes_by_scheme = {
+                    "http": CancellableHTTPConnectionPool,
+                    "https": CancellableHTTPSConnectionPool,
+                }
+
+        _cancellable_adapter_class = CancellableHTTPAdapter
+    return _cancellable_adapter_class
+
+def get_http_session():
+    """Return the shared requests session (pooled keep-alive connections)"""
+    global _http_session
+    if _http_session is None:
+        with _http_lock:
+            if _http_session is None:
+                session = requests.Session()
+                # Retries are handled in http_get so they can use jittered backoff
+                adapter = get_cancellable_adapter_class()(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update(BROWSER_HEADERS)
+                _http_session = session
+    return _http_session
+
+def _host_semaphore(url):
+    host = urlsplit(url).netloc.lower()
+    with _http_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(HTTP_MAX_PER_HOST)
+        return _host_semaphores[host]
+
+def _backoff_delay(attempt, retry_after=None):
+    # "Full jitter": a random delay up to the exponential cap spreads out retries
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), 30.0)
+    return random.uniform(0, HTTP_BACKOFF_SECONDS * (2 ** attempt))
 
-def find_lyrics_urls(song_title):
+def _acquire_or_cancel(semaphore, cancel_event):
+    # Wait for a per-host slot, giving up when the search is cancelled
+    while not semaphore.acquire(timeout=0.1):
+        if cancel_event is not None and cancel_event.is_set():
+            raise SearchCancelled("request cancelled while queued")
+
+def http_get(url, headers=None, timeout=HTTP_TIMEOUT, max_bytes=HTTP_MAX_RESPONSE_BYTES, stop_when=None, cancel_event=None):
+    """GET a URL through the shared session
+
+    Applies the per-host concurrency limit, retries connection errors,
+    timeouts and retryable statuses with jittered backoff, and stops
+    downloading once the body exceeds max_bytes. stop_when, if given, is
+    called with each chunk of a successful response; returning True ends
+    the download there; a body that fails after stop_when has seen part
+    of it is not retried, as stop_when would see the page twice. Setting
+    cancel_event (a CancelToken) aborts the request mid-flight with
+    SearchCancelled. Returns a FetchedPage.
+    """
+    with metrics.span("fetch"):
+        session = get_http_session()
+        semaphore = _host_semaphore(url)
+        streamed = False  # stop_when has been given part of a body
+        for attempt in range(HTTP_RETRIES + 1):
+            if cancel_event is not None and cancel_event.is_set():
+                raise SearchCancelled(url)
+            retry_after = None
+            _acquire_or_cancel(semaphore, cancel_event)
+            _http_request_context.cancel_event = cancel_event
+            _http_request_context.undo = []
+            try:
+                response = session.get(url, headers=headers, timeout=timeout, stream=True)
+                metrics.increment("http_requests", status=response.status_code)
+                try:
+                    if response.status_code in HTTP_RETRY_STATUSES and attempt < HTTP_RETRIES:
+                        retry_after = response.headers.get('Retry-After')
+                    else:
+                        declared = response.headers.get('Content-Length')
+                        if declared and declared.isdigit() and int(declared) > max_bytes:
+                            raise ResponseTooLarge(f"{url} is {declared} bytes (limit {max_bytes})")
+                        chunks = []
+                        size = 0
+                        truncated = False
+                        for chunk in response.iter_content(chunk_size=HTTP_CHUNK_BYTES):
+                            size += len(chunk)
+                            if size > max_bytes:
+                                raise ResponseTooLarge(f"{url} exceeded {max_bytes} bytes")
+                            chunks.append(chunk)
+                            if stop_when and response.status_code == 200:
+                                streamed = True
+                                if stop_when(chunk):
+                                    truncated = True
+                                    break
+                        if cancel_event is not None and cancel_event.is_set():
+                            raise SearchCancelled(url)  # The body may have been cut off by the abort
+                        metrics.increment("http_bytes", size)
+                        return FetchedPage(response.url, response.status_code, response.headers, b"".join(chunks), truncated)
+                finally:
+                    # Fully read responses go back to the pool; abandoned ones drop their connection
+                    response.close()
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise SearchCancelled(url)
+                if attempt >= HTTP_RETRIES or streamed or isinstance(e, requests.exceptions.ChunkedEncodingError):
+                    raise
+            finally:
+                # The connection may go back to the pool; it must not stay linked to this token
+                for undo in _http_request_context.undo:
+                    undo()
+                _http_request_context.cancel_event = None
+                _http_request_context.undo = []
+                semaphore.release()
+            metrics.increment("http_retries")
+            delay = _backoff_delay(attempt, retry_after)
+            if cancel_event is not None:
+                if cancel_event.wait(delay):
+                    raise SearchCancelled(url)
+            else:
+                time.sleep(delay)
+
+class LyricsCache:
+    """Two-tier cache: search query -> URL (with TTL) and URL -> extracted lyrics
+
+    Pages keep their ETag/Last-Modified validators so stale entries can be
+    revalidated with a conditional GET, and the page tier is trimmed to
+    max_bytes by evicting the least recently used entries.
+    """
+
+    def __init__(self, db_path=None, max_bytes=PAGE_CACHE_MAX_BYTES):
+        self.db_path = db_path or ":memory:"
+        self.max_bytes = max_bytes
+        self.search_hits = 0
+        self.search_misses = 0
+        self.page_hits = 0
+        self.page_misses = 0
+        self.page_revalidations = 0
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _get_db(self):
+        # Open lazily so importing the module never touches the disk
+        if self._db is None:
+            try:
+                if self.db_path != ":memory:":
+                    os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+                self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            except Exception as e:
+                print(f"Lyrics cache disabled on disk: {e}")
+                self._db = sqlite3.connect(":memory:", check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS search_results (query TEXT PRIMARY KEY, url TEXT, fetched_at REAL NOT NULL)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, lyrics TEXT NOT NULL, etag TEXT, "
+                "last_modified TEXT, fetched_at REAL NOT NULL, last_access REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def get_search(self, query, allow_stale=False):
+        """Return (found, url) for a cached search; url is None for a remembered miss"""
+        with self._lock:
+            row = self._get_db().execute("SELECT url, fetched_at FROM search_results WHERE query = ?", (query,)).fetchone()
+            if row is not None:
+                url, fetched_at = row
+                ttl = SEARCH_CACHE_TTL if url else SEARCH_MISS_CACHE_TTL
+                if allow_stale or time.time() - fetched_at < ttl:
+                    self.search_hits += 1
+                    return True, url
+            self.search_misses += 1
+            return False, None
+
+    def put_search(self, query, url):
+        with self._lock:
+            db = self._get_db()
+            db.execute("INSERT OR REPLACE INTO search_results (query, url, fetched_at) VALUES (?, ?, ?)", (query, url, time.time()))
+            db.commit()
+
+    def get_page(self, url):
+        """Return the cached page entry as a dict, or None"""
+        with self._lock:
+            row = self._get_db().execute(
+                "SELECT lyrics, etag, last_modified, fetched_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                self.page_misses += 1
+                return None
+            self.page_hits += 1
+            db = self._get_db()
+            db.execute("UPDATE pages SET last_access = ? WHERE url = ?", (time.time(), url))
+            db.commit()
+            lyrics, etag, last_modified, fetched_at = row
+            return {
+                "lyrics": lyrics,
+                "etag": etag,
+                "last_modified": last_modified,
+                "fresh": time.time() - fetched_at < PAGE_CACHE_FRESH_SECONDS,
+            }
+
+    def put_page(self, url, lyrics, etag=None, last_modified=None):
+        now = time.time()
+        size = len(lyrics.encode("utf-8"))
+        with self._lock:
+            db = self._get_db()
+            db.execute(
+                "INSERT OR REPLACE INTO pages (url, lyrics, etag, last_modified, fetched_at, last_access, size) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, lyrics, etag, last_modified, now, now, size)
+            )
+            self._evict(db)
+            db.commit()
+
+    def mark_revalidated(self, url):
+        """Record a 304 Not Modified answer: the cached lyrics are fresh again"""
+        with self._lock:
+            self.page_revalidations += 1
+            db = self._get_db()
+            db.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            db.commit()
+
+    def _evict(self, db):
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, size in db.execute("SELECT url, size FROM pages ORDER BY last_access").fetchall():
+            db.execute("DELETE FROM pages WHERE url = ?", (url,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self):
+        """Return hit/miss counters for reporting"""
+        with self._lock:
+            return {
+                "search_hits": self.search_hits,
+                "search_misses": self.search_misses,
+                "page_hits": self.page_hits,
+                "page_misses": self.page_misses,
+                "page_revalidations": self.page_revalidations,
+            }
+
+lyrics_cache = LyricsCache(
+    db_path=os.path.join(CACHE_DIR, "lyrics_cache.sqlite3") if DISK_CACHE_ENABLED else None
+)
+
+def find_lyrics_urls(song_title, cancel_event=None):
     """Search for lyrics on Lyrical Nonsense website"""
     urls = {}
+    query = f'site:lyrical-nonsense.com "{song_title}"'
+
+    # Repeat lookups are answered from the search cache
+    found, cached_url = lyrics_cache.get_search(query, allow_stale=offline_mode)
+    if found or offline_mode:
+        if cached_url:
+            urls['lyrical_nonsense'] = cached_url
+        return urls
+    
+    # Try lyrical-nonsense.com (main source); concurrent searches for the same title share one query
+    try:
+        url = search_flight.do(normalize_title(song_title) or query, lambda: _search_lyrical_nonsense(query, cancel_event), cancel_event)
+    except SearchCancelled:
+        url = None
+    if url:
+        urls['lyrical_nonsense'] = url
+    
+    return urls
+
+def _search_lyrical_nonsense(query, cancel_event, acquired=False):
+    # The first Lyrical Nonsense result for query (or None), remembered in the search cache
+    found = None
+    try:
+        for url in rate_limited_search(query, num_results=3, cancel_event=cancel_event, acquired=acquired):
+            if "lyrical-nonsense.com" in url:
+                found = url
+                break
+        # A cancelled search saw only part of the results, so it is not cached
+        if not (cancel_event and cancel_event.is_set()):
+            lyrics_cache.put_search(query, found)
+    except SearchCancelled:
+        pass
+    except Exception as e:
+        print(f"Lyrical Nonsense search error: {e}")
+    return found
+
+def get_lyrics_from_lyrical_nonsense(url, cancel_event=None, on_line=None):
+    """Extract lyrics from Lyrical Nonsense website
+
+    on_line, if given, is called with each lyric line as soon as it has
+    been downloaded (pages answered from the cache are not streamed).
+    Concurrent calls for the same URL share one download; only the call
+    that started it gets on_line calls.
+    """
+    cached = lyrics_cache.get_page(url)
+    if cached and (cached["fresh"] or offline_mode):
+        return cached["lyrics"]
+    if offline_mode:
+        return None
+
+    try:
+        return page_flight.do(url, lambda: _download_lyrical_nonsense(url, cached, cancel_event, on_line), cancel_event)
+    except SearchCancelled:
+        return None
+
+def _download_lyrical_nonsense(url, cached, cancel_event, on_line):
+    try:
+        headers = {}
+        # Revalidate stale entries instead of downloading the page again
+        if cached:
+            if cached["etag"]:
+                headers['If-None-Match'] = cached["etag"]
+            if cached["last_modified"]:
+                headers['If-Modified-Since'] = cached["last_modified"]
+        
+        # Stop reading the page as soon as the lyrics container has closed
+        scanner = LyricsContainerScanner(on_line=on_line)
+        response = http_get(url, headers=headers, stop_when=scanner.feed_bytes, cancel_event=cancel_event)
+        if cached and response.status_code == 304:
+            lyrics_cache.mark_revalidated(url)
+            return cached["lyrics"]
+        response.raise_for_status()
+        
+        clean_lyrics = extract_lyrics_from_html(response.text, container_only=scanner.complete)
+        if clean_lyrics:
+            lyrics_cache.put_page(url, clean_lyrics, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return clean_lyrics
+        
+    except SearchCancelled:
+        return None
+    except Exception as e:
+        print(f"Lyrical Nonsense extraction error: {e}")
+        return None
+
+def stream_lyrics_from_lyrical_nonsense(url, cancel_event=None):
+    """Yield a Lyrical Nonsense page's lyric lines while the page downloads
+
+    The generator form of get_lyrics_from_lyrical_nonsense: each line is
+    yielded as soon as the streaming parser has completed it. Lines that
+    only the final extraction finds (a cached page, or lyrics found by the
+    whole-page fallback strategies) are yielded at the end; lines already
+    yielded are never taken back. Feed the result to iter_romanized_lines
+    to get romaji as well.
+    """
+    lines = Queue()
+    finished = object()
+    result = {}
+
+    def fetch():
+        try:
+            result["lyrics"] = get_lyrics_from_lyrical_nonsense(url, cancel_event, on_line=lines.put)
+        finally:
+            lines.put(finished)
+
+    threading.Thread(target=fetch, daemon=True, name="lyrics-stream").start()
+    streamed = []
+    while True:
+        line = lines.get()
+        if line is finished:
+            break
+        streamed.append(line)
+        yield line
+
+    final_lines = result["lyrics"].split("\n") if result.get("lyrics") else []
+    if final_lines[:len(streamed)] == streamed:
+        yield from final_lines[len(streamed):]
+
+class LyricsContainerScanner(HTMLParser):
+    """Incremental scanner that notices when the first <div class="lyrics"> has closed
+
+    Feed it the page as it downloads; feed_bytes returns True once the
+    container is complete, so the rest of the page need not be read. Only
+    div.lyrics ends the scan early because it is the top-priority strategy:
+    no later markup can change which container is chosen.
+
+    With on_line, the container's text is also split into lines the way
+    get_text("\\n", strip=True) does and assembled into lyric lines, and
+    on_line is called with each one as soon as it is complete.
+    """
+
+    SKIPPED_TEXT_TAGS = ("script", "style", "template")  # get_text() leaves their content out
+
+    def __init__(self, on_line=None, classifier=None):
+        super().__init__(convert_charrefs=False)
+        # Tags are ASCII, so decoding as UTF-8 finds them in any ASCII-compatible charset
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._depth = 0
+        self.complete = False
+        self.on_line = on_line
+        self._assembler = NumberedLineAssembler(classifier) if on_line else None
+        self._text = []  # Pieces of the text node being read
+        self._skipped_tag = None
+
+    def feed_bytes(self, chunk):
+        if not self.complete:
+            self.feed(self._decoder.decode(chunk))
+        return self.complete
+
+    def _flush_text(self):
+        # A tag or comment ends the current text node
+        if not self._text:
+            return
+        text = "".join(self._text).strip()
+        self._text = []
+        if text:
+            for line in text.split("\n"):
+                for lyric_line in self._assembler.feed(line):
+                    self.on_line(lyric_line)
+
+    def handle_starttag(self, tag, attrs):
+        if self.complete:
+            return
+        if self._depth and self._assembler:
+            self._flush_text()
+            if tag in self.SKIPPED_TEXT_TAGS:
+                self._skipped_tag = tag
+        if tag != "div":
+            return
+        if self._depth:
+            self._depth += 1
+            return
+        classes = (dict(attrs).get("class") or "").split()
+        if "lyrics" in classes:
+            self._depth = 1
+
+    def handle_endtag(self, tag):
+        if self.complete or not self._depth:
+            return
+        if self._assembler:
+            self._flush_text()
+            if tag == self._skipped_tag:
+                self._skipped_tag = None
+        if tag == "div":
+            self._depth -= 1
+            if self._depth == 0:
+                self.complete = True
+                if self._assembler:
+                    for lyric_line in self._assembler.close():
+                        self.on_line(lyric_line)
+
+    def handle_comment(self, data):
+        if self._depth and self._assembler and not self.complete:
+            self._flush_text()
+
+    def handle_data(self, data):
+        if self._depth and self._assembler and not self.complete and not self._skipped_tag:
+            self._text.append(data)
+
+    def handle_entityref(self, name):
+        self.handle_data(unescape(f"&{name};"))
+
+    def handle_charref(self, name):
+        self.handle_data(unescape(f"&#{name};"))
+
+def extract_lyrics_from_html(html, container_only=False):
+    """Extract clean lyrics from a Lyrical Nonsense page's HTML
+
+    With container_only=True (the page was cut off by LyricsContainerScanner,
+    or comes from a bulk ingest) only the div.lyrics subtree is built instead
+    of the whole document; pages without one still get the usual strategies.
+    """
+    if container_only:
+        with metrics.span("parse"):
+            soup = bs4.BeautifulSoup(html, HTML_PARSER, parse_only=bs4.SoupStrainer("div", class_="lyrics"))
+        lyrics_content = soup.find("div", class_="lyrics")
+        if lyrics_content:
+            clean_lyrics = extract_clean_lyrics(lyrics_content)
+            if clean_lyrics:
+                return clean_lyrics
+        # Fall back to the usual strategies on what was downloaded
+
+    with metrics.span("parse"):
+        soup = bs4.BeautifulSoup(html, HTML_PARSER)
     
-    # Try lyrical-nonsense.com (main source)
+    # Look for the specific lyrics content area
+    try:
+        with metrics.span("strategy"):
+            lyrics_content = select_lyrics_container(soup)
+    except Exception:
+        lyrics_content = None
+    
+    if lyrics_content:
+        # Extract only the clean lyrics content
+        clean_lyrics = extract_clean_lyrics(lyrics_content)
+        if clean_lyrics:
+            return clean_lyrics
+    
+    return None
+
+# Text statistics flags gathered per element by compute_text_stats
+HAS_1 = 1  # contains "1."
+HAS_2 = 2  # contains "2."
+HAS_3 = 4  # contains "3."
+HAS_NUMBER = 8  # contains any of "1." .. "10."
+HAS_LYRICS_WORD = 16  # contains "lyrics", "歌詞", "romaji" or "romanized"
+LYRICS_WORDS = ('lyrics', '歌詞', 'romaji', 'romanized')
+NUMBER_MARKERS = tuple(f"{i}." for i in range(1, 11))
+
+def _string_flags(text):
+    flags = 0
+    if "1." in text:
+        flags |= HAS_1
+    if "2." in text:
+        flags |= HAS_2
+    if "3." in text:
+        flags |= HAS_3
+    if flags or any(marker in text for marker in NUMBER_MARKERS):
+        flags |= HAS_NUMBER
+    lowered = text.lower()
+    if any(word in lowered for word in LYRICS_WORDS):
+        flags |= HAS_LYRICS_WORD
+    return flags
+
+def compute_text_stats(soup):
+    """Walk the tree once and compute each element's text length and flags bottom-up
+
+    Returns (tags, lengths, flags): tags in document order and two dicts
+    keyed by id(tag). Calling get_text() on every div re-reads the text of
+    all its descendants, which is quadratic on nested markup; summing the
+    children's totals into their parent keeps this linear.
+    """
+    tags = []
+    lengths = {}
+    flags = {}
+    tag_type = bs4.Tag
+    text_string_types = (bs4.NavigableString, bs4.CData)  # What get_text() counts (not comments or scripts)
+    for node in soup.descendants:
+        if isinstance(node, tag_type):
+            tags.append(node)
+            lengths[id(node)] = 0
+            flags[id(node)] = 0
+        elif type(node) in text_string_types:
+            parent_id = id(node.parent)
+            if parent_id in lengths:
+                lengths[parent_id] += len(node)
+                flags[parent_id] |= _string_flags(node)
+
+    # Children come after their parent in document order, so a reverse pass sees them first
+    for tag in reversed(tags):
+        parent_id = id(tag.parent)
+        if parent_id in lengths:
+            lengths[parent_id] += lengths[id(tag)]
+            flags[parent_id] |= flags[id(tag)]
+    return tags, lengths, flags
+
+def _is_numbered_lyrics_div(tag, lengths, flags):
+    tag_flags = flags[id(tag)]
+    return (tag_flags & (HAS_1 | HAS_2 | HAS_3)) == (HAS_1 | HAS_2 | HAS_3) and 100 < lengths[id(tag)] < 10000
+
+def _is_lyrics_pattern_div(tag, flags):
+    tag_flags = flags[id(tag)]
+    return bool(tag_flags & HAS_LYRICS_WORD) and bool(tag_flags & HAS_NUMBER)
+
+def select_lyrics_container(soup):
+    """Pick the lyrics container in one pass over the tree
+
+    Applies the same strategies, in the same order of preference, as the
+    individual finders: div.lyrics, div#lyrics, main/article, a div with
+    numbered lines, then a div mentioning lyrics with numbered content.
+    """
+    tags, lengths, flags = compute_text_stats(soup)
+    by_class = by_id = main_tag = article_tag = numbered = patterned = None
+    for tag in tags:
+        name = tag.name
+        if name == "div":
+            if by_class is None and "lyrics" in (tag.get("class") or ()):
+                by_class = tag
+            if by_id is None and tag.get("id") == "lyrics":
+                by_id = tag
+            if numbered is None and _is_numbered_lyrics_div(tag, lengths, flags):
+                numbered = tag
+            if patterned is None and _is_lyrics_pattern_div(tag, flags):
+                patterned = tag
+        elif name == "main" and main_tag is None:
+            main_tag = tag
+        elif name == "article" and article_tag is None:
+            article_tag = tag
+
+    for candidate in (by_class, by_id, main_tag, article_tag, numbered, patterned):
+        if candidate is not None:
+            return candidate
+    return None
+
+def find_div_with_numbered_lyrics(soup):
+    """Find div containing numbered lyrics lines"""
+    tags, lengths, flags = compute_text_stats(soup)
+    for tag in tags:
+        # Numbered lyrics, but not too long (avoid getting the whole page)
+        if tag.name == "div" and _is_numbered_lyrics_div(tag, lengths, flags):
+            return tag
+    return None
+
+def find_div_with_lyrics_patterns(soup):
+    """Find div with lyrics-like patterns"""
+    tags, lengths, flags = compute_text_stats(soup)
+    for tag in tags:
+        # Lyrics indicators plus numbered content
+        if tag.name == "div" and _is_lyrics_pattern_div(tag, flags):
+            return tag
+    return None
+
+# Line classification for extract_clean_lyrics
+STOP_KEYWORDS = (
+    'favorite', 'view favorites', 'copy link', 'artist:', 'tie-in:', 'status', 'comments',
+    'transliterated by:', 'join our', 'send me a coffee', 'home', 'artists', 'series', 'reviews',
+    'support ln', 'about', 'join us', 'submit', 'video', 'related'
+)
+# The fallback pass filters continuation lines with a shorter list
+FALLBACK_STOP_KEYWORDS = STOP_KEYWORDS[:-3]
+NON_LYRIC_PREFIXES = ('http', 'www', '©', 'copyright')
+MAX_LYRIC_LINE_LENGTH = 200
+
+class LyricsLineClassifier:
+    """Label lyric page lines with keyword regexes compiled once
+
+    classify() applies the rules of the main pass of extract_clean_lyrics
+    and classify_fallback() those of the fallback pass. Each line is
+    lowercased once and tested against one alternation per keyword list,
+    instead of one substring scan per keyword.
+    """
+
+    BLANK = "blank"
+    HEADER = "header"  # "Lyrics"/"歌詞" headings; skipped
+    STOP = "stop"  # Navigation or page furniture; lyrics are over
+    NUMBERED = "numbered"  # "1." .. "99." starts a new lyric line
+    CONTINUATION = "continuation"  # Text belonging to the current numbered line
+    NOISE = "noise"  # Too long or a link; ignored
+
+    def __init__(self, header_keywords=LYRICS_WORDS, stop_keywords=STOP_KEYWORDS, fallback_stop_keywords=FALLBACK_STOP_KEYWORDS):
+        self._header_re = self._compile(header_keywords)
+        self._stop_re = self._compile(stop_keywords)
+        self._fallback_stop_re = self._compile(fallback_stop_keywords)
+
+    @staticmethod
+    def _compile(keywords):
+        return re.compile("|".join(re.escape(keyword) for keyword in keywords))
+
+    @staticmethod
+    def is_numbered(line):
+        return bool(line) and line[0].isdigit() and '.' in line[:3]
+
+    def classify(self, line):
+        """Label a stripped line using the main-pass rules"""
+        if not line:
+            return self.BLANK
+        lowered = line.lower()
+        if self._header_re.search(lowered):
+            return self.HEADER
+        if self._stop_re.search(lowered):
+            return self.STOP
+        if self.is_numbered(line):
+            return self.NUMBERED
+        if len(line) < MAX_LYRIC_LINE_LENGTH and not line.startswith(NON_LYRIC_PREFIXES):
+            return self.CONTINUATION
+        return self.NOISE
+
+    def classify_fallback(self, line):
+        """Label a stripped line using the fallback-pass rules (no headers, no stopping)"""
+        if self.is_numbered(line):
+            return self.NUMBERED
+        if len(line) < MAX_LYRIC_LINE_LENGTH and not self._fallback_stop_re.search(line.lower()):
+            return self.CONTINUATION
+        return self.NOISE
+
+    def classify_lines(self, lines):
+        """Yield (line, label) for each line using the main-pass rules"""
+        for line in lines:
+            line = line.strip()
+            yield line, self.classify(line)
+
+line_classifier = LyricsLineClassifier()
+
+class NumberedLineAssembler:
+    """Join numbered lyric lines with their continuation lines as text lines arrive
+
+    feed() takes one text line at a time and returns the lyric lines that
+    are complete (a lyric line is complete when the next number starts);
+    close() returns the rest. Lines keep being buffered after the main pass
+    stops, because close() falls back to a second pass over all of them
+    when the main pass found nothing.
+    """
+
+    def __init__(self, classifier=None):
+        self.classifier = classifier or line_classifier
+        self.stopped = False  # The main pass hit navigation or other page furniture
+        self.found_any = False
+        self._lines = []
+        self._numbered = ""
+        self._content = []
+
+    def _start(self, line):
+        # Begin a new numbered line, returning the previous one if it had content
+        finished = []
+        if self._numbered and self._content:
+            finished.append(self._numbered + " " + " ".join(self._content))
+        self._numbered = line
+        self._content = []
+        return finished
+
+    def _finish(self):
+        finished = []
+        if self._numbered and self._content:
+            finished.append(self._numbered + " " + " ".join(self._content))
+        elif self._numbered:
+            # If there's a numbered line with no content, add it as is
+            finished.append(self._numbered)
+        self._numbered = ""
+        self._content = []
+        return finished
+
+    def feed(self, line):
+        """Add one text line; returns the lyric lines completed by it"""
+        self._lines.append(line)
+        if self.stopped:
+            return []
+        classifier = self.classifier
+        line = line.strip()
+        label = classifier.classify(line)
+        finished = []
+        # Check if we're leaving lyrics (hit navigation or other content)
+        if label == classifier.STOP:
+            self.stopped = True
+            finished = self._finish()
+        elif label == classifier.NUMBERED:
+            finished = self._start(line)
+        elif label == classifier.CONTINUATION and self._numbered:
+            # This is a continuation of the current numbered line
+            self._content.append(line)
+        if finished:
+            self.found_any = True
+        return finished
+
+    def close(self):
+        """Return the remaining lyric lines once every text line has been fed"""
+        finished = [] if self.stopped else self._finish()
+        if finished or self.found_any:
+            return finished
+
+        # If we didn't find lyrics with the numbered approach, try direct extraction
+        classifier = self.classifier
+        for line in self._lines:
+            line = line.strip()
+            label = classifier.classify_fallback(line)
+            if label == classifier.NUMBERED:
+                finished.extend(self._start(line))
+            elif label == classifier.CONTINUATION and self._numbered:
+                self._content.append(line)
+        finished.extend(self._finish())
+        return finished
+
+def iter_clean_lyrics(lines, classifier=None):
+    """Yield clean lyric lines from text lines, each as soon as it is complete"""
+    assembler = NumberedLineAssembler(classifier)
+    for line in lines:
+        yield from assembler.feed(line)
+    yield from assembler.close()
+
+def extract_clean_lyrics(content_element, classifier=None):
+    """Extract clean lyrics from a content element"""
+    if not content_element:
+        return None
+    
+    # Get all text content
+    with metrics.span("extract"):
+        all_text = content_element.get_text("\n", strip=True)
+        lyrics_lines = list(iter_clean_lyrics(all_text.split('\n'), classifier))
+    
+    # Return clean lyrics
+    if lyrics_lines:
+        return '\n'.join(lyrics_lines)
+    
+    return None
+
+def normalize_japanese_line(line):
+    """Normalize a lyric line for use as a cache key"""
+    # NFKC folds full-width/half-width variants so they share one entry
+    return " ".join(unicodedata.normalize("NFKC", line).split())
+
+class LineCache:
+    """Per-line string cache (romaji, verification verdicts) with LRU eviction and an optional sqlite store"""
+
+    def __init__(self, table, max_entries=ROMAJI_LINE_CACHE_SIZE, db_path=None):
+        self.table = table
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_failed = False
+
+    def _get_db(self):
+        # Open lazily so importing the module never touches the disk
+        if self._db is None and self.db_path and not self._db_failed:
+            try:
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+                self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._db.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+                self._db.commit()
+            except Exception as e:
+                print(f"{self.table} cache disabled on disk: {e}")
+                self._db = None
+                self._db_failed = True
+        return self._db
+
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached value for a key, or None"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+            db = self._get_db()
+            if db is not None:
+                try:
+                    row = db.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+                except sqlite3.Error:
+                    row = None
+                if row is not None:
+                    self._remember(key, row[0])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put_many(self, values):
+        """Store a {key: value} mapping"""
+        with self._lock:
+            for key, value in values.items():
+                self._remember(key, value)
+            db = self._get_db()
+            if db is not None:
+                try:
+                    db.executemany(f"INSERT OR REPLACE INTO {self.table} (key, value) VALUES (?, ?)", values.items())
+                    db.commit()
+                except sqlite3.Error as e:
+                    print(f"{self.table} cache write error: {e}")
+
+    def clear(self):
+        """Drop the in-memory entries and reset the counters (the disk store is kept)"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.disk_hits = 0
+
+    def stats(self):
+        """Return hit/miss counters for reporting"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "entries": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+romaji_line_cache = LineCache(
+    "romaji_lines",
+    db_path=os.path.join(CACHE_DIR, "romaji_lines.sqlite3") if DISK_CACHE_ENABLED else None
+)
+
+def get_romaji_converter():
+    """Return the shared pykakasi converter, loading the dictionary on first use"""
+    global _romaji_converter
+    if _romaji_converter is None:
+        with _romaji_converter_lock:
+            # Another thread may have finished loading while we waited
+            if _romaji_converter is None:
+                from pykakasi import kakasi
+                kakasi_obj = kakasi()
+                kakasi_obj.setMode("J", "a")  # Japanese to ascii (romaji)
+                kakasi_obj.setMode("K", "a")  # Katakana to ascii (romaji)
+                kakasi_obj.setMode("H", "a")  # Hiragana to ascii (romaji)
+                _romaji_converter = kakasi_obj.getConverter()
+    return _romaji_converter
+
+def _warm_romaji_worker():
+    # Load the dictionary once per worker process, before the first shard arrives
+    get_romaji_converter()
+
+def _romanize_shard(keys):
+    conv = get_romaji_converter()
+    return [conv.do(key) for key in keys]
+
+def get_romaji_pool(workers, use=False):
+    """Return the shared romaji worker pool, (re)starting it with the given number of processes
+
+    A pool that is replaced while other batches are still mapping on it is
+    shut down when the last of them calls release_romaji_pool. Pass use=True
+    to count the caller as one of those batches.
+    """
+    global _romaji_pool, _romaji_pool_workers
+    with _romaji_pool_lock:
+        if _romaji_pool is None or _romaji_pool_workers != workers:
+            if _romaji_pool is not None and not _romaji_pool_users.get(_romaji_pool):
+                _romaji_pool.shutdown(wait=False)
+            from concurrent.futures import ProcessPoolExecutor
+            _romaji_pool = ProcessPoolExecutor(max_workers=workers, initializer=_warm_romaji_worker)
+            _romaji_pool_workers = workers
+        if use:
+            _romaji_pool_users[_romaji_pool] = _romaji_pool_users.get(_romaji_pool, 0) + 1
+        return _romaji_pool
+
+def release_romaji_pool(pool):
+    """Finish a get_romaji_pool(use=True) batch, shutting the pool down if it has been replaced meanwhile"""
+    with _romaji_pool_lock:
+        _romaji_pool_users[pool] -= 1
+        if _romaji_pool_users[pool]:
+            return
+        del _romaji_pool_users[pool]
+        if pool is _romaji_pool:
+            return
+    pool.shutdown(wait=False)
+
+def shard_by_length(keys, shard_count):
+    """Split keys into up to shard_count contiguous shards holding about the same number of characters"""
+    total = sum(len(key) for key in keys)
+    target = max(1, math.ceil(total / shard_count))
+    shards = []
+    shard = []
+    size = 0
+    for key in keys:
+        shard.append(key)
+        size += len(key)
+        if size >= target:
+            shards.append(shard)
+            shard = []
+            size = 0
+    if shard:
+        shards.append(shard)
+    return shards
+
+def _convert_missing(keys, workers):
+    if workers and workers > 1 and len(keys) >= ROMAJI_POOL_MIN_LINES:
+        try:
+            shards = shard_by_length(keys, workers * ROMAJI_SHARDS_PER_WORKER)
+            # map() yields shard results in submission order, so lines stay in input order
+            converted = []
+            pool = get_romaji_pool(workers, use=True)
+            try:
+                for shard_result in pool.map(_romanize_shard, shards):
+                    converted.extend(shard_result)
+            finally:
+                release_romaji_pool(pool)
+            return converted
+        except Exception as e:
+            print(f"Romaji worker pool failed, converting in-process: {e}")
+    conv = get_romaji_converter()
+    # The converter keeps internal state while it runs, so only one thread may use it at a time
+    with _romaji_converter_lock:
+        return [conv.do(key) for key in keys]
+
+def romanize_lines(lines, workers=None):
+    """Romanize a list of lines, converting only the ones missing from the line cache
+
+    With workers > 1, large numbers of uncached lines are converted by a pool
+    of worker processes (pykakasi holds the GIL, so threads cannot help).
+    """
+    results = [""] * len(lines)
+    # Group repeated lines so each distinct line is looked up and converted once
+    positions_by_key = {}
+    for i, line in enumerate(lines):
+        key = normalize_japanese_line(line)
+        if key:
+            positions_by_key.setdefault(key, []).append(i)
+
+    missing = {}
+    for key, positions in positions_by_key.items():
+        cached = romaji_line_cache.get(key)
+        if cached is None:
+            missing[key] = positions
+        else:
+            for i in positions:
+                results[i] = cached
+
+    if missing:
+        keys = list(missing)
+        with metrics.span("romaji"):
+            converted = dict(zip(keys, _convert_missing(keys, workers)))
+        metrics.increment("romaji_lines_converted", len(keys))
+        romaji_line_cache.put_many(converted)
+        for key, positions in missing.items():
+            for i in positions:
+                results[i] = converted[key]
+
+    return results
+
+def convert_to_romaji(japanese_text):
+    try:
+        return '\n'.join(romanize_lines(japanese_text.split('\n')))
+    except Exception as e:
+        return f"Failed to convert to romaji: {str(e)}"
+
+def iter_romanized_lines(lines):
+    """Yield (line, romaji) for each line as soon as it is converted
+
+    Works on any iterable, including one that is still being produced, so
+    the first romaji line is available before the last lyric line is.
+    """
+    for line in lines:
+        yield line, romanize_lines([line])[0]
+
+def convert_batch_to_romaji(texts, split_lines=False, workers=None):
+    """Convert many lyric blocks (or single lines) to romaji in one call
+
+    Returns a list with one romaji string per input, in input order. With
+    split_lines=True each block is converted line by line and the results are
+    returned as lists of lines. workers > 1 spreads large batches over that
+    many processes.
+    """
+    texts = list(texts)
+    results = []
+    try:
+        # Romanize every line of the batch together so choruses shared between songs are converted once
+        line_counts = []
+        all_lines = []
+        for text in texts:
+            lines = text.split('\n')
+            line_counts.append(len(lines))
+            all_lines.extend(lines)
+        romaji_lines = romanize_lines(all_lines, workers=workers)
+
+        position = 0
+        for count in line_counts:
+            song_lines = romaji_lines[position:position + count]
+            position += count
+            results.append(song_lines if split_lines else '\n'.join(song_lines))
+    except Exception as e:
+        error = f"Failed to convert to romaji: {str(e)}"
+        results.extend([error] * (len(texts) - len(results)))
+    return results
+
+def normalize_title(title):
+    """Fold a title to lowercase letters/digits/kana/kanji only ("Guren-ge!" -> "gurenge")"""
+    folded = unicodedata.normalize("NFKC", title).casefold()
+    return "".join(char for char in folded if char.isalnum())
+
+def title_keys(title):
+    """Return the lookup keys for a title: the title itself, its kana reading and its romaji"""
+    global _title_kakasi
+    keys = {normalize_title(title)}
+    try:
+        with _title_kakasi_lock:
+            if _title_kakasi is None:
+                from pykakasi import kakasi
+                _title_kakasi = kakasi()
+            parts = _title_kakasi.convert(title)
+        keys.add(normalize_title("".join(part["hira"] for part in parts)))
+        keys.add(normalize_title("".join(part["hepburn"] for part in parts)))
+    except Exception as e:
+        print(f"Title reading error: {e}")
+    keys.discard("")
+    return keys
+
+def url_title_key(url):
+    """Key from a lyrics URL's last path segment (Lyrical Nonsense slugs are romaji titles)"""
+    if not url:
+        return ""
+    segments = [segment for segment in urlsplit(url).path.split("/") if segment]
+    return normalize_title(segments[-1].replace("-", " ")) if segments else ""
+
+def trigrams(key):
+    # Pad so short keys and word edges still produce grams
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class LyricsIndex:
+    """On-disk index of retrieved songs with fuzzy title lookup
+
+    Every song is stored once (by URL) with any number of keys: normalized
+    titles it was searched under, their kana readings and romaji, and the
+    URL slug. Lookups check exact keys first, then score candidates by
+    trigram similarity. Only the rarest trigrams of the query are used to
+    find candidates (any key similar enough must share one of them), which
+    keeps lookups fast with 100k+ songs.
+
+    A fuzzy match is only a guess ("Again" is close to "Against"), so
+    searches skip the network for exact key matches alone.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or ":memory:"
+        self._lock = threading.Lock()
+        self._db = None
+        self._keys = []  # key id -> (song id, key)
+        self._sizes = []  # key id -> number of trigrams in the key
+        self._exact = {}  # key -> key id
+        self._postings = {}  # trigram -> set of key ids
+        self._loaded = False
+
+    def _get_db(self):
+        # Open lazily so importing the module never touches the disk
+        if self._db is None:
+            try:
+                if self.db_path != ":memory:":
+                    os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+                self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            except Exception as e:
+                print(f"Lyrics index disabled on disk: {e}")
+                self._db = sqlite3.connect(":memory:", check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS songs (id INTEGER PRIMARY KEY, url TEXT UNIQUE, source TEXT, "
+                "title TEXT NOT NULL, lyrics TEXT NOT NULL, added_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE TABLE IF NOT EXISTS song_keys (song_id INTEGER NOT NULL, key TEXT NOT NULL, UNIQUE (song_id, key))")
+            self._db.commit()
+        return self._db
+
+    def _index_key(self, song_id, key):
+        if key in self._exact:
+            # The newest song stored under a key gets it
+            self._keys[self._exact[key]] = (song_id, key)
+            return
+        key_id = len(self._keys)
+        grams = trigrams(key)
+        self._keys.append((song_id, key))
+        self._sizes.append(len(grams))
+        self._exact[key] = key_id
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(key_id)
+
+    def _load(self):
+        # Build the in-memory trigram index from the database on first use
+        if not self._loaded:
+            for song_id, key in self._get_db().execute("SELECT song_id, key FROM song_keys"):
+                self._index_key(song_id, key)
+            self._loaded = True
+
+    def add(self, title, lyrics, url=None, source=None):
+        """Store a song (or add title as another name for an already stored URL)
+
+        A key another song was stored under now names this song instead.
+        """
+        keys = title_keys(title)
+        slug = url_title_key(url)
+        if slug:
+            keys.add(slug)
+        with self._lock:
+            self._load()
+            db = self._get_db()
+            row = db.execute("SELECT id FROM songs WHERE url = ?", (url,)).fetchone() if url else None
+            if row:
+                song_id = row[0]
+                db.execute("UPDATE songs SET lyrics = ? WHERE id = ?", (lyrics, song_id))
+            else:
+                song_id = db.execute(
+                    "INSERT INTO songs (url, source, title, lyrics, added_at) VALUES (?, ?, ?, ?, ?)",
+                    (url, source, title, lyrics, time.time())
+                ).lastrowid
+            # A key names one song: the one stored under it last
+            db.executemany("DELETE FROM song_keys WHERE key = ? AND song_id != ?", [(key, song_id) for key in keys])
+            db.executemany("INSERT OR IGNORE INTO song_keys (song_id, key) VALUES (?, ?)", [(song_id, key) for key in keys])
+            db.commit()
+            for key in keys:
+                self._index_key(song_id, key)
+        return song_id
+
+    def _best_match(self, keys, threshold, exact=False):
+        best_song, best_score = None, 0.0
+        for key in keys:
+            key_id = self._exact.get(key)
+            if key_id is not None:
+                return self._keys[key_id][0], 1.0
+        if exact:
+            return None, 0.0
+
+        for key in keys:
+            query_grams = trigrams(key)
+            query_size = len(query_grams)
+            # A key with Dice >= threshold has a similar size and shares at least min_shared grams,
+            # so it must contain one of the query's (query_size - min_shared + 1) rarest grams
+            min_size = threshold * query_size / (2 - threshold)
+            max_size = (2 - threshold) * query_size / threshold
+            min_shared = max(1, math.ceil(threshold * query_size / (2 - threshold)))
+            rarest = sorted(query_grams, key=lambda gram: len(self._postings.get(gram, ())))
+            split = query_size - min_shared + 1
+
+            shared = {}
+            for gram in rarest[:split]:
+                for key_id in self._postings.get(gram, ()):
+                    shared[key_id] = shared.get(key_id, 0) + 1
+            sizes = self._sizes
+            shared = {key_id: count for key_id, count in shared.items() if min_size <= sizes[key_id] <= max_size}
+
+            # The commoner grams only add to candidates already found
+            for gram in rarest[split:]:
+                posting = self._postings.get(gram)
+                if not posting or not shared:
+                    continue
+                if len(posting) < len(shared):
+                    for key_id in posting:
+                        if key_id in shared:
+                            shared[key_id] += 1
+                else:
+                    for key_id in shared:
+                        if key_id in posting:
+                            shared[key_id] += 1
+
+            for key_id, count in shared.items():
+                score = 2 * count / (query_size + sizes[key_id])
+                if score > best_score:
+                    best_song, best_score = self._keys[key_id][0], score
+        if best_score >= threshold:
+            return best_song, best_score
+        return None, best_score
+
+    def lookup(self, title, threshold=INDEX_MATCH_THRESHOLD, exact=False):
+        """Return the stored song best matching title as a dict, or None
+
+        With exact=True only a song stored under one of the title's keys
+        (normalized title, kana or romaji reading) is returned.
+        """
+        keys = title_keys(title)
+        with self._lock:
+            self._load()
+            song_id, score = self._best_match(keys, threshold, exact)
+            if song_id is None:
+                return None
+            row = self._get_db().execute("SELECT title, url, source, lyrics FROM songs WHERE id = ?", (song_id,)).fetchone()
+        if row is None:
+            return None
+        stored_title, url, source, lyrics = row
+        return {"title": stored_title, "url": url, "source": source, "lyrics": lyrics, "score": score}
+
+    def __len__(self):
+        with self._lock:
+            return self._get_db().execute("SELECT COUNT(*) FROM songs").fetchone()[0]
+
+lyrics_index = LyricsIndex(
+    db_path=os.path.join(CACHE_DIR, "lyrics_index.sqlite3") if DISK_CACHE_ENABLED else None
+)
+
+def fallback_lyrics(song_title):
+    try:
+        with metrics.span("lyricspy"):
+            result = lyricspy.search(song_title)
+        if result and len(result) > 0:
+            return result[0].lyrics
+    except Exception as e:
+        print(f"Lyricspy error: {e}")
+        return None
+    return None
+
+class SourceStats:
+    """Attempts, hits and latency of every source and site query, kept across runs
+
+    Ranks sources by expected time to a hit (latency divided by hit rate,
+    with a prior that lets new sources prove themselves) and marks those
+    that have never hit after SOURCE_PRUNE_AFTER completed attempts, so
+    site queries that never find anything stop using up the search quota.
+    Callers record only attempts that completed; an error is not a miss. A
+    skipped source is still tried now and then, in case it has started to
+    answer.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._stats = {}  # name -> {"attempts", "hits", "latency"}
+        self._db = None
+        self._db_failed = False
+        self._loaded = False
+
+    def _get_db(self):
+        # Open lazily so importing the module never touches the disk
+        if self._db is None and self.db_path and not self._db_failed:
+            try:
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+                self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS source_stats (name TEXT PRIMARY KEY, attempts INTEGER NOT NULL, "
+                    "hits INTEGER NOT NULL, latency REAL NOT NULL, updated_at REAL NOT NULL)"
+                )
+                self._db.commit()
+            except Exception as e:
+                print(f"Source stats disabled on disk: {e}")
+                self._db = None
+                self._db_failed = True
+        return self._db
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        db = self._get_db()
+        if db is not None:
+            for name, attempts, hits, latency in db.execute("SELECT name, attempts, hits, latency FROM source_stats"):
+                self._stats[name] = {"attempts": attempts, "hits": hits, "latency": latency}
+
+    def record(self, name, hit, seconds):
+        """Record one finished attempt of a source (cancelled attempts should not be recorded)"""
+        with self._lock:
+            self._load()
+            entry = self._stats.get(name)
+            if entry is None:
+                entry = self._stats[name] = {"attempts": 0, "hits": 0, "latency": seconds}
+            entry["attempts"] += 1
+            entry["hits"] += 1 if hit else 0
+            entry["latency"] += SOURCE_LATENCY_EWMA_ALPHA * (seconds - entry["latency"])
+            db = self._get_db()
+            if db is not None:
+                try:
+                    db.execute(
+                        "INSERT OR REPLACE INTO source_stats (name, attempts, hits, latency, updated_at) VALUES (?, ?, ?, ?, ?)",
+                        (name, entry["attempts"], entry["hits"], entry["latency"], time.time())
+                    )
+                    db.commit()
+                except sqlite3.Error as e:
+                    print(f"Source stats write error: {e}")
+
+    def get(self, name):
+        """Return {"attempts", "hits", "latency"} for name, or None if it has never run"""
+        with self._lock:
+            self._load()
+            entry = self._stats.get(name)
+            return dict(entry) if entry else None
+
+    def expected_seconds(self, name, default_latency=SOURCE_DEFAULT_LATENCY):
+        """Expected time until this source produces a hit: latency / hit rate"""
+        entry = self.get(name)
+        attempts, hits, latency = (entry["attempts"], entry["hits"], entry["latency"]) if entry else (0, 0, default_latency)
+        hit_rate = (hits + SOURCE_PRIOR_HITS) / (attempts + SOURCE_PRIOR_ATTEMPTS)
+        return latency / hit_rate
+
+    def pruned(self, name):
+        """True if the source has never hit in SOURCE_PRUNE_AFTER or more completed attempts"""
+        entry = self.get(name)
+        return entry is not None and entry["attempts"] >= SOURCE_PRUNE_AFTER and entry["hits"] == 0
+
+    def plan(self, items, name=lambda item: item["name"], prune=True):
+        """Return items worth trying, fastest expected hit first (ties keep the given order)"""
+        if prune:
+            items = [item for item in items if not self.pruned(name(item)) or random.random() < SOURCE_EXPLORE_RATE]
+        return sorted(items, key=lambda item: self.expected_seconds(name(item)))
+
+    def snapshot(self):
+        """Return every source's stats with its hit rate and expected time to a hit"""
+        with self._lock:
+            self._load()
+            names = sorted(self._stats)
+        report = {}
+        for name in names:
+            entry = self.get(name)
+            report[name] = dict(
+                entry,
+                hit_rate=entry["hits"] / entry["attempts"] if entry["attempts"] else 0.0,
+                expected_seconds=self.expected_seconds(name),
+                pruned=self.pruned(name),
+            )
+        return report
+
+source_stats = SourceStats(
+    db_path=os.path.join(CACHE_DIR, "source_stats.sqlite3") if DISK_CACHE_ENABLED else None
+)
+
+# The web-search adapters behind the link sources, by group; each is one site: query
+SITE_QUERIES = []
+
+def register_site_query(group, site, query, match=None):
+    """Add a search query to a link source group
+
+    query is a template with {title} for the song title. Only results on
+    one of the match sites count (any result counts when match is None).
+    The query's stats are kept under "group:site".
+    """
+    SITE_QUERIES.append({"group": group, "name": f"{group}:{site}", "query": query, "match": tuple(match) if match else None})
+
+def run_site_query(entry, song_title, num_results, cancel_event=None):
+    """Run one registered query and return the matching result URLs
+
+    Only a search that completed is recorded as a hit or miss; one that
+    failed (rate limit, HTTP error, timeout, no connection) says nothing
+    about the site and must not count towards pruning it.
+    """
+    start = time.perf_counter()
+    urls = []
+    try:
+        for url in rate_limited_search(entry["query"].format(title=song_title), num_results=num_results, cancel_event=cancel_event):
+            if entry["match"] is None or any(site in url for site in entry["match"]):
+                urls.append(url)
+    except RateLimitExceeded:
+        return urls  # Never ran, so says nothing about the site
+    except SearchCancelled:
+        return urls
+    except Exception as e:
+        print(f"{entry['name']} search error: {e}")
+        return urls
+    if not (cancel_event and cancel_event.is_set()):
+        source_stats.record(entry["name"], bool(urls), time.perf_counter() - start)
+    return urls
+
+def planned_site_queries(group):
+    """The group's queries worth running, most promising first"""
+    return source_stats.plan([entry for entry in SITE_QUERIES if entry["group"] == group])
+
+register_site_query("alternative", "jpopasia.com", 'site:jpopasia.com "{title}" lyrics', match=["jpopasia.com"])
+register_site_query("alternative", "musixmatch.com", 'site:musixmatch.com "{title}"', match=["musixmatch.com"])
+register_site_query("alternative", "lyricstranslate.com", 'site:lyricstranslate.com "{title}"', match=["lyricstranslate.com"])
+register_site_query("alternative", "utaten.com", 'site:utaten.com "{title}"', match=["utaten.com"])
+register_site_query("alternative", "petitlyrics.com", 'site:petitlyrics.com "{title}"', match=["petitlyrics.com"])
+
+# Anime-specific lyrics sites
+register_site_query("anime_backup", "anime-lyrics.com", 'site:anime-lyrics.com "{title}"')
+register_site_query("anime_backup", "animeop.info", 'site:animeop.info "{title}"')
+register_site_query("anime_backup", "animeworld.com", 'site:animeworld.com "{title}" lyrics')
+register_site_query("anime_backup", "anime-planet.com", 'site:anime-planet.com "{title}"')
+register_site_query("anime_backup", "myanimelist.net", 'site:myanimelist.net "{title}" lyrics')
+register_site_query("anime_backup", "anidb.net", 'site:anidb.net "{title}"')
+register_site_query("anime_backup", "animenewsnetwork.com", 'site:animenewsnetwork.com "{title}"')
+register_site_query("anime_backup", "crunchyroll.com", 'site:crunchyroll.com "{title}"')
+register_site_query("anime_backup", "funimation.com", 'site:funimation.com "{title}"')
+# Japanese music sites
+register_site_query("anime_backup", "uta-net.com", 'site:uta-net.com "{title}"')
+register_site_query("anime_backup", "joysound.com", 'site:joysound.com "{title}"')
+register_site_query("anime_backup", "dam-ch.com", 'site:dam-ch.com "{title}"')
+register_site_query("anime_backup", "music.jp", 'site:music.jp "{title}"')
+# International anime communities
+register_site_query("anime_backup", "reddit.com/r/anime", 'site:reddit.com/r/anime "{title}" lyrics')
+register_site_query("anime_backup", "reddit.com/r/jpop", 'site:reddit.com/r/jpop "{title}"')
+register_site_query("anime_backup", "reddit.com/r/anime_lyrics", 'site:reddit.com/r/anime_lyrics "{title}"')
+register_site_query("anime_backup", "discord.gg", 'site:discord.gg anime "{title}" lyrics')
+# Anime database sites
+register_site_query("anime_backup", "anilist.co", 'site:anilist.co "{title}"')
+register_site_query("anime_backup", "kitsu.io", 'site:kitsu.io "{title}"')
+register_site_query("anime_backup", "shoboi.jp", 'site:shoboi.jp "{title}"')
+register_site_query("anime_backup", "vgmdb.net", 'site:vgmdb.net "{title}"')
+
+register_site_query("online", "lyrics.com+genius.com+azlyrics.com", '"{title}" lyrics site:lyrics.com OR site:genius.com OR site:azlyrics.com',
+                    match=["lyrics.com", "genius.com", "azlyrics.com"])
+
+def try_alternative_anime_sources(song_title, cancel_event=None):
+    """Try alternative anime lyrics sources that might be more accessible"""
+    for entry in planned_site_queries("alternative"):
+        if cancel_event and cancel_event.is_set():
+            return None
+        urls = run_site_query(entry, song_title, 2, cancel_event)
+        if urls:
+            return f"Found alternative anime lyrics source: {urls[0]}\nTry visiting this URL manually to get lyrics."
+    
+    return None
+
+def search_anime_lyrics_backup(song_title, cancel_event=None):
+    """Backup search specifically for anime song lyrics on multiple platforms"""
+    found_sources = []
+    
+    for entry in planned_site_queries("anime_backup"):
+        # Stop issuing queries once a better source has answered
+        if cancel_event and cancel_event.is_set():
+            return None
+        for url in run_site_query(entry, song_title, 1, cancel_event):
+            # Extract domain name for cleaner display
+            domain = url.split('/')[2] if len(url.split('/')) > 2 else url
+            if domain not in [source.split('/')[2] for source in found_sources]:
+                found_sources.append(url)
+        if len(found_sources) >= 5:  # Limit to 5 results
+            found_sources = found_sources[:5]
+            break
+    
+    if found_sources:
+        result = "🎵 Found anime lyrics backup sources:\n\n"
+        for i, url in enumerate(found_sources, 1):
+            domain = url.split('/')[2] if len(url.split('/')) > 2 else url
+            result += f"{i}. {domain}\n   {url}\n\n"
+        result += "💡 Try visiting these sites manually to find lyrics!"
+        return result
+    
+    return None
+
+def search_lyrics_online(song_title, cancel_event=None):
+    """Additional fallback: search for lyrics on other websites"""
+    for entry in planned_site_queries("online"):
+        if cancel_event and cancel_event.is_set():
+            return None
+        urls = run_site_query(entry, song_title, 3, cancel_event)
+        if urls:
+            return f"Found potential lyrics source: {urls[0]}\nTry visiting this URL manually to get lyrics."
+    return None
+
+class LyricsSource:
+    """A place a search can get lyrics (or links to lyrics) from
+
+    The schedulers call extract(fetch(song_title, cancel_event)): fetch()
+    does the slow part (searches, downloads) and returns whatever it got,
+    or None; extract() turns that into {"kind", "text", "url"}, or None.
+    kind is "lyrics" for sources that return the lyrics themselves and
+    "links" for ones that only point at pages. Settings are the class
+    attributes below; keyword arguments override them per instance.
+    """
+    name = None
+    label = None
+    kind = "lyrics"
+    priority = 0  # Lower runs first, until source_stats has seen the source run
+    deadline = 30  # Seconds from the start of the source's phase
+    offline = False  # True if fetch() can answer from the caches in offline mode
+    streams = False  # True if fetch() takes on_line= and reports lyric lines while downloading
+
+    def __init__(self, **settings):
+        for key, value in settings.items():
+            if not hasattr(type(self), key):
+                raise TypeError(f"Unknown source setting: {key}")
+            setattr(self, key, value)
+
+    def fetch(self, song_title, cancel_event=None):
+        raise NotImplementedError
+
+    def extract(self, raw):
+        return raw
+
+    async def fetch_async(self, song_title, session, cancel_event):
+        """Coroutine version of fetch(); unless overridden, fetch() runs on the async executor"""
+        return await _run_blocking(self.fetch, song_title, cancel_event)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name}>"
+
+class FunctionSource(LyricsSource):
+    """A source whose fetch is func(song_title, cancel_event), returning {"kind", "text", "url"} or None
+
+    With streams=True, func also takes on_line=.
+    """
+
+    def __init__(self, func, **settings):
+        super().__init__(**settings)
+        self.func = func
+
+    def fetch(self, song_title, cancel_event=None, **kwargs):
+        return self.func(song_title, cancel_event, **kwargs)
+
+class LyricalNonsenseSource(LyricsSource):
+    name = "lyrical_nonsense"
+    label = "Lyrical Nonsense"
+    deadline = 30
+    offline = True
+    streams = True
+
+    def fetch(self, song_title, cancel_event=None, on_line=None):
+        url = find_lyrics_urls(song_title, cancel_event).get('lyrical_nonsense')
+        if not url or (cancel_event and cancel_event.is_set()):
+            return None
+        return url, get_lyrics_from_lyrical_nonsense(url, cancel_event, on_line=on_line)
+
+    async def fetch_async(self, song_title, session, cancel_event):
+        url = (await async_find_lyrics_urls(song_title)).get('lyrical_nonsense')
+        if not url:
+            return None
+        return url, await async_get_lyrics_from_lyrical_nonsense(url, session)
+
+    def extract(self, raw):
+        url, lyrics = raw
+        return {"kind": "lyrics", "text": lyrics, "url": url} if lyrics else None
+
+class LyricsPySource(LyricsSource):
+    name = "lyricspy"
+    label = "LyricsPy (likely Japanese)"
+    priority = 1
+    deadline = 20
+
+    def fetch(self, song_title, cancel_event=None):
+        return fallback_lyrics(song_title)
+
+    def extract(self, raw):
+        return {"kind": "lyrics", "text": raw, "url": None} if raw else None
+
+class LinkSource(LyricsSource):
+    """A finder that returns a "visit these URLs" message, such as search_lyrics_online"""
+    kind = "links"
+
+    def __init__(self, finder, **settings):
+        super().__init__(**settings)
+        self.finder = finder
+
+    def fetch(self, song_title, cancel_event=None):
+        return self.finder(song_title, cancel_event)
+
+    def extract(self, raw):
+        return {"kind": "links", "text": raw, "url": None} if raw else None
+
+# Sources in priority order (lower wins) until source_stats has seen them run; after that
+# lyrics sources still come before link sources, each ordered by expected time to a hit.
+# Link sources only run when every lyrics source has missed.
+LYRICS_SOURCES = [
+    LyricalNonsenseSource(),
+    LyricsPySource(),
+    LinkSource(try_alternative_anime_sources, name="alternative", label="Alternative anime lyrics sources", priority=2, deadline=30),
+    LinkSource(search_anime_lyrics_backup, name="anime_backup", label="Anime lyrics backup search", priority=3, deadline=45),
+    LinkSource(search_lyrics_online, name="online", label="Additional online sources", priority=4, deadline=20),
+]
+
+def register_source(source, priority=None):
+    """Add a LyricsSource to LYRICS_SOURCES
+
+    The priority (default: after every existing source) orders the source
+    until its stats take over. Returns the source.
+    """
+    if priority is None:
+        priority = max((existing.priority for existing in LYRICS_SOURCES), default=-1) + 1
+    source.priority = priority
+    LYRICS_SOURCES.append(source)
+    return source
+
+def plan_sources(sources=None):
+    """Order sources for a search
+
+    Lyrics sources stay ahead of link sources; within each kind the source
+    with the shortest expected time to a hit comes first. Sources are not
+    skipped here: whether a source hits depends on the title, and the link
+    sources already skip the site queries that never hit, which is where
+    the search quota goes.
+    """
+    sources = sorted(sources or LYRICS_SOURCES, key=lambda source: source.priority)
+    planned = source_stats.plan(sources, name=lambda source: source.name, prune=False)
+    return sorted(planned, key=lambda source: source.kind != "lyrics")
+
+def _run_source(source, song_title, cancel_event, timings, on_line=None, record=None):
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        if on_line and source.streams:
+            raw = source.fetch(song_title, cancel_event, on_line=lambda line: on_line(source, line))
+        else:
+            raw = source.fetch(song_title, cancel_event)
+        result = source.extract(raw) if raw is not None else None
+        outcome = "found" if result else "empty"
+        return result
+    except SearchCancelled:
+        outcome = "cancelled"
+        return None
+    except Exception as e:
+        print(f"{source.label} error: {e}")
+        return None
+    finally:
+        timings[source.name] = time.perf_counter() - start
+        if cancel_event is not None and cancel_event.is_set() and outcome != "found":
+            outcome = "cancelled"  # Stopped because another source won (or the user cancelled)
+        _report_source(source, outcome, timings[source.name], record)
+
+def _report_source(source, outcome, seconds, record=None):
+    # Stats and metrics for one finished source run, shared by the sync and async schedulers
+    if outcome in ("found", "empty", "timed out"):  # An error or a cancellation says nothing about the source
+        (record or source_stats.record)(source.name, outcome == "found", seconds)
+    metrics.observe(f"source/{source.name}", seconds, error=outcome == "error")
+    metrics.increment("source_results", source=source.name, outcome=outcome)
+
+def _record_once():
+    # A source stats recorder that keeps the first record per source: a source that missed
+    # its deadline was recorded then and may still finish afterwards
+    recorded = set()
+    lock = threading.Lock()
+
+    def record(name, hit, seconds):
+        with lock:
+            if name in recorded:
+                return
+            recorded.add(name)
+        source_stats.record(name, hit, seconds)
+    return record
+
+def _split_phases(sources):
+    # Lyrics sources run first; link sources only if every lyrics source missed
+    lyrics_sources = [source for source in sources if source.kind == "lyrics"]
+    link_sources = [source for source in sources if source.kind != "lyrics"]
+    return lyrics_sources, link_sources
+
+_UNDECIDED = object()
+
+def _decide_phase(phase, outcomes, first_wins):
+    # What a phase returns given the outcomes so far, or _UNDECIDED while a running source could change it.
+    # first_wins: the best source that has finished wins once nothing better is still running, giving
+    # (source, result) or None. Otherwise every source is waited for, giving the (source, result) hits.
+    if first_wins:
+        for source in phase:
+            if source.name not in outcomes:
+                return _UNDECIDED
+            if outcomes[source.name]:
+                return source, outcomes[source.name]
+        return None
+    if any(source.name not in outcomes for source in phase):
+        return _UNDECIDED
+    return [(source, outcomes[source.name]) for source in phase if outcomes[source.name]]
+
+def lookup_local_lyrics(song_title):
+    """Return a search result from the local lyrics index, or None
+
+    Only exact key matches count: a fuzzy match may be a different song, and
+    returning it would skip the search that could tell. When the search then
+    finds the stored page again, remember_lyrics adds the title as another
+    key, so the next lookup under this spelling is exact.
+    """
+    start = time.perf_counter()
+    try:
+        with metrics.span("index_lookup"):
+            song = lyrics_index.lookup(song_title, exact=True)
+    except Exception as e:
+        print(f"Lyrics index error: {e}")
+        return None
+    metrics.increment("source_results", source="local_index", outcome="found" if song else "empty")
+    if not song:
+        return None
+    return {
+        "kind": "lyrics",
+        "text": song["lyrics"],
+        "url": song["url"],
+        "source": "local_index",
+        "label": f"local lyrics index (matched \"{song['title']}\")",
+        "timings": {"local_index": time.perf_counter() - start},
+    }
+
+def remember_lyrics(song_title, result):
+    """Add a lyrics result to the local index so later lookups skip the network"""
+    if result and result["kind"] == "lyrics" and result.get("source") != "local_index":
+        try:
+            lyrics_index.add(song_title, result["text"], url=result["url"], source=result["source"])
+        except Exception as e:
+            print(f"Lyrics index error: {e}")
+
+def _combine_links(hits, timings):
+    # Every link source that answered is listed, in plan order, as the GUI did before the sources ran at once
+    if len(hits) == 1:
+        source, result = hits[0]
+        return dict(result, source=source.name, label=source.label, timings=dict(timings))
+    text = "\n\n".join(f"--- {source.label} ---\n{result['text']}" for source, result in hits)
+    return {"kind": "links", "text": text, "url": None, "source": hits[0][0].name,
+            "label": "Backup sources", "timings": dict(timings)}
+
+def search_all_sources(song_title, sources=None, cancel_event=None, on_status=None, use_index=True, on_line=None):
+    """Run the lyrics sources concurrently and return the best result
+
+    A lyrics result is returned as soon as its source has succeeded and
+    every source ranked above it (see plan_sources) has finished without
+    lyrics (or missed its deadline); the remaining work is then cancelled.
+    Link sources only start once every lyrics source has missed, so their
+    site queries never hold up a lyrics query in search_limiter; they then
+    run together and every one that answers is listed. Deadlines count from
+    the start of the source's phase. Returns a dict with source, label,
+    kind ("lyrics" or "links"), text, url and per-source timings, or None
+    when nothing was found or the search was cancelled. on_line(source,
+    line) receives lyric lines from streaming sources while they download;
+    the returned result may still come from another source.
+    """
+    # Songs fetched before under this title (or its kana or romaji reading) need no network at all
+    if use_index:
+        local = lookup_local_lyrics(song_title)
+        if local:
+            return local
+
+    sources = plan_sources(sources)
+    if offline_mode:
+        sources = [source for source in sources if source.offline]
+    if not sources:
+        return None
+
+    # Set when the search is over (or the caller cancels) so running sources stop early
+    run_cancel = cancel_event.child() if isinstance(cancel_event, CancelToken) else CancelToken()
+    timings = {}
+    outcomes = {}
+    record_once = _record_once()
+
+    def run_phase(phase, first_wins):
+        # Returns the winning result (first_wins) or every (source, result) that found something
+        phase_start = time.monotonic()
+        futures = {executor.submit(_run_source, source, song_title, run_cancel, timings, on_line, record_once): source
+                   for source in phase}
+        all_futures.extend(futures)
+        while True:
+            if cancel_event and cancel_event.is_set():
+                return None
+
+            now = time.monotonic()
+            for future, source in futures.items():
+                if source.name in outcomes:
+                    continue
+                if future.done():
+                    outcomes[source.name] = future.result()
+                    status = "found" if outcomes[source.name] else "nothing found"
+                elif now - phase_start > source.deadline:
+                    outcomes[source.name] = None
+                    status = "timed out"
+                    # Counts as a miss; the source is cancelled before it can report itself
+                    record_once(source.name, False, now - phase_start)
+                else:
+                    continue
+                if on_status:
+                    on_status(source, status)
+
+            decided = _decide_phase(phase, outcomes, first_wins)
+            if decided is not _UNDECIDED:
+                return decided
+
+            pending = [future for future, source in futures.items() if source.name not in outcomes]
+            next_deadline = min(phase_start + futures[future].deadline for future in pending) - now
+            # Wake up regularly so a cancelled search returns promptly
+            wait(pending, timeout=max(0.0, min(next_deadline, 0.2)), return_when=FIRST_COMPLETED)
+
+    lyrics_sources, link_sources = _split_phases(sources)
+    start = time.monotonic()
+    executor = ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix="lyrics-source")
+    all_futures = []
+    try:
+        if lyrics_sources:
+            won = run_phase(lyrics_sources, first_wins=True)
+            if won:
+                source, result = won
+                result = dict(result, source=source.name, label=source.label, timings=dict(timings))
+                remember_lyrics(song_title, result)
+                return result
+        if not link_sources or (cancel_event and cancel_event.is_set()):
+            return None
+        hits = run_phase(link_sources, first_wins=False)
+        return _combine_links(hits, timings) if hits else None
+    finally:
+        metrics.observe("sources", time.monotonic() - start)
+        run_cancel.set()
+        if isinstance(cancel_event, CancelToken):
+            cancel_event.remove_callback(run_cancel.set)
+        for future in all_futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+def create_async_http_session():
+    """Create an aiohttp session with the same headers and per-host limits as the sync client
+
+    Pass one shared session to the async_* functions when running many
+    lookups at once; they create a short-lived session of their own otherwise.
+    """
+    if not aiohttp.available():
+        raise RuntimeError("The async API needs aiohttp (pip install aiohttp)")
+    connector = aiohttp.TCPConnector(limit=HTTP_POOL_SIZE * 10, limit_per_host=HTTP_MAX_PER_HOST)
+    return aiohttp.ClientSession(connector=connector, headers=BROWSER_HEADERS)
+
+async def async_http_get(session, url, headers=None, timeout=HTTP_TIMEOUT, max_bytes=HTTP_MAX_RESPONSE_BYTES, stop_when=None):
+    """Async counterpart of http_get (retries with jittered backoff, a size cap and stop_when)"""
+    client_timeout = aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout)
+    for attempt in range(HTTP_RETRIES + 1):
+        retry_after = None
+        try:
+            async with session.get(url, headers=headers, timeout=client_timeout) as response:
+                if response.status in HTTP_RETRY_STATUSES and attempt < HTTP_RETRIES:
+                    retry_after = response.headers.get('Retry-After')
+                else:
+                    if response.content_length and response.content_length > max_bytes:
+                        raise ResponseTooLarge(f"{url} is {response.content_length} bytes (limit {max_bytes})")
+                    chunks = []
+                    size = 0
+                    truncated = False
+                    async for chunk in response.content.iter_chunked(HTTP_CHUNK_BYTES):
+                        size += len(chunk)
+                        if size > max_bytes:
+                            raise ResponseTooLarge(f"{url} exceeded {max_bytes} bytes")
+                        chunks.append(chunk)
+                        if stop_when and response.status == 200 and stop_when(chunk):
+                            truncated = True
+                            break
+                    return FetchedPage(str(response.url), response.status, response.headers, b"".join(chunks), truncated)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt >= HTTP_RETRIES:
+                raise
+        await asyncio.sleep(_backoff_delay(attempt, retry_after))
+
+def get_async_executor():
+    """Return the thread pool the async API runs blocking calls on, creating it on first use
+
+    It is bounded and separate from the event loop's default executor, so
+    sources waiting in blocking calls cannot take every thread the
+    embedding application's own run_in_executor calls rely on.
+    """
+    global _async_executor
+    if _async_executor is None:
+        with _async_executor_lock:
+            if _async_executor is None:
+                _async_executor = ThreadPoolExecutor(max_workers=ASYNC_BLOCKING_WORKERS, thread_name_prefix="async-blocking")
+    return _async_executor
+
+async def _run_blocking(func, *args):
+    # googlesearch, lyricspy and BeautifulSoup are blocking; keep them off the event loop
+    return await asyncio.get_running_loop().run_in_executor(get_async_executor(), func, *args)
+
+async def async_find_lyrics_urls(song_title):
+    """Async counterpart of find_lyrics_urls
+
+    The search slot is awaited on the event loop (search_limiter.acquire_async);
+    only the query itself takes an executor thread.
+    """
+    query = f'site:lyrical-nonsense.com "{song_title}"'
+    found, cached_url = await _run_blocking(lambda: lyrics_cache.get_search(query, allow_stale=offline_mode))
+    if not found and not offline_mode:
+        cached_url = await async_search_flight.do(normalize_title(song_title) or query, lambda: _async_search_lyrical_nonsense(query))
+    return {'lyrical_nonsense': cached_url} if cached_url else {}
+
+async def _async_search_lyrical_nonsense(query):
+    start = time.perf_counter()
+    acquired = await search_limiter.acquire_async(timeout=SEARCH_QUEUE_TIMEOUT)
+    metrics.observe("search_queue", time.perf_counter() - start)
+    if not acquired:
+        print(f"Lyrical Nonsense search error: No {search_limiter.name} slot for: {query}")
+        return None
+    return await _run_blocking(_search_lyrical_nonsense, query, None, True)
+
+async def async_get_lyrics_from_lyrical_nonsense(url, session=None):
+    """Async counterpart of get_lyrics_from_lyrical_nonsense"""
+    cached = lyrics_cache.get_page(url)
+    if cached and (cached["fresh"] or offline_mode):
+        return cached["lyrics"]
+    if offline_mode:
+        return None
+    return await async_page_flight.do(url, lambda: _async_download_lyrical_nonsense(url, cached, session))
+
+async def _async_download_lyrical_nonsense(url, cached, session):
+    own_session = session is None
+    if own_session:
+        session = create_async_http_session()
+    try:
+        headers = {}
+        # Revalidate stale entries instead of downloading the page again
+        if cached:
+            if cached["etag"]:
+                headers['If-None-Match'] = cached["etag"]
+            if cached["last_modified"]:
+                headers['If-Modified-Since'] = cached["last_modified"]
+
+        # Stop reading the page as soon as the lyrics container has closed
+        scanner = LyricsContainerScanner()
+        response = await async_http_get(session, url, headers=headers, stop_when=scanner.feed_bytes)
+        if cached and response.status_code == 304:
+            lyrics_cache.mark_revalidated(url)
+            return cached["lyrics"]
+        response.raise_for_status()
+
+        clean_lyrics = await _run_blocking(extract_lyrics_from_html, response.text, scanner.complete)
+        if clean_lyrics:
+            lyrics_cache.put_page(url, clean_lyrics, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return clean_lyrics
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"Lyrical Nonsense extraction error: {e}")
+        return None
+    finally:
+        if own_session:
+            await session.close()
+
+async def async_try_alternative_anime_sources(song_title):
+    """Async counterpart of try_alternative_anime_sources"""
+    return await _run_blocking(try_alternative_anime_sources, song_title)
+
+async def async_search_lyrics_online(song_title):
+    """Async counterpart of search_lyrics_online"""
+    return await _run_blocking(search_lyrics_online, song_title)
+
+async def async_search_all_sources(song_title, session=None, sources=None, use_index=True):
+    """Async counterpart of search_all_sources
+
+    Same rules: lyrics sources first, where the best finished source wins
+    once nothing better is still running, then every link source if they
+    all missed. Losing tasks are cancelled.
+    """
+    if use_index:
+        local = await _run_blocking(lookup_local_lyrics, song_title)
+        if local:
+            return local
+
+    sources = plan_sources(sources)
+    if offline_mode:
+        sources = [source for source in sources if source.offline]
+    if not sources:
+        return None
+
+    own_session = session is None
+    if own_session:
+        session = create_async_http_session()
+    # Lets sources running in executor threads stop early
+    run_cancel = CancelToken()
+    timings = {}
+    outcomes = {}
+    record_once = _record_once()
+    all_tasks = []
+
+    async def run(source):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            # Sources without a native fetch_async run fetch() on the async executor
+            raw = await asyncio.wait_for(source.fetch_async(song_title, session, run_cancel), source.deadline)
+            result = source.extract(raw) if raw is not None else None
+            outcome = "found" if result else "empty"
+            return result
+        except asyncio.TimeoutError:
+            outcome = "timed out"
+            return None
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            print(f"{source.label} error: {e}")
+            return None
+        finally:
+            timings[source.name] = time.perf_counter() - start
+            _report_source(source, outcome, timings[source.name], record_once)
+
+    async def run_phase(phase, first_wins):
+        tasks = {asyncio.ensure_future(run(source)): source for source in phase}
+        all_tasks.extend(tasks)
+        while True:
+            for task, source in tasks.items():
+                if task.done() and source.name not in outcomes:
+                    outcomes[source.name] = task.result()
+            decided = _decide_phase(phase, outcomes, first_wins)
+            if decided is not _UNDECIDED:
+                return decided
+            await asyncio.wait([task for task in tasks if not task.done()], return_when=asyncio.FIRST_COMPLETED)
+
+    lyrics_sources, link_sources = _split_phases(sources)
+    start = time.monotonic()
+    try:
+        if lyrics_sources:
+            won = await run_phase(lyrics_sources, first_wins=True)
+            if won:
+                source, result = won
+                result = dict(result, source=source.name, label=source.label, timings=dict(timings))
+                await _run_blocking(remember_lyrics, song_title, result)
+                return result
+        if not link_sources:
+            return None
+        hits = await run_phase(link_sources, first_wins=False)
+        return _combine_links(hits, timings) if hits else None
+    finally:
+        metrics.observe("sources", time.monotonic() - start)
+        run_cancel.set()
+        for task in all_tasks:
+            task.cancel()
+        if own_session:
+            await session.close()
+
+async def async_resolve_title(song_title, session=None):
+    """Async counterpart of resolve_title"""
+    key = normalize_title(song_title) or song_title
+    record = await async_resolve_flight.do(key, lambda: _async_resolve_title(song_title, session))
+    return dict(record, title=song_title)
+
+async def _async_resolve_title(song_title, session):
+    start = time.perf_counter()
+    record = new_title_record(song_title)
+    try:
+        result = await async_search_all_sources(song_title, session=session)
+        record["timings"]["search"] = time.perf_counter() - start
+        if result:
+            record["source"] = result["source"]
+            record["source_url"] = result["url"]
+            record["timings"]["sources"] = result["timings"]
+            if result["kind"] == "lyrics":
+                record["lyrics"] = result["text"]
+                romaji_start = time.perf_counter()
+                record["romaji"] = await _run_blocking(convert_to_romaji, result["text"])
+                record["timings"]["romaji"] = time.perf_counter() - romaji_start
+            else:
+                record["links"] = result["text"]
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        record["error"] = str(e)
+    record["timings"]["total"] = time.perf_counter() - start
+    metrics.observe("resolve", record["timings"]["total"], error=record["error"] is not None)
+    return record
+
+VERIFY_INSTRUCTIONS = """You check romaji transliterations of Japanese song lyrics.
+For every item in the JSON list below, check whether "romaji" accurately represents the pronunciation of "japanese".
+Reply with only a JSON object of the form:
+{"lines": [{"id": <id>, "score": <1-10>, "correction": <corrected romaji or null if accurate>, "note": <brief explanation>}]}
+Include every id exactly once.
+
+Lines:
+"""
+
+verification_cache = LineCache(
+    "chatgpt_verdicts",
+    db_path=os.path.join(CACHE_DIR, "chatgpt_verdicts.sqlite3") if DISK_CACHE_ENABLED else None
+)
+
+def estimate_tokens(text):
+    """Rough token count: about 4 ASCII characters per token, one token per Japanese character"""
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+def verdict_key(japanese_line, romaji_line):
+    """Cache key for a (Japanese, romaji) line pair"""
+    pair = normalize_japanese_line(japanese_line) + "\0" + " ".join(romaji_line.split())
+    return hashlib.sha256(pair.encode("utf-8")).hexdigest()
+
+def chunk_line_pairs(pairs, token_budget=VERIFY_TOKEN_BUDGET):
+    """Split (key, japanese, romaji) items into chunks whose prompts fit the token budget"""
+    budget = max(1, token_budget - estimate_tokens(VERIFY_INSTRUCTIONS))
+    chunks = []
+    current = []
+    used = 0
+    for pair in pairs:
+        _, japanese_line, romaji_line = pair
+        # JSON punctuation and the id cost roughly ten tokens per line
+        cost = estimate_tokens(japanese_line) + estimate_tokens(romaji_line) + 10
+        if current and used + cost > budget:
+            chunks.append(current)
+            current = []
+            used = 0
+        current.append(pair)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _post_chat_completion(api_key, prompt, max_tokens):
+    """POST one chat completion request and return the reply text
+
+    Every attempt, retries included, takes an openai_limiter slot;
+    raises RateLimitExceeded when none is free within API_QUEUE_TIMEOUT.
+    """
+    url = f"{OPENAI_BASE_URL}/chat/completions"
+    payload = {
+        "model": OPENAI_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": max_tokens,
+        "temperature": 0,
+        "response_format": {"type": "json_object"},
+    }
+    session = get_http_session()
+    # The shared session sends browser headers to the lyrics sites; the API gets only these two
+    headers = dict.fromkeys(session.headers)
+    headers.update({"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"})
+    for attempt in range(HTTP_RETRIES + 1):
+        # Waits for a slot instead of failing while the hourly quota still allows it
+        if not openai_limiter.acquire(timeout=API_QUEUE_TIMEOUT):
+            raise RateLimitExceeded(f"No {openai_limiter.name} slot for {url}")
+        with metrics.span("openai"):
+            response = session.post(url, json=payload, headers=headers, timeout=60)
+        metrics.increment("openai_requests", status=response.status_code)
+        if response.status_code in HTTP_RETRY_STATUSES and attempt < HTTP_RETRIES:
+            time.sleep(_backoff_delay(attempt, response.headers.get('Retry-After')))
+            continue
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+def _verify_chunk(chunk, api_key):
+    """Verify one chunk of line pairs; returns {key: verdict}"""
+    items = [{"id": i, "japanese": japanese_line, "romaji": romaji_line} for i, (_, japanese_line, romaji_line) in enumerate(chunk)]
+    prompt = VERIFY_INSTRUCTIONS + json.dumps(items, ensure_ascii=False)
+    max_tokens = min(VERIFY_MAX_RESPONSE_TOKENS, sum(estimate_tokens(romaji_line) + 40 for _, _, romaji_line in chunk))
+    try:
+        reply = json.loads(_post_chat_completion(api_key, prompt, max_tokens))
+        by_id = {line.get("id"): line for line in reply.get("lines", []) if isinstance(line, dict)}
+    except RateLimitExceeded:
+        return {key: {"error": "API rate limit reached"} for key, _, _ in chunk}
+    except Exception as e:
+        return {key: {"error": f"ChatGPT verification failed: {e}"} for key, _, _ in chunk}
+
+    verdicts = {}
+    for i, (key, _, _) in enumerate(chunk):
+        line = by_id.get(i)
+        if line is None:
+            verdicts[key] = {"error": "No verdict returned for this line"}
+        else:
+            verdicts[key] = {"score": line.get("score"), "correction": line.get("correction"), "note": line.get("note")}
+    return verdicts
+
+def verify_songs_with_chatgpt(songs, api_key, token_budget=VERIFY_TOKEN_BUDGET, concurrency=VERIFY_CONCURRENCY):
+    """Verify the romaji of many songs with as few ChatGPT requests as possible
+
+    songs is a list of (japanese_text, romaji_text) pairs whose lines
+    correspond one to one. Lines already verified (a repeated chorus, a
+    re-run) come from the verdict cache; the rest are deduplicated, packed
+    into requests that fit token_budget (lines from several songs can
+    share one request) and sent concurrently within the API rate limit.
+    Returns, per song, a list of verdict dicts with japanese, romaji, score,
+    correction and note (or error) for each non-blank line.
+    """
+    song_lines = []
+    pending = {}
+    verdicts = {}
+    for japanese_text, romaji_text in songs:
+        lines = []
+        for japanese_line, romaji_line in zip(japanese_text.split('\n'), romaji_text.split('\n')):
+            if not japanese_line.strip():
+                continue
+            key = verdict_key(japanese_line, romaji_line)
+            lines.append((key, japanese_line.strip(), romaji_line.strip()))
+            if key in verdicts or key in pending:
+                continue
+            cached = verification_cache.get(key)
+            if cached is not None:
+                verdicts[key] = json.loads(cached)
+            else:
+                pending[key] = (key, japanese_line.strip(), romaji_line.strip())
+        song_lines.append(lines)
+
+    chunks = chunk_line_pairs(list(pending.values()), token_budget)
+    if chunks:
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(chunks))), thread_name_prefix="verify") as executor:
+            for chunk_verdicts in executor.map(lambda chunk: _verify_chunk(chunk, api_key), chunks):
+                verdicts.update(chunk_verdicts)
+                # Only real verdicts are cached; errors are retried next time
+                verification_cache.put_many({
+                    key: json.dumps(verdict, ensure_ascii=False)
+                    for key, verdict in chunk_verdicts.items() if "error" not in verdict
+                })
+
+    return [
+        [dict(verdicts[key], japanese=japanese_line, romaji=romaji_line) for key, japanese_line, romaji_line in lines]
+        for lines in song_lines
+    ]
+
+def format_verification_report(line_verdicts):
+    """Summarize one song's line verdicts in the Accuracy/Corrections/Notes format"""
+    scores = [verdict["score"] for verdict in line_verdicts if isinstance(verdict.get("score"), (int, float))]
+    errors = [verdict["error"] for verdict in line_verdicts if verdict.get("error")]
+    if not scores and errors:
+        return errors[0]
+
+    corrections = [
+        f"{verdict['romaji']} -> {verdict['correction']}"
+        for verdict in line_verdicts if verdict.get("correction")
+    ]
+    notes = [verdict["note"] for verdict in line_verdicts if verdict.get("correction") and verdict.get("note")]
+    report = f"Accuracy: {sum(scores) / len(scores):.1f}/10\n" if scores else "Accuracy: unknown\n"
+    report += "Corrections: " + ("\n  " + "\n  ".join(corrections) if corrections else "None if accurate") + "\n"
+    report += "Notes: " + ("; ".join(notes) if notes else "No issues found")
+    if errors:
+        report += f"\n({len(errors)} lines could not be verified: {errors[0]})"
+    return report
+
+def verify_romaji_with_chatgpt(japanese_text, romaji_text, api_key):
+    # Rate limiting checks
+    if openai_limiter.remaining() == 0:
+        return f"API rate limit reached ({MAX_API_CALLS_PER_HOUR} calls/hour). Please wait before making more requests."
+    
+    try:
+        line_verdicts = verify_songs_with_chatgpt([(japanese_text, romaji_text)], api_key)[0]
+        if not line_verdicts:
+            return "Nothing to verify."
+        return format_verification_report(line_verdicts)
+    except Exception as e:
+        return f"ChatGPT verification failed: {str(e)}"
+
+def metrics_snapshot():
+    """Return metrics.snapshot() plus the hit counters of the caches"""
+    snapshot = metrics.snapshot()
+    snapshot["caches"] = {
+        "lyrics": lyrics_cache.stats(),
+        "romaji_lines": romaji_line_cache.stats(),
+        "verification": verification_cache.stats(),
+    }
+    snapshot["sources"] = source_stats.snapshot()
+    return snapshot
+
+def _prometheus_labels(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+def format_prometheus(snapshot):
+    """Render a metrics_snapshot() in the Prometheus text exposition format"""
+    lines = []
+    name = f"{METRICS_PREFIX}_stage_seconds"
+    lines.append(f"# HELP {name} Time spent in each stage of the search pipeline")
+    lines.append(f"# TYPE {name} histogram")
+    for stage, entry in sorted(snapshot["stages"].items()):
+        for bound, count in entry["buckets"]:
+            lines.append(f"{name}_bucket{_prometheus_labels({'stage': stage, 'le': bound})} {count}")
+        lines.append(f"{name}_bucket{_prometheus_labels({'stage': stage, 'le': '+Inf'})} {entry['count']}")
+        lines.append(f"{name}_sum{_prometheus_labels({'stage': stage})} {entry['total_seconds']}")
+        lines.append(f"{name}_count{_prometheus_labels({'stage': stage})} {entry['count']}")
+    name = f"{METRICS_PREFIX}_stage_errors_total"
+    lines.append(f"# HELP {name} Stage runs that ended in an error")
+    lines.append(f"# TYPE {name} counter")
+    for stage, entry in sorted(snapshot["stages"].items()):
+        lines.append(f"{name}{_prometheus_labels({'stage': stage})} {entry['errors']}")
+
+    declared = set()
+    for counter in snapshot["counters"]:
+        name = f"{METRICS_PREFIX}_{counter['name']}_total"
+        if name not in declared:
+            declared.add(name)
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_prometheus_labels(counter['labels'])} {counter['value']}")
+
+    sources = snapshot.get("sources", {})
+    for stat in ("attempts", "hits", "hit_rate", "latency", "expected_seconds"):
+        name = f"{METRICS_PREFIX}_source_{stat}"
+        lines.append(f"# TYPE {name} gauge")
+        for source, stats in sorted(sources.items()):
+            lines.append(f"{name}{_prometheus_labels({'source': source})} {stats[stat]}")
+
+    # Samples of one metric must be listed together, so group the cache stats by stat
+    caches = snapshot.get("caches", {})
+    for stat in sorted({stat for stats in caches.values() for stat in stats}):
+        name = f"{METRICS_PREFIX}_cache_{stat}"
+        lines.append(f"# TYPE {name} gauge")
+        for cache, stats in sorted(caches.items()):
+            if stat in stats:
+                lines.append(f"{name}{_prometheus_labels({'cache': cache})} {stats[stat]}")
+    return "\n".join(lines) + "\n"
+
+def write_metrics(path):
+    """Write a metrics_snapshot() to path: JSON for .json files, Prometheus text otherwise"""
+    snapshot = metrics_snapshot()
+    with open(path, "w", encoding="utf-8") as f:
+        if path.lower().endswith(".json"):
+            json.dump(snapshot, f, indent=2)
+        else:
+            f.write(format_prometheus(snapshot))
+
+def format_stage_summary(before, after):
+    """One line of where the time went between two metrics snapshots (for the GUI status line)"""
+    parts = []
+    for stage, entry in after["stages"].items():
+        previous = before["stages"].get(stage, {"count": 0, "total_seconds": 0.0})
+        count = entry["count"] - previous["count"]
+        if count <= 0 or stage.startswith("source/"):
+            continue  # Source totals overlap the stages they are made of
+        seconds = entry["total_seconds"] - previous["total_seconds"]
+        duration = f"{seconds:.2f}s" if seconds >= 1 else f"{seconds * 1000:.0f}ms"
+        parts.append((seconds, f"{stage} {duration}" + (f" ×{count}" if count > 1 else "")))
+    parts.sort(reverse=True)
+    fetched = sum(counter["value"] for counter in after["counters"] if counter["name"] == "http_bytes")
+    fetched -= sum(counter["value"] for counter in before["counters"] if counter["name"] == "http_bytes")
+    summary = " · ".join(text for _, text in parts) or "no timed stages"
+    if fetched:
+        summary += f" · {fetched / 1024:.0f} KB fetched"
+    return summary
+
+def new_title_record(song_title):
+    """Return an empty result record for song_title, as resolve_title fills it in"""
+    return {
+        "title": song_title,
+        "source": None,
+        "source_url": None,
+        "lyrics": None,
+        "romaji": None,
+        "links": None,
+        "timings": {},
+        "error": None,
+    }
+
+def resolve_title(song_title, cancel_event=None):
+    """Find lyrics for one title and return a JSON-ready record (no GUI involved)
+
+    Concurrent calls for the same title (after normalize_title) share one
+    lookup and romaji conversion; each gets its own copy of the record.
+    """
+    key = normalize_title(song_title) or song_title
+    try:
+        record = resolve_flight.do(key, lambda: _resolve_title(song_title, cancel_event), cancel_event)
+    except SearchCancelled:
+        record = dict(new_title_record(song_title), error="cancelled")
+    return dict(record, title=song_title)
+
+def _resolve_title(song_title, cancel_event):
+    start = time.perf_counter()
+    record = new_title_record(song_title)
     try:
-        query = f'site:lyrical-nonsense.com "{song_title}"'
-        for url in search(query, num_results=3):
-            if "lyrical-nonsense.com" in url:
-                urls['lyrical_nonsense'] = url
-                break
+        result = search_all_sources(song_title, cancel_event=cancel_event)
+        record["timings"]["search"] = time.perf_counter() - start
+        if result:
+            record["source"] = result["source"]
+            record["source_url"] = result["url"]
+            record["timings"]["sources"] = result["timings"]
+            if result["kind"] == "lyrics":
+                record["lyrics"] = result["text"]
+                romaji_start = time.perf_counter()
+                record["romaji"] = convert_to_romaji(result["text"])
+                record["timings"]["romaji"] = time.perf_counter() - romaji_start
+            else:
+                record["links"] = result["text"]
     except Exception as e:
-        print(f"Lyrical Nonsense search error: {e}")
-    
-    return urls
+        record["error"] = str(e)
+    record["timings"]["total"] = time.perf_counter() - start
+    metrics.observe("resolve", record["timings"]["total"], error=record["error"] is not None)
+    return record
 
-def get_lyrics_from_lyrical_nonsense(url):
-    """Extract lyrics from Lyrical Nonsense website"""
+def read_titles(path):
+    """Read song titles, one per line, from a file or "-" for stdin"""
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1'
-        }
-        
-        response = requests.get(url, timeout=15, headers=headers)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        # Look for the specific lyrics content area
-        lyrics_content = None
-        
-        # Try multiple strategies to find the lyrics
-        strategies = [
-            # Strategy 1: Look for div with class "lyrics"
-            lambda: soup.find("div", class_="lyrics"),
-            # Strategy 2: Look for div with id "lyrics"
-            lambda: soup.find("div", id="lyrics"),
-            # Strategy 3: Look for the main content area
-            lambda: soup.find("main") or soup.find("article"),
-            # Strategy 4: Look for div containing numbered lyrics
-            lambda: find_div_with_numbered_lyrics(soup),
-            # Strategy 5: Look for div with specific text patterns
-            lambda: find_div_with_lyrics_patterns(soup)
-        ]
-        
-        for strategy in strategies:
+        titles = []
+        seen = set()
+        for line in stream:
+            title = line.strip()
+            # Skip blank lines, comments and duplicates
+            if title and not title.startswith("#") and title not in seen:
+                seen.add(title)
+                titles.append(title)
+        return titles
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def load_completed_titles(output_path):
+    """Return titles already written to a JSON Lines output file without an error"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
             try:
-                result = strategy()
-                if result:
-                    lyrics_content = result
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line cut short by an interruption
+            if not record.get("error"):
+                completed.add(record.get("title"))
+    return completed
+
+def run_batch(titles, output_path, workers=4, resume=True):
+    """Resolve many titles with a bounded worker pool, appending JSON Lines to output_path"""
+    if resume:
+        completed = load_completed_titles(output_path)
+        pending = [title for title in titles if title not in completed]
+        if completed:
+            print(f"Resuming: {len(titles) - len(pending)} of {len(titles)} titles already done", file=sys.stderr)
+    else:
+        pending = list(titles)
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+    # Finish a line that an interrupted run left half-written
+    if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+        with open(output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+        if needs_newline:
+            with open(output_path, "a", encoding="utf-8") as f:
+                f.write("\n")
+
+    cancel_event = CancelToken()
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch")
+    queue = iter(pending)
+    in_flight = set()
+    done_count = 0
+    try:
+        with open(output_path, "a", encoding="utf-8") as out:
+            while True:
+                # Keep only a small window of titles submitted at a time
+                while len(in_flight) < workers * 2:
+                    title = next(queue, None)
+                    if title is None:
+                        break
+                    in_flight.add(executor.submit(resolve_title, title, cancel_event))
+                if not in_flight:
                     break
-            except:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record = future.result()
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                    done_count += 1
+                    status = record["source"] or ("error" if record["error"] else "not found")
+                    print(f"[{done_count}/{len(pending)}] {record['title']}: {status} ({record['timings']['total']:.1f}s)", file=sys.stderr)
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the same command to resume.", file=sys.stderr)
+        cancel_event.set()
+        for future in in_flight:
+            future.cancel()
+        raise
+    finally:
+        executor.shutdown(wait=False)
+    return done_count
+
+# Offline ingestion of saved pages: directories of .html files, tar archives and WARC files
+INGEST_HTML_EXTENSIONS = (".html", ".htm", ".xhtml")
+INGEST_TAR_EXTENSIONS = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+INGEST_WARC_EXTENSIONS = (".warc", ".warc.gz")
+INGEST_CHUNK_ITEMS = 64  # Pages handed to a worker process at a time
+INGEST_COMMIT_ROWS = 2000  # Rows written per sqlite transaction
+TITLE_PATTERN = re.compile(rb"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+
+_ingest_maps = {}  # Per worker process: archive path -> read-only mmap
+
+def iter_ingest_items(path):
+    """Yield (name, url, kind, location) for every saved page under path
+
+    location is (file path, offset, length) when a worker can read the page
+    in place (plain files, uncompressed tar and WARC), or the page bytes when
+    a compressed archive has to be read sequentially here. kind is "html",
+    or "http" for WARC response records that still carry their HTTP headers.
+    """
+    lower = path.lower()
+    if os.path.isdir(path):
+        for directory, subdirs, files in os.walk(path):
+            subdirs.sort()
+            for name in sorted(files):
+                yield from iter_ingest_items(os.path.join(directory, name))
+    elif lower.endswith(INGEST_WARC_EXTENSIONS):
+        yield from _iter_warc_items(path)
+    elif lower.endswith(INGEST_TAR_EXTENSIONS):
+        yield from _iter_tar_items(path)
+    elif lower.endswith(INGEST_HTML_EXTENSIONS):
+        yield path, None, "html", (path, 0, None)
+
+def _iter_tar_items(path):
+    import tarfile
+    try:
+        archive = tarfile.open(path, "r:")
+        compressed = False
+    except tarfile.ReadError:
+        archive = tarfile.open(path, "r|*")  # Compressed: members must be decompressed in order
+        compressed = True
+    with archive:
+        for member in archive:
+            if not member.isfile() or not member.name.lower().endswith(INGEST_HTML_EXTENSIONS):
                 continue
-        
-        if lyrics_content:
-            # Extract only the clean lyrics content
-            clean_lyrics = extract_clean_lyrics(lyrics_content)
-            if clean_lyrics:
-                return clean_lyrics
-        
-        return None
-        
-    except Exception as e:
-        print(f"Lyrical Nonsense extraction error: {e}")
-        return None
+            name = f"{path}:{member.name}"
+            if compressed:
+                yield name, None, "html", archive.extractfile(member).read()
+            else:
+                yield name, None, "html", (path, member.offset_data, member.size)
 
-def find_div_with_numbered_lyrics(soup):
-    """Find div containing numbered lyrics lines"""
-    for div in soup.find_all("div"):
-        text = div.get_text()
-        # Check if this div contains numbered lyrics
-        if text.count("1.") > 0 and text.count("2.") > 0 and text.count("3.") > 0:
-            # Make sure it's not too long (avoid getting the whole page)
-            if 100 < len(text) < 10000:
-                return div
-    return None
+def _iter_warc_items(path):
+    compressed = path.lower().endswith(".gz")
+    with (gzip.open(path, "rb") if compressed else open(path, "rb")) as f:
+        while True:
+            line = f.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue  # Blank lines between records
+            if not line.startswith(b"WARC/"):
+                raise ValueError(f"{path}: expected a WARC record header, got {line[:40]!r}")
+            headers = {}
+            while True:
+                line = f.readline()
+                if not line.strip():
+                    break
+                key, _, value = line.decode("utf-8", "replace").partition(":")
+                headers[key.strip().lower()] = value.strip()
 
-def find_div_with_lyrics_patterns(soup):
-    """Find div with lyrics-like patterns"""
-    for div in soup.find_all("div"):
-        text = div.get_text().lower()
-        # Look for lyrics indicators
-        if any(pattern in text for pattern in ['lyrics', '歌詞', 'romaji', 'romanized']):
-            # Check if it has numbered content
-            if any(f"{i}." in text for i in range(1, 11)):
-                return div
-    return None
+            length = int(headers.get("content-length", 0))
+            record_type = headers.get("warc-type")
+            if record_type == "response" or (record_type == "resource" and "html" in headers.get("content-type", "")):
+                name = f"{path}#{headers.get('warc-record-id') or f.tell()}"
+                url = headers.get("warc-target-uri", "").strip("<>") or None
+                kind = "http" if record_type == "response" else "html"
+                if compressed:
+                    yield name, url, kind, f.read(length)
+                    continue
+                yield name, url, kind, (path, f.tell(), length)
+            f.seek(length, os.SEEK_CUR)
 
-def extract_clean_lyrics(content_element):
-    """Extract clean lyrics from a content element"""
-    if not content_element:
-        return None
-    
-    # Get all text content
-    all_text = content_element.get_text("\n", strip=True)
-    lines = all_text.split('\n')
-    
-    # Extract only lyrics lines
-    lyrics_lines = []
-    current_numbered_line = ""
-    current_line_content = []
-    
-    for i, line in enumerate(lines):
-        line = line.strip()
-        if not line:
-            continue
-            
-        # Check if we're entering a lyrics section
-        if any(keyword in line.lower() for keyword in ['lyrics', '歌詞', 'romaji', 'romanized']):
-            continue
-            
-        # Check if we're leaving lyrics (hit navigation or other content)
-        if any(keyword in line.lower() for keyword in ['favorite', 'view favorites', 'copy link', 'artist:', 'tie-in:', 'status', 'comments', 'transliterated by:', 'join our', 'send me a coffee', 'home', 'artists', 'series', 'reviews', 'support ln', 'about', 'join us', 'submit', 'video', 'related']):
+def _read_ingest_location(location):
+    if isinstance(location, bytes):
+        return location
+    file_path, offset, length = location
+    if length is None:
+        with open(file_path, "rb") as f:
+            return f.read()
+    # Archives are mapped once per worker and sliced, never read from the start
+    mapped = _ingest_maps.get(file_path)
+    if mapped is None:
+        with open(file_path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _ingest_maps[file_path] = mapped
+    return mapped[offset:offset + length]
+
+def _dechunk(body):
+    chunks = []
+    position = 0
+    while True:
+        end = body.find(b"\r\n", position)
+        if end < 0:
             break
-        
-        # Check if this line starts with a number (1. to 99.)
-        if line and line[0].isdigit() and '.' in line[:3]:
-            # If we have a previous numbered line, save it first
-            if current_numbered_line and current_line_content:
-                full_line = current_numbered_line + " " + " ".join(current_line_content)
-                lyrics_lines.append(full_line)
-            
-            # Start a new numbered line
-            current_numbered_line = line
-            current_line_content = []
-            
-        elif current_numbered_line and len(line) < 200 and not line.startswith(('http', 'www', '©', 'copyright')):
-            # This is a continuation of the current numbered line
-            current_line_content.append(line)
-    
-    # Don't forget the last numbered line
-    if current_numbered_line and current_line_content:
-        full_line = current_numbered_line + " " + " ".join(current_line_content)
-        lyrics_lines.append(full_line)
-    elif current_numbered_line:
-        # If there's a numbered line with no content, add it as is
-        lyrics_lines.append(current_numbered_line)
-    
-    # If we didn't find lyrics with the numbered approach, try direct extraction
-    if not lyrics_lines:
-        current_numbered_line = ""
-        current_line_content = []
-        
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if line and line[0].isdigit() and '.' in line[:3]:
-                # If we have a previous numbered line, save it first
-                if current_numbered_line and current_line_content:
-                    full_line = current_numbered_line + " " + " ".join(current_line_content)
-                    lyrics_lines.append(full_line)
-                
-                # Start a new numbered line
-                current_numbered_line = line
-                current_line_content = []
-                
-            elif current_numbered_line and len(line) < 200 and not any(keyword in line.lower() for keyword in ['favorite', 'view favorites', 'copy link', 'artist:', 'tie-in:', 'status', 'comments', 'transliterated by:', 'join our', 'send me a coffee', 'home', 'artists', 'series', 'reviews', 'support ln', 'about', 'join us']):
-                # This is a continuation of the current numbered line
-                current_line_content.append(line)
-        
-        # Don't forget the last numbered line
-        if current_numbered_line and current_line_content:
-            full_line = current_numbered_line + " " + " ".join(current_line_content)
-            lyrics_lines.append(full_line)
-        elif current_numbered_line:
-            # If there's a numbered line with no content, add it as is
-            lyrics_lines.append(current_numbered_line)
-    
-    # Return clean lyrics
-    if lyrics_lines:
-        return '\n'.join(lyrics_lines)
-    
-    return None
+        try:
+            size = int(body[position:end].split(b";")[0], 16)
+        except ValueError:
+            break
+        if size == 0:
+            break
+        chunks.append(body[end + 2:end + 2 + size])
+        position = end + 4 + size
+    return b"".join(chunks)
 
-def convert_to_romaji(japanese_text):
+def split_http_response(block):
+    """Split a recorded HTTP response into (status, headers, decoded body)"""
+    head, separator, body = block.partition(b"\r\n\r\n")
+    if not separator:
+        head, separator, body = block.partition(b"\n\n")
+    lines = head.decode("iso-8859-1").splitlines()
+    status_parts = lines[0].split() if lines else []
+    status = int(status_parts[1]) if len(status_parts) > 1 and status_parts[1].isdigit() else 0
+    headers = {}
+    for line in lines[1:]:
+        key, _, value = line.partition(":")
+        headers[key.strip().lower()] = value.strip()
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        body = _dechunk(body)
+    encoding = headers.get("content-encoding", "").lower()
+    if encoding in ("gzip", "x-gzip"):
+        body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    elif encoding == "deflate":
+        try:
+            body = zlib.decompress(body)
+        except zlib.error:
+            body = zlib.decompress(body, -zlib.MAX_WBITS)  # Raw deflate, as some servers send
+    return status, headers, body
+
+def ingest_page(item):
+    """Extract lyrics from one saved page; runs in the worker processes
+
+    Returns (name, url, title, lyrics, error).
+    """
+    name, url, kind, location = item
     try:
-        kakasi_obj = kakasi()
-        kakasi_obj.setMode("J", "a")  # Japanese to ascii (romaji)
-        kakasi_obj.setMode("K", "a")  # Katakana to ascii (romaji)
-        kakasi_obj.setMode("H", "a")  # Hiragana to ascii (romaji)
-        conv = kakasi_obj.getConverter()
-        return conv.do(japanese_text)
+        data = _read_ingest_location(location)
+        if kind == "http":
+            status, headers, data = split_http_response(data)
+            if status != 200 or "html" not in headers.get("content-type", "text/html"):
+                return name, url, None, None, None
+
+        title_match = TITLE_PATTERN.search(data, 0, 65536)
+        title = None
+        if title_match:
+            title = " ".join(unescape(title_match.group(1).decode("utf-8", "replace")).split()) or None
+        try:
+            html = data.decode("utf-8")
+        except UnicodeDecodeError:
+            html = data  # Let BeautifulSoup detect the charset
+        return name, url, title, extract_lyrics_from_html(html, container_only=True), None
     except Exception as e:
-        return f"Failed to convert to romaji: {str(e)}"
+        return name, url, None, None, f"{type(e).__name__}: {e}"
+
+def open_ingest_db(output_path):
+    """Open (creating if needed) the sqlite file ingested pages are written to"""
+    db = sqlite3.connect(output_path)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS pages ("
+        "name TEXT PRIMARY KEY, url TEXT, title TEXT, lyrics TEXT, error TEXT, ingested_at REAL)"
+    )
+    return db
+
+def run_ingest(paths, output_path, workers=None, resume=True):
+    """Extract lyrics from saved pages with a process pool, storing one row per page"""
+    workers = workers or os.cpu_count() or 1
+    db = open_ingest_db(output_path)
+    if resume:
+        completed = {row[0] for row in db.execute("SELECT name FROM pages WHERE error IS NULL")}
+    else:
+        completed = set()
+        with db:
+            db.execute("DELETE FROM pages")
+
+    items = (item for path in paths for item in iter_ingest_items(path) if item[0] not in completed)
+    # A single worker runs in-process; spawning a pool would only add overhead
+    if workers > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(workers)
+    else:
+        pool = None
+    results = pool.imap_unordered(ingest_page, items, chunksize=INGEST_CHUNK_ITEMS) if pool else map(ingest_page, items)
+
+    counts = {"pages": 0, "lyrics": 0, "errors": 0}
+    rows = []
+    start = time.perf_counter()
+
+    def flush():
+        with db:
+            db.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)", rows)
+        rows.clear()
 
-def fallback_lyrics(song_title):
     try:
-        result = lyricspy.search(song_title)
-        if result and len(result) > 0:
-            return result[0].lyrics
-    except Exception as e:
-        print(f"Lyricspy error: {e}")
-        return None
-    return None
+        for name, url, title, lyrics, error in results:
+            rows.append((name, url, title, lyrics, error, time.time()))
+            counts["pages"] += 1
+            counts["lyrics"] += lyrics is not None
+            counts["errors"] += error is not None
+            if len(rows) >= INGEST_COMMIT_ROWS:
+                flush()
+                elapsed = time.perf_counter() - start
+                print(f"{counts['pages']} pages ({counts['pages'] / elapsed * 60:.0f}/min)", file=sys.stderr)
+        flush()
+        if pool:
+            pool.close()
+    except BaseException as e:
+        # join() needs a closed or terminated pool, or it would raise over the real error
+        if pool:
+            pool.terminate()
+        if isinstance(e, KeyboardInterrupt):
+            print("Interrupted; rerun the same command to resume.", file=sys.stderr)
+            flush()  # Keep what finished, so a rerun skips it
+        raise
+    finally:
+        if pool:
+            pool.join()
+        db.close()
 
-def try_alternative_anime_sources(song_title):
-    """Try alternative anime lyrics sources that might be more accessible"""
-    alternative_sources = [
-        f'site:jpopasia.com "{song_title}" lyrics',
-        f'site:musixmatch.com "{song_title}"',
-        f'site:lyricstranslate.com "{song_title}"',
-        f'site:utaten.com "{song_title}"',
-        f'site:petitlyrics.com "{song_title}"'
+    elapsed = time.perf_counter() - start
+    print(f"Ingested {counts['pages']} pages in {elapsed:.1f}s ({counts['pages'] / max(elapsed, 1e-9) * 60:.0f}/min): "
+          f"{counts['lyrics']} with lyrics, {counts['errors']} errors", file=sys.stderr)
+    return counts
+
+def warm_up():
+    """Do the one-off loading the first search needs: imports, the HTTP session and the romaji dictionary"""
+    steps = [
+        ("imports", lambda: [importlib.import_module(name) for name in WARM_UP_MODULES]),
+        ("HTTP session", get_http_session),
+        ("romaji dictionary", get_romaji_converter),
     ]
-    
-    for query in alternative_sources:
+    for label, step in steps:
         try:
-            for url in search(query, num_results=2):
-                if any(site in url for site in ['jpopasia.com', 'musixmatch.com', 'lyricstranslate.com', 'utaten.com', 'petitlyrics.com']):
-                    return f"Found alternative anime lyrics source: {url}\nTry visiting this URL manually to get lyrics."
-        except Exception:
+            step()
+        except Exception as e:
+            print(f"Warm-up error ({label}): {e}")
+
+def start_warm_up():
+    """Run warm_up on a background thread and return the thread"""
+    thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+def _import_times(code):
+    # Run code under -X importtime and return (depth, self_us, cumulative_us, module) rows
+    import subprocess
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
             continue
-    
-    return None
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, int(self_us), int(cumulative_us), name.strip()))
+    return rows
 
-def search_anime_lyrics_backup(song_title):
-    """Backup search specifically for anime song lyrics on multiple platforms"""
-    backup_sources = [
-        # Anime-specific lyrics sites
-        f'site:anime-lyrics.com "{song_title}"',
-        f'site:animeop.info "{song_title}"',
-        f'site:animeworld.com "{song_title}" lyrics',
-        f'site:anime-planet.com "{song_title}"',
-        f'site:myanimelist.net "{song_title}" lyrics',
-        f'site:anidb.net "{song_title}"',
-        f'site:animenewsnetwork.com "{song_title}"',
-        f'site:crunchyroll.com "{song_title}"',
-        f'site:funimation.com "{song_title}"',
-        # Japanese music sites
-        f'site:uta-net.com "{song_title}"',
-        f'site:joysound.com "{song_title}"',
-        f'site:dam-ch.com "{song_title}"',
-        f'site:music.jp "{song_title}"',
-        # International anime communities
-        f'site:reddit.com/r/anime "{song_title}" lyrics',
-        f'site:reddit.com/r/jpop "{song_title}"',
-        f'site:reddit.com/r/anime_lyrics "{song_title}"',
-        f'site:discord.gg anime "{song_title}" lyrics',
-        # Anime database sites
-        f'site:anilist.co "{song_title}"',
-        f'site:kitsu.io "{song_title}"',
-        f'site:shoboi.jp "{song_title}"',
-        f'site:vgmdb.net "{song_title}"'
-    ]
-    
-    found_sources = []
-    
-    for query in backup_sources:
-        try:
-            for url in search(query, num_results=1):
-                # Extract domain name for cleaner display
-                domain = url.split('/')[2] if len(url.split('/')) > 2 else url
-                if domain not in [source.split('/')[2] for source in found_sources]:
-                    found_sources.append(url)
-                    if len(found_sources) >= 5:  # Limit to 5 results
-                        break
-            if len(found_sources) >= 5:
+def startup_report(top=STARTUP_REPORT_TOP):
+    """Print what starting the program costs and what is left for warm_up (or the first search)"""
+    import subprocess
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    wall = []
+    for _ in range(3):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import main"], cwd=script_dir, check=True)
+        wall.append((time.perf_counter() - start) * 1000)
+    print(f"python -c 'import main': {min(wall):.0f} ms wall (best of 3, interpreter start included)")
+
+    rows = _import_times("import main")
+    main_row = next(((i, row) for i, row in enumerate(rows) if row[0] == 0 and row[3] == "main"), None)
+    if main_row is not None:
+        index, (_, self_us, cumulative_us, _) = main_row
+        print(f"import main: {cumulative_us / 1000:.1f} ms ({self_us / 1000:.1f} ms in main itself)")
+        # Children are listed before their parent, at one level deeper
+        children = []
+        for depth, _, child_us, name in reversed(rows[:index]):
+            if depth == 0:
                 break
-        except Exception:
-            continue
-    
-    if found_sources:
-        result = "🎵 Found anime lyrics backup sources:\n\n"
-        for i, url in enumerate(found_sources, 1):
-            domain = url.split('/')[2] if len(url.split('/')) > 2 else url
-            result += f"{i}. {domain}\n   {url}\n\n"
-        result += "💡 Try visiting these sites manually to find lyrics!"
-        return result
-    
-    return None
+            if depth == 1:
+                children.append((child_us, name))
+        for child_us, name in sorted(children, reverse=True)[:top]:
+            print(f"  {child_us / 1000:8.1f} ms  {name}")
 
-def search_lyrics_online(song_title):
-    """Additional fallback: search for lyrics on other websites"""
-    try:
-        # Try searching for lyrics on other sites
-        search_query = f'"{song_title}" lyrics site:lyrics.com OR site:genius.com OR site:azlyrics.com'
-        for url in search(search_query, num_results=3):
-            if any(site in url for site in ['lyrics.com', 'genius.com', 'azlyrics.com']):
-                return f"Found potential lyrics source: {url}\nTry visiting this URL manually to get lyrics."
-        return None
-    except Exception as e:
-        return None
+    rows = _import_times("import main; import " + ", ".join(WARM_UP_MODULES))
+    print("Deferred until warm_up or first use:")
+    for depth, _, cumulative_us, name in rows:
+        if depth == 0 and name in WARM_UP_MODULES:
+            print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
 
-def verify_romaji_with_chatgpt(japanese_text, romaji_text, api_key):
-    global last_api_call, api_call_count
-    # Rate limiting checks
-    current_time = datetime.now()
-    
-    # Check hourly limit
-    if api_call_count >= MAX_API_CALLS_PER_HOUR:
-        return "API rate limit reached (50 calls/hour). Please wait before making more requests."
-    
-    # Check cooldown between calls
-    if last_api_call and (current_time - last_api_call).total_seconds() < API_COOLDOWN_SECONDS:
-        return f"Please wait {API_COOLDOWN_SECONDS} seconds between API calls."
-    
+    start = time.perf_counter()
+    warm_up()
+    print(f"warm_up() in this process: {(time.perf_counter() - start) * 1000:.0f} ms (imports, HTTP session, romaji dictionary)")
+
+class ServiceError(Exception):
+    """An error answered with an HTTP status by the lyrics service"""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+class LyricsService:
+    """The lookup pipeline behind the endpoints of the local HTTP service
+
+    Work runs on a pool of max_concurrency threads. A request that finds
+    every slot taken waits up to queue_timeout seconds and is then refused
+    with 503, and one that takes longer than timeout seconds is answered
+    with 504 (a search is cancelled; a conversion keeps its slot until it
+    finishes, so the limit still holds). Each handler returns a JSON-ready
+    dict or raises ServiceError.
+    """
+
+    def __init__(self, max_concurrency=SERVICE_MAX_CONCURRENCY, timeout=SERVICE_TIMEOUT, queue_timeout=SERVICE_QUEUE_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.started = time.time()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="service")
+        self._lock = threading.Lock()
+        self._busy = 0
+
+    def run(self, func, *args):
+        """Call func(cancel_event, *args) on the worker pool within the limits above"""
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise ServiceError(503, "Too many requests in progress; try again shortly", {"Retry-After": "1"})
+        cancel_event = CancelToken()
+        with self._lock:
+            self._busy += 1
+        try:
+            future = self._executor.submit(func, cancel_event, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            cancel_event.set()
+            raise ServiceError(504, f"No answer within {self.timeout} seconds")
+
+    def _release(self, future):
+        with self._lock:
+            self._busy -= 1
+        self._slots.release()
+
+    def shutdown(self):
+        if sys.version_info >= (3, 9):
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            # No cancel_futures before 3.9; every queued call holds a slot, so at most a few are left to run
+            self._executor.shutdown(wait=False)
+
+    @staticmethod
+    def _require(params, name):
+        value = params.get(name)
+        if not isinstance(value, str) or not value.strip():
+            raise ServiceError(400, f"Missing parameter: {name}")
+        return value
+
+    def search(self, params):
+        """Search every source for a title and return the resolve_title record"""
+        title = self._require(params, "title").strip()
+        return self.run(lambda cancel_event: resolve_title(title, cancel_event))
+
+    def extract(self, params):
+        """Download a lyrics page and return its lyrics and romaji"""
+        url = self._require(params, "url").strip()
+        if urlsplit(url).scheme not in ("http", "https"):
+            raise ServiceError(400, "url must be an http(s) URL")
+
+        def work(cancel_event):
+            lyrics = get_lyrics_from_lyrical_nonsense(url, cancel_event)
+            return {"url": url, "lyrics": lyrics, "romaji": convert_to_romaji(lyrics) if lyrics else None}
+        return self.run(work)
+
+    def extract_html(self, params):
+        """Extract the lyrics (and romaji) from an HTML page sent in the request"""
+        html = self._require(params, "html")
+
+        def work(cancel_event):
+            lyrics = extract_lyrics_from_html(html)
+            return {"lyrics": lyrics, "romaji": convert_to_romaji(lyrics) if lyrics else None}
+        return self.run(work)
+
+    def romanize(self, params):
+        """Romanize text, or a list of lines"""
+        lines = params.get("lines")
+        if lines is None:
+            return self.run(lambda cancel_event: {"romaji": convert_to_romaji(self._require(params, "text"))})
+        if not isinstance(lines, list) or not all(isinstance(line, str) for line in lines):
+            raise ServiceError(400, "lines must be a list of strings")
+        return self.run(lambda cancel_event: {"romaji": romanize_lines(lines)})
+
+    def health(self, params):
+        with self._lock:
+            busy = self._busy
+        return {
+            "status": "ok",
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "busy": busy,
+            "max_concurrency": self.max_concurrency,
+            "romaji_converter_loaded": _romaji_converter is not None,
+            "offline": offline_mode,
+        }
+
+# Path -> (LyricsService method, HTTP methods allowed)
+SERVICE_ROUTES = {
+    "/search": ("search", ("GET", "POST")),
+    "/extract": ("extract", ("GET", "POST")),
+    "/extract-html": ("extract_html", ("POST",)),
+    "/romanize": ("romanize", ("GET", "POST")),
+    "/health": ("health", ("GET",)),
+}
+
+def make_service_server(service, host=SERVICE_HOST, port=SERVICE_PORT):
+    """Return a ThreadingHTTPServer answering the SERVICE_ROUTES plus /metrics with service"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs
+
+    class LyricsRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, so clients can reuse connections
+        disable_nagle_algorithm = True  # Headers and body are separate writes; don't let the body wait for an ACK
+
+        def do_GET(self):
+            self._dispatch()
+
+        def do_POST(self):
+            self._dispatch()
+
+        def _dispatch(self):
+            start = time.perf_counter()
+            parts = urlsplit(self.path)
+            status = 200
+            try:
+                params = {name: values[-1] for name, values in parse_qs(parts.query).items()}
+                body = self._read_body()  # Read even if unused, so the connection stays in step
+                if parts.path == "/metrics":
+                    snapshot = metrics_snapshot()
+                    if params.get("format") == "json":
+                        self._send_json(200, snapshot)
+                    else:
+                        self._send(200, format_prometheus(snapshot).encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+                    return
+                route = SERVICE_ROUTES.get(parts.path)
+                if route is None:
+                    raise ServiceError(404, f"Unknown endpoint: {parts.path}")
+                handler_name, allowed = route
+                if self.command not in allowed:
+                    raise ServiceError(405, f"{parts.path} accepts {', '.join(allowed)}", {"Allow": ", ".join(allowed)})
+                if body:
+                    params.update(self._parse_body(body, parts.path))
+                with metrics.span(f"service{parts.path}"):
+                    payload = getattr(service, handler_name)(params)
+                self._send_json(200, payload)
+            except ServiceError as e:
+                status = e.status
+                self._send_json(e.status, {"error": str(e)}, e.headers)
+            except Exception as e:
+                status = 500
+                print(f"Service error on {parts.path}: {e}")
+                self._send_json(500, {"error": str(e)})
+            finally:
+                metrics.increment("service_responses", endpoint=parts.path, status=status)
+                metrics.observe("service", time.perf_counter() - start, error=status >= 500)
+
+        def _read_body(self):
+            length = self.headers.get("Content-Length")
+            if not length:
+                return b""
+            if not length.isdigit():
+                self.close_connection = True
+                raise ServiceError(400, "Bad Content-Length")
+            if int(length) > SERVICE_MAX_BODY_BYTES:
+                self.close_connection = True  # The body is not read, so the connection cannot be reused
+                raise ServiceError(413, f"Request body over {SERVICE_MAX_BODY_BYTES} bytes")
+            return self.rfile.read(int(length))
+
+        def _parse_body(self, body, path):
+            content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            text = body.decode("utf-8", errors="replace")
+            if content_type == "application/json":
+                try:
+                    params = json.loads(text)
+                except ValueError:
+                    raise ServiceError(400, "Request body is not valid JSON")
+                if not isinstance(params, dict):
+                    raise ServiceError(400, "Request body must be a JSON object")
+                return params
+            if content_type == "application/x-www-form-urlencoded":
+                return {name: values[-1] for name, values in parse_qs(text).items()}
+            # Anything else is the raw document or text itself
+            return {"html": text} if path == "/extract-html" else {"text": text}
+
+        def _send_json(self, status, payload, headers=None):
+            self._send(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8", headers)
+
+        def _send(self, status, body, content_type, headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # One line per request would dominate the output at hundreds of requests per second
+
+    server = ThreadingHTTPServer((host, port), LyricsRequestHandler)
+    server.daemon_threads = True
+    return server
+
+def serve(host=SERVICE_HOST, port=SERVICE_PORT, max_concurrency=SERVICE_MAX_CONCURRENCY, timeout=SERVICE_TIMEOUT):
+    """Run the lyrics service until interrupted, with everything loaded up front"""
+    warm_up()
+    metrics.enable()  # /metrics is part of the service
+    service = LyricsService(max_concurrency=max_concurrency, timeout=timeout)
+    server = make_service_server(service, host, port)
+    print(f"Serving lyrics on http://{host}:{server.server_port} "
+          f"(search, extract, extract-html, romanize, health, metrics)", file=sys.stderr)
     try:
-        openai.api_key = api_key
-        prompt = f"""Please verify if this romaji translation is accurate for the Japanese text:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.shutdown()
 
-Japanese: {japanese_text}
-Romaji: {romaji_text}
+def print_index_lookup(title, threshold=INDEX_MATCH_THRESHOLD):
+    """Print the song in the local lyrics index that best matches title; returns False if none does
 
-Please:
-1. Check if the romaji accurately represents the Japanese pronunciation
-2. Provide corrections if needed
-3. Give a confidence score (1-10)
+    Unlike searches, which only trust exact key matches, this also shows
+    fuzzy matches, with their similarity, so a misspelled title can still
+    find a stored song.
+    """
+    song = lyrics_index.lookup(title, threshold=threshold)
+    if song is None:
+        print(f"No song in the local lyrics index matches \"{title}\"")
+        return False
+    print(f"{song['title']} (similarity {song['score']:.2f})")
+    if song["url"]:
+        print(song["url"])
+    print()
+    print(song["lyrics"])
+    return True
 
-Respond in this format:
-Accuracy: [score]/10
-Corrections: [any corrections or "None if accurate"]
-Notes: [brief explanation]"""
-        
-        # Fixed: Use the correct OpenAI API method
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=200,
-            temperature=0.3
-        )
+def print_source_stats():
+    """Print the learned stats of every source and site query, in the order they are tried"""
+    ordered = [source.name for source in plan_sources()]
+    for group in dict.fromkeys(entry["group"] for entry in SITE_QUERIES):
+        ordered.extend(entry["name"] for entry in planned_site_queries(group))
+    site_names = {entry["name"] for entry in SITE_QUERIES}
+    names = [source.name for source in LYRICS_SOURCES] + [entry["name"] for entry in SITE_QUERIES]
+    width = max(len(name) for name in names)
+    print(f"{'source':<{width}}  attempts  hit rate  latency  expected")
+    for name in ordered + [name for name in names if name not in ordered]:
+        stats = source_stats.get(name)
+        if stats is None:
+            print(f"{name:<{width}}  {'-':>8}")
+            continue
+        state = "  skipped" if name in site_names and source_stats.pruned(name) else ""
+        print(f"{name:<{width}}  {stats['attempts']:>8}  {stats['hits'] / stats['attempts']:>8.0%}  "
+              f"{stats['latency']:>6.2f}s  {source_stats.expected_seconds(name):>7.2f}s{state}")
 
-        # Update rate limiting variables
-        last_api_call = current_time
-        api_call_count += 1
+def cli(argv):
+    """Command-line entry point (no arguments starts the GUI instead)"""
+    parser = argparse.ArgumentParser(prog="main.py", description="Romaji Lyrics Finder")
+    subcommands = parser.add_subparsers(dest="command", required=True)
 
-        return response.choices[0].message.content
-    except Exception as e:
-        return f"ChatGPT verification failed: {str(e)}"
+    batch_parser = subcommands.add_parser("batch", help="Resolve many song titles without the GUI")
+    batch_parser.add_argument("titles", help='File with one song title per line, or "-" for stdin')
+    batch_parser.add_argument("-o", "--output", default="lyrics.jsonl", help="JSON Lines output file (default: lyrics.jsonl)")
+    batch_parser.add_argument("-w", "--workers", type=int, default=4, help="Titles resolved in parallel (default: 4)")
+    batch_parser.add_argument("--no-resume", action="store_true", help="Start over instead of skipping titles already in the output")
+    batch_parser.add_argument("--offline", action="store_true", help="Only use cached results")
+    batch_parser.add_argument("--metrics", metavar="FILE", help="Write stage timings and counters here when done (.json for JSON, otherwise Prometheus text)")
+
+    ingest_parser = subcommands.add_parser("ingest", help="Extract lyrics from saved pages without downloading anything")
+    ingest_parser.add_argument("inputs", nargs="+", help="Directories of .html files, tar archives or .warc/.warc.gz files")
+    ingest_parser.add_argument("-o", "--output", default="lyrics.sqlite3", help="sqlite output file (default: lyrics.sqlite3)")
+    ingest_parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: one per CPU)")
+    ingest_parser.add_argument("--no-resume", action="store_true", help="Start over instead of skipping pages already in the output")
+
+    report_parser = subcommands.add_parser("startup-report", help="Show how long starting up takes and which imports it spends the time on")
+    report_parser.add_argument("--top", type=int, default=STARTUP_REPORT_TOP, help=f"Imports to list (default: {STARTUP_REPORT_TOP})")
+
+    serve_parser = subcommands.add_parser("serve", help="Answer lookups over a local HTTP/JSON API")
+    serve_parser.add_argument("--host", default=SERVICE_HOST, help=f"Address to listen on (default: {SERVICE_HOST})")
+    serve_parser.add_argument("-p", "--port", type=int, default=SERVICE_PORT, help=f"Port to listen on (default: {SERVICE_PORT})")
+    serve_parser.add_argument("-c", "--max-concurrency", type=int, default=SERVICE_MAX_CONCURRENCY, help=f"Requests worked on at once (default: {SERVICE_MAX_CONCURRENCY})")
+    serve_parser.add_argument("-t", "--timeout", type=float, default=SERVICE_TIMEOUT, help=f"Seconds before a request gets 504 (default: {SERVICE_TIMEOUT})")
+    serve_parser.add_argument("--offline", action="store_true", help="Only use cached results")
+
+    subcommands.add_parser("sources", help="Show each source's hit rate and latency, in the order searches try them")
+
+    lookup_parser = subcommands.add_parser("lookup", help="Find a song in the local lyrics index, allowing for misspelled titles")
+    lookup_parser.add_argument("title", help="Song title, in any spelling, kana or romaji")
+    lookup_parser.add_argument("--threshold", type=float, default=INDEX_MATCH_THRESHOLD, help=f"Minimum title similarity from 0 to 1 (default: {INDEX_MATCH_THRESHOLD})")
+
+    args = parser.parse_args(argv)
+    if args.command == "sources":
+        print_source_stats()
+    elif args.command == "lookup":
+        return 0 if print_index_lookup(args.title, args.threshold) else 1
+    elif args.command == "serve":
+        set_offline_mode(args.offline)
+        try:
+            serve(args.host, args.port, max_concurrency=max(1, args.max_concurrency), timeout=args.timeout)
+        except KeyboardInterrupt:
+            return 130
+    elif args.command == "startup-report":
+        startup_report(args.top)
+    elif args.command == "ingest":
+        try:
+            run_ingest(args.inputs, args.output, workers=max(1, args.workers), resume=not args.no_resume)
+        except KeyboardInterrupt:
+            return 130
+    elif args.command == "batch":
+        set_offline_mode(args.offline)
+        if args.metrics:
+            metrics.enable()
+        titles = read_titles(args.titles)
+        try:
+            run_batch(titles, args.output, workers=max(1, args.workers), resume=not args.no_resume)
+        except KeyboardInterrupt:
+            return 130
+        finally:
+            if args.metrics:
+                write_metrics(args.metrics)
+    return 0
 
 def main():
+    import tkinter as tk
+    from tkinter import ttk
+
     root = tk.Tk()
     root.title("Romaji Lyrics Finder")
     root.geometry("800x700")
 
-    # Add a flag to control thread execution
-    stop_search = False
+    # The latest search; starting a new one cancels it and silences its output
+    current_session = None
 
     api_label = tk.Label(root, text="OpenAI API Key (optional):", font=("Arial", 10, "bold"))
     api_label.pack(pady=(10,5))
     api_entry = tk.Entry(root, width=50, show="*", font=("Arial", 10))
     api_entry.pack(pady=5)
 
+    # Offline mode only answers from the lyrics caches
+    offline_var = tk.BooleanVar(value=False)
+    offline_check = tk.Checkbutton(root, text="Offline mode (cached results only)", variable=offline_var, font=("Arial", 9))
+    offline_check.pack(pady=(0,5))
+
+    # Per-stage timings of each search, shown in the status line at the bottom
+    metrics_var = tk.BooleanVar(value=metrics.enabled)
+    metrics_check = tk.Checkbutton(root, text="Show timings", variable=metrics_var, font=("Arial", 9),
+                                   command=lambda: metrics.enable(metrics_var.get()))
+    metrics_check.pack(pady=(0,5))
+
     # Add separator line
     separator1 = tk.Frame(root, height=2, bg="gray")
     separator1.pack(fill="x", padx=20, pady=10)
@@ -389,52 +3871,90 @@ def main():
     
     # Function to move up one line
     def move_up_line():
-        nonlocal current_line
-        if current_line > 1:
-            current_line -= 1
-            highlight_current_line()
-            update_line_display()
+        go_to_line(current_line - 1)
     
     # Function to move down one line
     def move_down_line():
+        go_to_line(current_line + 1)
+
+    def go_to_line(line, manual=True):
         nonlocal current_line
-        if current_line < total_lines:
-            current_line += 1
+        line = max(1, min(line, total_lines))
+        if line != current_line or highlighted_line is None:
+            current_line = line
             highlight_current_line()
             update_line_display()
+        if manual and karaoke_job is not None:
+            start_karaoke()  # Keep playing from where the user moved to
     
+    # Line whose tags are currently applied (None when nothing is highlighted)
+    highlighted_line = None
+
     # Function to highlight the current line
     def highlight_current_line():
-        text_widget.tag_remove("current_line", "1.0", tk.END)
-        text_widget.tag_remove("completed_line", "1.0", tk.END)
-        text_widget.tag_remove("upcoming_line", "1.0", tk.END)
-
-         # Highlight completed lines (lines 1 to current_line-1)
-        for i in range(1, current_line):
-            start_pos = f"{i}.0"
-            end_pos = f"{i}.end"
-            text_widget.tag_add("completed_line", start_pos, end_pos)
+        # Only the lines between the old and new position change, so retag
+        # just that delta; the completed region stays one tagged range
+        nonlocal highlighted_line
+        previous = highlighted_line or 1
+        if highlighted_line is not None:
+            text_widget.tag_remove("current_line", f"{previous}.0", f"{previous}.end")
+        if current_line > previous:
+            text_widget.tag_add("completed_line", f"{previous}.0 -1c", f"{current_line - 1}.end")
+        elif current_line < previous:
+            text_widget.tag_remove("completed_line", f"{current_line}.0 -1c", f"{previous}.0")
 
         # Add highlighting to current line
         start_pos = f"{current_line}.0"
         end_pos = f"{current_line}.end"
         text_widget.tag_add("current_line", start_pos, end_pos)
+        highlighted_line = current_line
         # Scroll to current line
         text_widget.see(start_pos)
-    
-    # Function to update total lines count
-    def update_total_lines():
-        nonlocal total_lines
-        text_widget.config(state=tk.NORMAL)
-        content = text_widget.get("1.0", tk.END)
-        total_lines = len(content.split('\n'))
-        text_widget.config(state=tk.DISABLED)
-        update_line_display()
+
+    # Karaoke mode: advance one line per beat of a fixed tempo
+    karaoke_job = None
+    karaoke_anchor = (0.0, 1)  # (monotonic start time, line at that time)
+
+    def start_karaoke():
+        nonlocal karaoke_anchor
+        stop_karaoke()
+        karaoke_anchor = (time.monotonic(), current_line)
+        play_button.config(text="⏸ Pause")
+        karaoke_tick()
+
+    def stop_karaoke():
+        nonlocal karaoke_job
+        if karaoke_job is not None:
+            root.after_cancel(karaoke_job)
+            karaoke_job = None
+        play_button.config(text="▶ Play")
+
+    def toggle_karaoke():
+        if karaoke_job is None:
+            start_karaoke()
+        else:
+            stop_karaoke()
+
+    def karaoke_tick():
+        nonlocal karaoke_job
+        try:
+            seconds_per_line = 60.0 / max(1, tempo_var.get())
+        except tk.TclError:
+            seconds_per_line = 60.0 / KARAOKE_LINES_PER_MINUTE  # The spinbox is mid-edit
+        started, start_line = karaoke_anchor
+        # Derive the line from elapsed time, so a late tick catches up instead of drifting
+        beats = int((time.monotonic() - started) / seconds_per_line)
+        go_to_line(start_line + beats, manual=False)
+        if current_line >= total_lines:
+            karaoke_job = None
+            stop_karaoke()
+            return
+        next_beat = started + (beats + 1) * seconds_per_line
+        karaoke_job = root.after(max(1, int((next_beat - time.monotonic()) * 1000)), karaoke_tick)
     
     # Configure the current line tag
     text_widget.tag_configure("current_line", background="lightblue", relief="raised")
     text_widget.tag_configure("completed_line", background="lightgreen", relief="flat")
-    text_widget.tag_configure("upcoming_line", background="white", relief="flat")
 
     # Add right-click context menu for copy functionality
     def show_context_menu(event):
@@ -467,7 +3987,6 @@ def main():
     
     # Add keyboard navigation
     def on_key_press(event):
-        nonlocal current_line
         if event.keysym == "Up":
             move_up_line()
             return "break"
@@ -475,14 +3994,13 @@ def main():
             move_down_line()
             return "break"
         elif event.keysym == "Home":
-            current_line = 1
-            highlight_current_line()
-            update_line_display()
+            go_to_line(1)
             return "break"
         elif event.keysym == "End":
-            current_line = total_lines
-            highlight_current_line()
-            update_line_display()
+            go_to_line(total_lines)
+            return "break"
+        elif event.keysym == "space":
+            toggle_karaoke()
             return "break"
     
     text_widget.bind("<Key>", on_key_press)
@@ -506,6 +4024,19 @@ def main():
     
     down_button = tk.Button(nav_frame, text="↓", width=3, command=move_down_line, font=("Arial", 10, "bold"))
     down_button.pack(pady=(2,0))
+
+    # Karaoke controls: play/pause (or Space in the lyrics) and tempo in lines per minute
+    karaoke_frame = tk.Frame(line_frame)
+    karaoke_frame.pack(side="right", padx=10)
+
+    play_button = tk.Button(karaoke_frame, text="▶ Play", width=8, command=toggle_karaoke, font=("Arial", 9))
+    play_button.pack(side="left")
+
+    tempo_var = tk.IntVar(value=KARAOKE_LINES_PER_MINUTE)
+    tempo_spinbox = tk.Spinbox(karaoke_frame, from_=1, to=600, width=4, textvariable=tempo_var, font=("Arial", 9),
+                               command=lambda: karaoke_job is not None and start_karaoke())
+    tempo_spinbox.pack(side="left", padx=(5,2))
+    tk.Label(karaoke_frame, text="lines/min", font=("Arial", 9), fg="gray").pack(side="left")
     
     # Add separator line
     separator2 = tk.Frame(root, height=2, bg="gray")
@@ -541,187 +4072,208 @@ def main():
     kill_button = tk.Button(button_frame, text="Kill App", bg="red", fg="white", width=15, height=2, font=("Arial", 12, "bold"), command=root.quit)
     kill_button.pack(side="left", padx=10)
 
-    def search_lyrics():
-        nonlocal stop_search
-        user_input = entry.get().strip()  # strip input spaces
-        if not user_input:
-            text_widget.config(state=tk.NORMAL)  # Enable to edit
-            text_widget.delete(1.0, tk.END)
-            text_widget.insert(tk.END, "Please enter a song title.\n")
-            text_widget.config(state=tk.DISABLED)  # Disable again
-            update_total_lines()  # Update line count
-            button.config(state=tk.NORMAL)
-            return
+    # Worker threads never touch widgets: they post (session, action, value)
+    # events here and drain_ui_events applies them on the Tk thread. Events
+    # from a session that has been superseded are dropped.
+    ui_events = Queue()
+
+    def append_output(message, session=None):
+        ui_events.put((session, "insert", message))
+
+    def clear_output(session=None):
+        ui_events.put((session, "clear", None))
 
+    def set_button_state(state, session=None):
+        ui_events.put((session, "button", state))
+
+    def write_text(text):
+        nonlocal total_lines
         text_widget.config(state=tk.NORMAL)  # Enable to edit
-        text_widget.delete(1.0, tk.END)
-        text_widget.insert(tk.END, f"Searching for: {user_input}\n\n")
+        text_widget.insert(tk.END, text)
         text_widget.config(state=tk.DISABLED)  # Disable again
-        update_total_lines()  # Update line count
+        total_lines += text.count("\n")  # Count only what was added, not the whole buffer
+
+    def drain_ui_events():
+        nonlocal total_lines, current_line, highlighted_line
+        pending = []  # Consecutive inserts are joined into one widget update
+        try:
+            for _ in range(UI_MAX_EVENTS_PER_DRAIN):
+                session, action, value = ui_events.get_nowait()
+                if session is not None and session is not current_session:
+                    continue
+                if action == "insert":
+                    pending.append(value)
+                    continue
+                if pending:
+                    write_text("".join(pending))
+                    pending.clear()
+                if action == "clear":
+                    text_widget.config(state=tk.NORMAL)
+                    text_widget.delete(1.0, tk.END)
+                    text_widget.config(state=tk.DISABLED)
+                    total_lines = 1
+                    current_line = 1
+                    highlighted_line = None  # Deleting the text removed the tags too
+                    stop_karaoke()
+                elif action == "button":
+                    button.config(state=value)
+                elif action == "status":
+                    status_label.config(text=value)
+        except Empty:
+            pass
+        if pending:
+            write_text("".join(pending))
+        update_line_display()
+        root.after(UI_DRAIN_INTERVAL_MS, drain_ui_events)
+
+    def search_lyrics(session, api_key):
+        user_input = session.query
+
+        # Everything this search writes is tagged with its session
+        def output(message):
+            append_output(message, session)
+
+        if not user_input:
+            clear_output(session)
+            output("Please enter a song title.\n")
+            set_button_state(tk.NORMAL, session)
+            return
+
+        clear_output(session)
+        output(f"Searching for: {user_input}\n\n")
 
         # Check if search was stopped
-        if stop_search:
-            text_widget.config(state=tk.NORMAL)  # Enable to edit
-            text_widget.insert(tk.END, "Search was stopped.\n")
-            text_widget.config(state=tk.DISABLED)  # Disable again
-            update_total_lines()  # Update line count
-            button.config(state=tk.NORMAL)
+        if session.cancelled:
+            output("Search was stopped.\n")
+            set_button_state(tk.NORMAL, session)
             return
 
+        # All sources run at once; the best one that answers wins
+        if offline_mode:
+            output("Offline mode: searching cached lyrics only...\n")
+        else:
+            output("Searching Lyrical Nonsense and LyricsPy in parallel (backup sources if both miss)...\n")
+
+        def report_status(source, status):
+            output(f"{source.label}: {status}\n")
+
+        # Lines from a streaming source are shown with their romaji while the page downloads
+        stream_lock = threading.Lock()
+        stream = {"open": True, "source": None, "lines": []}
+        # show_line runs on the download thread, so it only queues lines; romanizing there would stall the read
+        streamed_lines = Queue()
+        stream_finished = object()
+
+        def output_with_romaji(lines):
+            for line, romaji in iter_romanized_lines(lines):
+                output(f"{line}\n{romaji}\n\n")
+
+        def show_line(source, line):
+            with stream_lock:
+                # Only one source streams into the output, and only until the search is decided
+                if not stream["open"] or stream["source"] not in (None, source.name):
+                    return
+                if stream["source"] is None:
+                    stream["source"] = source.name
+                    output(f"\n--- Lyrics from {source.label} (loading) ---\n\n")
+                stream["lines"].append(line)
+                streamed_lines.put(line)
+
+        romanizer = threading.Thread(
+            target=lambda: output_with_romaji(iter(streamed_lines.get, stream_finished)), daemon=True, name="stream-romaji"
+        )
+        romanizer.start()
         try:
-            urls = find_lyrics_urls(user_input)
+            result = search_all_sources(user_input, cancel_event=session.token, on_status=report_status, on_line=show_line)
         except Exception as e:
-            text_widget.config(state=tk.NORMAL)  # Enable to edit
-            text_widget.insert(tk.END, f"Error during search: {e}\n")
-            text_widget.config(state=tk.DISABLED)  # Disable again
-            update_total_lines()  # Update line count
-            button.config(state=tk.NORMAL)
+            output(f"Error during search: {e}\n")
+            set_button_state(tk.NORMAL, session)
             return
+        finally:
+            with stream_lock:
+                stream["open"] = False
+            # Let the streamed lines finish printing before anything else is written
+            streamed_lines.put(stream_finished)
+            romanizer.join()
 
         # Check if search was stopped
-        if stop_search:
-            text_widget.config(state=tk.NORMAL)  # Enable to edit
-            text_widget.insert(tk.END, "Search was stopped.\n")
-            text_widget.config(state=tk.DISABLED)  # Disable again
-            update_total_lines()  # Update line count
-            button.config(state=tk.NORMAL)
+        if session.cancelled:
+            output("Search was stopped.\n")
+            set_button_state(tk.NORMAL, session)
             return
 
-        # Try Lyrical Nonsense (main source)
-        if 'lyrical_nonsense' in urls:
-            text_widget.config(state=tk.NORMAL)  # Enable to edit
-            text_widget.insert(tk.END, f"Found Lyrical Nonsense URL: {urls['lyrical_nonsense']}\n")
-            text_widget.config(state=tk.DISABLED)  # Disable again
-            update_total_lines()  # Update line count
-            
+        if result and result["kind"] == "lyrics":
+            lyrics = result["text"]
+            lyric_lines = lyrics.split("\n")
+            streamed = stream["lines"]
             try:
-                lyrics = get_lyrics_from_lyrical_nonsense(urls['lyrical_nonsense'])
-                if lyrics:
-                    text_widget.config(state=tk.NORMAL)  # Enable to edit
-                    text_widget.insert(tk.END, "\n--- Lyrics from Lyrical Nonsense ---\n\n")
-                    text_widget.insert(tk.END, lyrics)
-                    
-                    # Try to convert to romaji if it's Japanese
-                    text_widget.insert(tk.END, "\n\n--- Romaji conversion ---\n\n")
-                    try:
-                        romaji_result = convert_to_romaji(lyrics)
-                        text_widget.insert(tk.END, romaji_result)
-                    except Exception as e:
-                        text_widget.insert(tk.END, f"Failed to convert lyrics to romaji: {str(e)}")
-                    
-                    # ChatGPT verification if API key is provided
-                    api_key = api_entry.get().strip()
-                    if api_key:
-                        text_widget.insert(tk.END, "\n\n--- ChatGPT Verification ---\n")
-                        text_widget.insert(tk.END, f"API calls this hour: {api_call_count}/{MAX_API_CALLS_PER_HOUR}\n")
-                        
-                        if api_call_count >= MAX_API_CALLS_PER_HOUR:
-                            text_widget.insert(tk.END, "⚠️ Rate limit reached. Please wait before requesting verification.\n")
-                        else:
-                            text_widget.insert(tk.END, "Verifying romaji accuracy...\n")
-                            verification = verify_romaji_with_chatgpt(lyrics, lyrics, api_key)
-                            text_widget.insert(tk.END, verification)
-                    
-                    text_widget.config(state=tk.DISABLED)  # Disable again
-                    update_total_lines()  # Update line count
-                    button.config(state=tk.NORMAL)
-                    return
+                if streamed and stream["source"] == result["source"] and lyric_lines[:len(streamed)] == streamed:
+                    # Most of the song is already on screen; add whatever came after the last streamed line
+                    output_with_romaji(lyric_lines[len(streamed):])
                 else:
-                    text_widget.config(state=tk.NORMAL)  # Enable to edit
-                    text_widget.insert(tk.END, "No lyrics found on Lyrical Nonsense page.\n")
-                    text_widget.config(state=tk.DISABLED)  # Disable again
-                    update_total_lines()  # Update line count
+                    if streamed:
+                        output("(The lines above were incomplete; here are the final lyrics.)\n")
+                    output(f"\n--- Lyrics from {result['label']} (with romaji) ---\n\n")
+                    output_with_romaji(lyric_lines)
             except Exception as e:
-                text_widget.config(state=tk.NORMAL)  # Enable to edit
-                text_widget.insert(tk.END, f"Failed to get lyrics from Lyrical Nonsense: {e}\n")
-                text_widget.config(state=tk.DISABLED)  # Disable again
-                update_total_lines()  # Update line count
-        else:
-            text_widget.config(state=tk.NORMAL)  # Enable to edit
-            text_widget.insert(tk.END, "No lyrics URLs found on Lyrical Nonsense.\n")
-            text_widget.config(state=tk.DISABLED)  # Disable again
-            update_total_lines()  # Update line count
+                output(f"Failed to convert lyrics to romaji: {str(e)}\n")
+            if result["url"]:
+                output(f"Source: {result['url']}\n")
 
-        # Check if search was stopped
-        if stop_search:
-            text_widget.config(state=tk.NORMAL)  # Enable to edit
-            text_widget.insert(tk.END, "Search was stopped.\n")
-            text_widget.config(state=tk.DISABLED)  # Disable again
-            update_total_lines()  # Update line count
-            button.config(state=tk.NORMAL)
-            return
+            # Every line is in the line cache by now, so this is only a lookup
+            romaji_result = convert_to_romaji(lyrics)
 
-        text_widget.config(state=tk.NORMAL)  # Enable to edit
-        text_widget.insert(tk.END, "Trying fallback with LyricsPy...\n")
-        text_widget.config(state=tk.DISABLED)  # Disable again
-        update_total_lines()  # Update line count
-        
-        fallback = fallback_lyrics(user_input)
-        if fallback:
-            text_widget.config(state=tk.NORMAL)  # Enable to edit
-            text_widget.insert(tk.END, "\n--- Lyrics from LyricsPy (likely Japanese) ---\n\n")
-            text_widget.insert(tk.END, fallback)
-            text_widget.insert(tk.END, "\n\n--- Romaji conversion ---\n\n")
-            try:
-                romaji_result = convert_to_romaji(fallback)
-                text_widget.insert(tk.END, romaji_result)
-            except Exception as e:
-                text_widget.insert(tk.END, f"Failed to convert lyrics to romaji: {str(e)}")
-            text_widget.config(state=tk.DISABLED)  # Disable again
-            update_total_lines()  # Update line count
+            # ChatGPT verification if API key is provided
+            if api_key:
+                output("\n\n--- ChatGPT Verification ---\n")
+                output(f"API calls this hour: {openai_limiter.used()}/{MAX_API_CALLS_PER_HOUR}\n")
+
+                if openai_limiter.remaining() == 0:
+                    output("⚠️ Rate limit reached. Please wait before requesting verification.\n")
+                else:
+                    output("Verifying romaji accuracy...\n")
+                    verification = verify_romaji_with_chatgpt(lyrics, romaji_result, api_key)
+                    output(verification)
+        elif result:
+            output(f"\n--- {result['label']} ---\n\n{result['text']}\n")
+        elif offline_mode:
+            output("Offline mode: no cached lyrics for this title.\n")
         else:
-            text_widget.config(state=tk.NORMAL)  # Enable to edit
-            text_widget.insert(tk.END, "No lyrics found with LyricsPy.\n")
-            text_widget.config(state=tk.DISABLED)  # Disable again
-            update_total_lines()  # Update line count
-            
-            # Try alternative anime lyrics sources
-            text_widget.insert(tk.END, "\nTrying alternative anime lyrics sources...\n")
-            alt_result = try_alternative_anime_sources(user_input)
-            if alt_result:
-                text_widget.insert(tk.END, alt_result)
-            else:
-                text_widget.insert(tk.END, "No alternative anime sources found.\n")
-            
-            # Try comprehensive anime lyrics backup search
-            text_widget.insert(tk.END, "\n🔍 Performing comprehensive anime lyrics backup search...\n")
-            backup_result = search_anime_lyrics_backup(user_input)
-            if backup_result:
-                text_widget.insert(tk.END, backup_result)
-            else:
-                text_widget.insert(tk.END, "No backup anime sources found.\n")
-            
-            # Try additional online search
-            text_widget.insert(tk.END, "\nTrying additional online sources...\n")
-            online_result = search_lyrics_online(user_input)
-            if online_result:
-                text_widget.insert(tk.END, online_result)
-            else:
-                text_widget.insert(tk.END, "No additional sources found.\n")
-                
-                # Provide helpful suggestions
-                text_widget.insert(tk.END, "\n--- Suggestions ---\n")
-                text_widget.insert(tk.END, "• Try searching with different song title variations\n")
-                text_widget.insert(tk.END, "• Check if the song exists on lyrical-nonsense.com\n")
-                text_widget.insert(tk.END, "• Try searching manually on: lyrical-nonsense.com, genius.com, or azlyrics.com\n")
-                text_widget.insert(tk.END, "• Try alternative anime sites: jpopasia.com, utaten.com, petitlyrics.com\n")
-                text_widget.insert(tk.END, "• Check anime database sites: myanimelist.net, anilist.co, anidb.net\n")
-                text_widget.insert(tk.END, "• Search Japanese music sites: uta-net.com, joysound.com, dam-ch.com\n")
-            text_widget.config(state=tk.DISABLED)  # Disable again
-            update_total_lines()  # Update line count
+            output("\nNo lyrics or backup sources found.\n")
 
-        button.config(state=tk.NORMAL)
+            # Provide helpful suggestions
+            output("\n--- Suggestions ---\n")
+            output("• Try searching with different song title variations\n")
+            output("• Check if the song exists on lyrical-nonsense.com\n")
+            output("• Try searching manually on: lyrical-nonsense.com, genius.com, or azlyrics.com\n")
+            output("• Try alternative anime sites: jpopasia.com, utaten.com, petitlyrics.com\n")
+            output("• Check anime database sites: myanimelist.net, anilist.co, anidb.net\n")
+            output("• Search Japanese music sites: uta-net.com, joysound.com, dam-ch.com\n")
+
+        set_button_state(tk.NORMAL, session)
+
+    def search_with_timings(session, api_key):
+        before = metrics_snapshot() if metrics.enabled else None
+        try:
+            search_lyrics(session, api_key)
+        finally:
+            if before is not None and metrics.enabled:
+                ui_events.put((session, "status", format_stage_summary(before, metrics_snapshot())))
 
     def on_click():
-        nonlocal stop_search
-        stop_search = False  # Reset stop flag
+        nonlocal current_session
+        set_offline_mode(offline_var.get())
         button.config(state=tk.DISABLED)  # disable button while searching
-        threading.Thread(target=search_lyrics, daemon=True).start()
+        # Read the inputs here, on the Tk thread, and hand them to the worker
+        user_input = entry.get().strip()  # strip input spaces
+        api_key = api_entry.get().strip()
+        # A search still running is cancelled: its requests are aborted and its output dropped
+        current_session = SearchSession(user_input, previous=current_session).start(search_with_timings, api_key)
 
     def stop_search_func():
-        nonlocal stop_search
-        stop_search = True
-        text_widget.insert(tk.END, "\n🛑 Stopping search...\n")
+        if current_session is not None:
+            current_session.cancel()
+        append_output("\n🛑 Stopping search...\n")
         button.config(state=tk.NORMAL)
 
     button.config(command=on_click)
@@ -730,6 +4282,10 @@ def main():
     stop_button = tk.Button(button_frame, text="Stop Search", bg="orange", width=15, height=2, font=("Arial", 12, "bold"), command=stop_search_func)
     stop_button.pack(side="left", padx=10)
 
+    # Stage timings of the last search, filled in while "Show timings" is on
+    status_label = tk.Label(root, text="", font=("Arial", 9), fg="gray", anchor="w")
+    status_label.pack(fill="x", padx=20, pady=(0,5))
+
     # Add keyboard shortcut for stopping (Ctrl+C equivalent)
     def on_key_press(event):
         if event.state == 4 and event.keysym == 'c':  # Ctrl+C
@@ -737,7 +4293,13 @@ def main():
     
     root.bind('<Key>', on_key_press)
 
+    root.after(UI_DRAIN_INTERVAL_MS, drain_ui_events)
+    if WARM_UP_ENABLED:
+        # Once the window is on screen, so loading the libraries does not delay it
+        root.after(WARM_UP_DELAY_MS, start_warm_up)
     root.mainloop()
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(cli(sys.argv[1:]))
     main()
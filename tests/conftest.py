@@ -0,0 +1,39 @@
+import os
+import sys
+
+# Memory-only caches, so the tests never read or write the user's cache directory
+os.environ["ROMAJI_LYRICS_DISK_CACHE"] = "0"
+os.environ["ROMAJI_LYRICS_WARM_UP"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import main
+
+def pytest_configure(config):
+    # pykakasi's old setMode/getConverter API, which main.py still uses, warns on every call
+    config.addinivalue_line("filterwarnings", "ignore:Call to deprecated method:DeprecationWarning")
+
+@pytest.fixture
+def fresh_state(monkeypatch):
+    """Empty caches, index and source stats, restored after the test"""
+    monkeypatch.setattr(main, "lyrics_cache", main.LyricsCache())
+    monkeypatch.setattr(main, "lyrics_index", main.LyricsIndex())
+    monkeypatch.setattr(main, "source_stats", main.SourceStats())
+    monkeypatch.setattr(main, "search_limiter", main.RateLimiter(10 ** 9, 1, name="test search"))
+    monkeypatch.setattr(main, "offline_mode", False)
+    return main
+
+@pytest.fixture
+def make_source():
+    """Build a source for the sources= argument of search_all_sources"""
+    def make(name, func, priority=0, deadline=5, kind="lyrics"):
+        return main.FunctionSource(func, name=name, label=name, kind=kind, priority=priority, deadline=deadline, offline=True)
+    return make
+
+@pytest.fixture
+def line_cache(monkeypatch):
+    """An empty in-memory romaji line cache"""
+    cache = main.LineCache("romaji_lines", max_entries=100)
+    monkeypatch.setattr(main, "romaji_line_cache", cache)
+    return cache
@@ -0,0 +1,101 @@
+"""The extraction code as it was before the single-pass rewrites
+
+The equivalence tests compare the current implementation with these on
+random input, so a change in behaviour shows up as a failing test rather
+than as a claim in a commit message.
+"""
+STOP_KEYWORDS = ['favorite', 'view favorites', 'copy link', 'artist:', 'tie-in:', 'status', 'comments', 'transliterated by:', 'join our', 'send me a coffee', 'home', 'artists', 'series', 'reviews', 'support ln', 'about', 'join us', 'submit', 'video', 'related']
+FALLBACK_STOP_KEYWORDS = ['favorite', 'view favorites', 'copy link', 'artist:', 'tie-in:', 'status', 'comments', 'transliterated by:', 'join our', 'send me a coffee', 'home', 'artists', 'series', 'reviews', 'support ln', 'about', 'join us']
+LYRICS_WORDS = ['lyrics', '歌詞', 'romaji', 'romanized']
+
+def find_div_with_numbered_lyrics(soup):
+    for div in soup.find_all("div"):
+        text = div.get_text()
+        if text.count("1.") > 0 and text.count("2.") > 0 and text.count("3.") > 0:
+            if 100 < len(text) < 10000:
+                return div
+    return None
+
+def find_div_with_lyrics_patterns(soup):
+    for div in soup.find_all("div"):
+        text = div.get_text().lower()
+        if any(pattern in text for pattern in LYRICS_WORDS):
+            if any(f"{i}." in text for i in range(1, 11)):
+                return div
+    return None
+
+def select_lyrics_container(soup):
+    strategies = [
+        lambda: soup.find("div", class_="lyrics"),
+        lambda: soup.find("div", id="lyrics"),
+        lambda: soup.find("main") or soup.find("article"),
+        lambda: find_div_with_numbered_lyrics(soup),
+        lambda: find_div_with_lyrics_patterns(soup),
+    ]
+    for strategy in strategies:
+        result = strategy()
+        if result:
+            return result
+    return None
+
+def classify(line):
+    """The keyword scans extract_clean_lyrics used before LyricsLineClassifier"""
+    if not line:
+        return "blank"
+    if any(keyword in line.lower() for keyword in LYRICS_WORDS):
+        return "header"
+    if any(keyword in line.lower() for keyword in STOP_KEYWORDS):
+        return "stop"
+    if line[0].isdigit() and '.' in line[:3]:
+        return "numbered"
+    if len(line) < 200 and not line.startswith(('http', 'www', '©', 'copyright')):
+        return "continuation"
+    return "noise"
+
+def clean_lyrics_from_lines(lines):
+    """extract_clean_lyrics after get_text("\\n", strip=True).split("\\n")"""
+    lyrics_lines = []
+    current_numbered_line = ""
+    current_line_content = []
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if any(keyword in line.lower() for keyword in LYRICS_WORDS):
+            continue
+        if any(keyword in line.lower() for keyword in STOP_KEYWORDS):
+            break
+        if line and line[0].isdigit() and '.' in line[:3]:
+            if current_numbered_line and current_line_content:
+                lyrics_lines.append(current_numbered_line + " " + " ".join(current_line_content))
+            current_numbered_line = line
+            current_line_content = []
+        elif current_numbered_line and len(line) < 200 and not line.startswith(('http', 'www', '©', 'copyright')):
+            current_line_content.append(line)
+
+    if current_numbered_line and current_line_content:
+        lyrics_lines.append(current_numbered_line + " " + " ".join(current_line_content))
+    elif current_numbered_line:
+        lyrics_lines.append(current_numbered_line)
+
+    if not lyrics_lines:
+        current_numbered_line = ""
+        current_line_content = []
+        for line in lines:
+            line = line.strip()
+            if line and line[0].isdigit() and '.' in line[:3]:
+                if current_numbered_line and current_line_content:
+                    lyrics_lines.append(current_numbered_line + " " + " ".join(current_line_content))
+                current_numbered_line = line
+                current_line_content = []
+            elif current_numbered_line and len(line) < 200 and not any(keyword in line.lower() for keyword in FALLBACK_STOP_KEYWORDS):
+                current_line_content.append(line)
+        if current_numbered_line and current_line_content:
+            lyrics_lines.append(current_numbered_line + " " + " ".join(current_line_content))
+        elif current_numbered_line:
+            lyrics_lines.append(current_numbered_line)
+
+    if lyrics_lines:
+        return '\n'.join(lyrics_lines)
+    return None
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import main
+
+pytest.importorskip("aiohttp")
+
+def search_all(sources):
+    async def run():
+        async with main.create_async_http_session() as session:
+            return await main.async_search_all_sources("gurenge", session=session, sources=sources, use_index=False)
+    return asyncio.run(run())
+
+def test_blocking_sources_run_on_the_async_executor(fresh_state, make_source):
+    threads = []
+
+    def found(title, cancel_event):
+        threads.append(threading.current_thread().name)
+        return {"kind": "lyrics", "text": "1. la", "url": None}
+
+    assert search_all([make_source("found", found)])["source"] == "found"
+    assert threads[0].startswith("async-blocking")
+
+def test_link_sources_wait_for_the_lyrics_sources(fresh_state, make_source):
+    calls = []
+
+    def found(title, cancel_event):
+        time.sleep(0.1)
+        return {"kind": "lyrics", "text": "1. la", "url": None}
+
+    def links(title, cancel_event):
+        calls.append(title)
+        return {"kind": "links", "text": "https://example.com/", "url": None}
+
+    sources = [make_source("found", found), make_source("links", links, priority=1, kind="links")]
+    assert search_all(sources)["source"] == "found"
+    assert calls == []
+
+def test_a_source_that_misses_its_deadline_is_recorded_once(fresh_state, make_source):
+    def slow(title, cancel_event):
+        time.sleep(0.4)
+        return None
+
+    def slower(title, cancel_event):
+        time.sleep(0.8)
+        return None
+
+    sources = [make_source("slow", slow, deadline=0.2), make_source("slower", slower, priority=1)]
+    assert search_all(sources) is None
+    time.sleep(0.3)
+    assert main.source_stats.get("slow")["attempts"] == 1
+    assert main.source_stats.get("slower")["attempts"] == 1
+
+def test_the_search_slot_is_awaited_on_the_event_loop(fresh_state, monkeypatch):
+    def blocking_acquire(*args, **kwargs):
+        raise AssertionError("an executor thread waited for a search slot")
+
+    monkeypatch.setattr(main.search_limiter, "acquire", blocking_acquire)
+    monkeypatch.setattr(main, "search", lambda query, num_results=10: iter(["https://www.lyrical-nonsense.com/gurenge/"]))
+    urls = asyncio.run(main.async_find_lyrics_urls("gurenge"))
+    assert urls == {"lyrical_nonsense": "https://www.lyrical-nonsense.com/gurenge/"}
+    assert main.search_limiter.used() == 1
@@ -0,0 +1,121 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import main
+
+def test_callbacks_run_once_when_set():
+    token = main.CancelToken()
+    calls = []
+    token.add_callback(lambda: calls.append("a"))
+    token.add_callback(lambda: calls.append("b"))
+    token.set()
+    token.set()
+    assert calls == ["a", "b"]
+    assert token.is_set()
+
+def test_callback_added_after_set_runs_at_once():
+    token = main.CancelToken()
+    token.set()
+    calls = []
+    token.add_callback(lambda: calls.append(1))
+    assert calls == [1]
+
+def test_removed_callback_does_not_run():
+    token = main.CancelToken()
+    calls = []
+    callback = lambda: calls.append(1)
+    token.add_callback(callback)
+    token.remove_callback(callback)
+    token.set()
+    assert calls == []
+
+def test_a_failing_callback_does_not_stop_the_others(capsys):
+    token = main.CancelToken()
+    calls = []
+
+    def fail():
+        raise RuntimeError("boom")
+
+    token.add_callback(fail)
+    token.add_callback(lambda: calls.append(1))
+    token.set()
+    assert calls == [1]
+    assert "boom" in capsys.readouterr().out
+
+def test_child_is_cancelled_with_its_parent_but_not_the_other_way():
+    parent = main.CancelToken()
+    child = parent.child()
+    other = parent.child()
+    other.set()
+    assert not parent.is_set() and not child.is_set()
+    parent.set()
+    assert child.is_set()
+
+def test_link_cancel_accepts_plain_events():
+    undo = main.link_cancel(threading.Event(), lambda: None)
+    undo()
+    token = main.CancelToken()
+    calls = []
+    undo = main.link_cancel(token, lambda: calls.append(1))
+    undo()
+    token.set()
+    assert calls == []
+
+def test_a_new_session_cancels_the_previous_one():
+    first = main.SearchSession("gurenge")
+    second = main.SearchSession("homura", previous=first)
+    assert first.cancelled and not second.cancelled
+
+class StallingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/stall-headers":
+            time.sleep(5)
+            return
+        if self.path == "/stall-body":
+            self.send_response(200)
+            self.send_header("Content-Length", "100000")
+            self.end_headers()
+            self.wfile.write(b"x" * 1000)
+            self.wfile.flush()
+            time.sleep(5)
+            return
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StallingHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+@pytest.mark.parametrize("path", ["/stall-headers", "/stall-body"])
+def test_cancelling_aborts_a_blocked_request(server_url, path):
+    token = main.CancelToken()
+    threading.Timer(0.5, token.set).start()
+    start = time.monotonic()
+    with pytest.raises(main.SearchCancelled):
+        main.http_get(server_url + path, timeout=10, cancel_event=token)
+    assert time.monotonic() - start < 1.5
+
+    # The pool still hands out working connections afterwards
+    assert main.http_get(server_url + "/ok").content == b"ok"
+
+def test_a_cancelled_token_stops_before_connecting(server_url):
+    token = main.CancelToken()
+    token.set()
+    with pytest.raises(main.SearchCancelled):
+        main.http_get(server_url + "/ok", cancel_event=token)
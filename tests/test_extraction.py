@@ -0,0 +1,120 @@
+import random
+
+from bs4 import BeautifulSoup
+
+import main
+import legacy
+
+WORDS = [
+    "1.", "2.", "3.", "7.", "10.", "12.", "Lyrics", "歌詞", "romaji", "Romanized", "強くなれる", "僕を連れて",
+    "tsuyoku", "nareru", "riyuu", "Home", "Artist:", "Artists", "Status", "Related", "Video", "©2020",
+    "http://example.com", "www.example.com", "Copyright", "la", "na", "&amp;", "x" * 120, "y" * 250,
+]
+
+def random_text(rng):
+    # Spaces at both ends, so no marker ("1.") or keyword is split across two text nodes
+    return " " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 6))) + " "
+
+def random_tree(rng, depth=0):
+    parts = []
+    for _ in range(rng.randint(1, 4)):
+        roll = rng.random()
+        if roll < 0.35 or depth > 5:
+            parts.append(random_text(rng))
+        else:
+            tag = rng.choice(["div", "div", "div", "p", "span", "main", "article", "section"])
+            attrs = ""
+            if tag == "div" and rng.random() < 0.1:
+                attrs = ' class="lyrics"'
+            elif tag == "div" and rng.random() < 0.1:
+                attrs = ' id="lyrics"'
+            parts.append(f"<{tag}{attrs}>{random_tree(rng, depth + 1)}</{tag}>")
+    return "".join(parts)
+
+def random_line(rng):
+    roll = rng.random()
+    if roll < 0.1:
+        return ""
+    if roll < 0.4:
+        return f"{rng.randint(1, 99)}."
+    if roll < 0.5:
+        return f"{rng.randint(1, 99)}. {rng.choice(WORDS)}"
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3)))
+
+def test_select_lyrics_container_matches_the_strategy_chain():
+    rng = random.Random(8)
+    for _ in range(300):
+        soup = BeautifulSoup(f"<html><body>{random_tree(rng)}</body></html>", main.HTML_PARSER)
+        assert main.select_lyrics_container(soup) is legacy.select_lyrics_container(soup)
+        assert main.find_div_with_numbered_lyrics(soup) is legacy.find_div_with_numbered_lyrics(soup)
+        assert main.find_div_with_lyrics_patterns(soup) is legacy.find_div_with_lyrics_patterns(soup)
+
+def test_select_lyrics_container_handles_deep_nesting():
+    html = "<div>" * 800 + "Lyrics 1. la 2. la 3. la" + "</div>" * 800
+    soup = BeautifulSoup(html, "html.parser")
+    assert main.select_lyrics_container(soup) is legacy.select_lyrics_container(soup)
+
+def test_line_classifier_matches_keyword_scans():
+    rng = random.Random(10)
+    for _ in range(5000):
+        line = random_line(rng).strip()
+        assert main.line_classifier.classify(line) == legacy.classify(line), line
+
+def test_clean_lyrics_match_the_old_extraction():
+    rng = random.Random(10)
+    for _ in range(2000):
+        lines = [random_line(rng) for _ in range(rng.randint(0, 30))]
+        expected = legacy.clean_lyrics_from_lines(lines)
+        assert ("\n".join(main.iter_clean_lyrics(lines)) or None) == expected, lines
+
+def random_lyrics_page(rng):
+    body = []
+    for _ in range(rng.randint(0, 25)):
+        roll = rng.random()
+        if roll < 0.5:
+            body.append(f"<p>{rng.randint(1, 40)}.</p><p>{random_text(rng)}</p>")
+        elif roll < 0.65:
+            body.append(f"{random_text(rng)}<br>{random_text(rng)}")
+        elif roll < 0.75:
+            body.append(f"<!-- {random_text(rng)} -->")
+        elif roll < 0.8:
+            body.append("<script>var lyrics = '1. not lyrics';</script>")
+        else:
+            body.append(f"<div><span>{random_text(rng)}</span></div>")
+    return (
+        "<html><body><nav>Home Artists</nav><div class=\"other\">1. menu</div>"
+        f"<div class=\"lyrics\">{''.join(body)}</div><footer>About</footer></body></html>"
+    )
+
+def test_streamed_lines_match_extract_clean_lyrics():
+    rng = random.Random(19)
+    for _ in range(500):
+        html = random_lyrics_page(rng)
+        data = html.encode("utf-8")
+        streamed = []
+        scanner = main.LyricsContainerScanner(on_line=streamed.append)
+        position = 0
+        # Network-like chunks of random size, which split tags, entities and UTF-8 characters
+        while position < len(data):
+            size = rng.randint(1, 64)
+            if scanner.feed_bytes(data[position:position + size]):
+                break
+            position += size
+        container = BeautifulSoup(html, main.HTML_PARSER).find("div", class_="lyrics")
+        expected = main.extract_clean_lyrics(container)
+        assert scanner.complete
+        assert streamed == (expected.split("\n") if expected else []), html
+
+def test_extract_lyrics_from_fixture_pages():
+    import json
+    import os
+    fixtures = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures")
+    with open(os.path.join(fixtures, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    for name in manifest:
+        with open(os.path.join(fixtures, name), encoding="utf-8") as f:
+            html = f.read()
+        soup = BeautifulSoup(html, main.HTML_PARSER)
+        expected = legacy.clean_lyrics_from_lines(legacy.select_lyrics_container(soup).get_text("\n", strip=True).split("\n"))
+        assert expected
+        assert main.extract_lyrics_from_html(html) == expected, name
@@ -0,0 +1,50 @@
+import sqlite3
+
+import pytest
+
+import main
+
+PAGE = "<html><body><div class=\"lyrics\"><p>1.</p><p>強くなれる理由を知った</p><p>2.</p><p>僕を連れて進め</p></div></body></html>"
+
+@pytest.fixture
+def pages(tmp_path):
+    directory = tmp_path / "pages"
+    directory.mkdir()
+    for i in range(4):
+        (directory / f"song{i}.html").write_text(PAGE, encoding="utf-8")
+    return str(directory)
+
+def test_pages_are_ingested_with_a_pool(pages, tmp_path):
+    output = str(tmp_path / "lyrics.sqlite3")
+    counts = main.run_ingest([pages], output, workers=2)
+    assert counts == {"pages": 4, "lyrics": 4, "errors": 0}
+    db = sqlite3.connect(output)
+    assert db.execute("SELECT COUNT(*) FROM pages WHERE lyrics IS NOT NULL").fetchone()[0] == 4
+
+class FailingDb:
+    """Wraps the output database; every write fails"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, *args):
+        return self.db.execute(*args)
+
+    def executemany(self, *args):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self.db.__enter__()
+
+    def __exit__(self, *exc):
+        return self.db.__exit__(*exc)
+
+def test_an_error_is_raised_instead_of_hidden_by_the_pool(pages, tmp_path, monkeypatch):
+    open_ingest_db = main.open_ingest_db
+    monkeypatch.setattr(main, "open_ingest_db", lambda path: FailingDb(open_ingest_db(path)))
+    monkeypatch.setattr(main, "INGEST_COMMIT_ROWS", 1)
+    with pytest.raises(sqlite3.OperationalError, match="disk I/O error"):
+        main.run_ingest([pages], str(tmp_path / "lyrics.sqlite3"), workers=2)
@@ -0,0 +1,111 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import main
+
+PAGE = (
+    "<html><body><nav>Home</nav><div class=\"lyrics\"><h2>Lyrics</h2>"
+    "<p>1.</p><p>強くなれる理由を知った</p><p>2.</p><p>僕を連れて進め</p>"
+    "</div><footer>About</footer></body></html>"
+).encode("utf-8")
+ETAG = '"v1"'
+
+class PageHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests_seen = []
+
+    def do_GET(self):
+        PageHandler.requests_seen.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def page_url():
+    PageHandler.requests_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/gurenge/"
+    server.shutdown()
+    server.server_close()
+
+def test_search_results_expire_after_their_ttl(monkeypatch):
+    cache = main.LyricsCache()
+    monkeypatch.setattr(main, "SEARCH_CACHE_TTL", 0.2)
+    cache.put_search("query", "https://example.com/song/")
+    assert cache.get_search("query") == (True, "https://example.com/song/")
+    time.sleep(0.25)
+    assert cache.get_search("query") == (False, None)
+    # Offline mode still answers from expired entries
+    assert cache.get_search("query", allow_stale=True) == (True, "https://example.com/song/")
+
+def test_misses_have_their_own_shorter_ttl(monkeypatch):
+    cache = main.LyricsCache()
+    monkeypatch.setattr(main, "SEARCH_MISS_CACHE_TTL", 0.2)
+    cache.put_search("query", None)
+    assert cache.get_search("query") == (True, None)
+    time.sleep(0.25)
+    assert cache.get_search("query") == (False, None)
+    assert cache.stats()["search_hits"] == 1
+    assert cache.stats()["search_misses"] == 1
+
+def test_pages_go_stale_and_are_revalidated(monkeypatch):
+    cache = main.LyricsCache()
+    monkeypatch.setattr(main, "PAGE_CACHE_FRESH_SECONDS", 0.2)
+    cache.put_page("https://example.com/song/", "1. la", etag=ETAG)
+    assert cache.get_page("https://example.com/song/")["fresh"]
+    time.sleep(0.25)
+    entry = cache.get_page("https://example.com/song/")
+    assert not entry["fresh"] and entry["etag"] == ETAG
+    cache.mark_revalidated("https://example.com/song/")
+    assert cache.get_page("https://example.com/song/")["fresh"]
+    assert cache.stats()["page_revalidations"] == 1
+
+def test_least_recently_used_pages_are_evicted():
+    cache = main.LyricsCache(max_bytes=25)
+    cache.put_page("a", "a" * 10)
+    cache.put_page("b", "b" * 10)
+    time.sleep(0.01)
+    cache.get_page("a")  # b is now the least recently used
+    time.sleep(0.01)
+    cache.put_page("c", "c" * 10)
+    assert cache.get_page("b") is None
+    assert cache.get_page("a") and cache.get_page("c")
+
+def test_stale_page_is_revalidated_with_its_etag(fresh_state, monkeypatch, page_url):
+    lyrics = main.get_lyrics_from_lyrical_nonsense(page_url)
+    assert lyrics.split("\n") == ["1. 強くなれる理由を知った", "2. 僕を連れて進め"]
+    assert PageHandler.requests_seen == [None]
+
+    # Fresh: answered from the cache without a request
+    assert main.get_lyrics_from_lyrical_nonsense(page_url) == lyrics
+    assert PageHandler.requests_seen == [None]
+
+    # Stale: a conditional GET, answered 304, keeps the cached lyrics
+    monkeypatch.setattr(main, "PAGE_CACHE_FRESH_SECONDS", 0)
+    assert main.get_lyrics_from_lyrical_nonsense(page_url) == lyrics
+    assert PageHandler.requests_seen == [None, ETAG]
+    assert main.lyrics_cache.stats()["page_revalidations"] == 1
+
+def test_offline_mode_uses_stale_pages_and_never_fetches(fresh_state, monkeypatch, page_url):
+    main.lyrics_cache.put_page(page_url, "1. la", etag=ETAG)
+    monkeypatch.setattr(main, "PAGE_CACHE_FRESH_SECONDS", 0)
+    monkeypatch.setattr(main, "offline_mode", True)
+    assert main.get_lyrics_from_lyrical_nonsense(page_url) == "1. la"
+    assert main.get_lyrics_from_lyrical_nonsense(page_url + "other/") is None
+    assert PageHandler.requests_seen == []
@@ -0,0 +1,70 @@
+import main
+
+LYRICS = "1. 強くなれる理由を知った\n2. 僕を連れて進め"
+
+def test_exact_keys_cover_spelling_kana_and_romaji():
+    index = main.LyricsIndex()
+    index.add("紅蓮華", LYRICS, url="https://www.lyrical-nonsense.com/global/lyrics/lisa/gurenge/", source="lyrical_nonsense")
+    for title in ("紅蓮華", "ぐれんげ", "Guren-ge", "GURENGE!"):
+        song = index.lookup(title, exact=True)
+        assert song and song["title"] == "紅蓮華", title
+        assert song["score"] == 1.0
+
+def test_a_url_seen_again_gains_the_new_title_as_a_key():
+    index = main.LyricsIndex()
+    url = "https://www.lyrical-nonsense.com/global/lyrics/lisa/gurenge/"
+    index.add("紅蓮華", LYRICS, url=url)
+    assert index.lookup("Red Lotus", exact=True) is None
+    index.add("Red Lotus", LYRICS, url=url)
+    assert index.lookup("Red Lotus", exact=True)["url"] == url
+    assert len(index) == 1
+
+def test_fuzzy_matches_are_scored_but_not_trusted_by_searches(fresh_state):
+    main.lyrics_index.add("Against", LYRICS, url="https://example.com/against/", source="test")
+    song = main.lyrics_index.lookup("Again")
+    assert song["title"] == "Against" and song["score"] < 1.0
+    assert main.lyrics_index.lookup("Again", exact=True) is None
+    assert main.lookup_local_lyrics("Again") is None
+    assert main.lookup_local_lyrics("against")["url"] == "https://example.com/against/"
+
+def test_fuzzy_threshold():
+    index = main.LyricsIndex()
+    index.add("Blue Bird", LYRICS, url="https://example.com/blue-bird/")
+    assert index.lookup("Blue Birds")["title"] == "Blue Bird"
+    assert index.lookup("Something Else Entirely") is None
+
+def test_search_all_sources_skips_the_network_only_for_exact_matches(fresh_state, make_source):
+    calls = []
+
+    def source(title, cancel_event):
+        calls.append(title)
+        return {"kind": "lyrics", "text": LYRICS, "url": "https://example.com/blue-bird-2/"}
+
+    sources = [make_source("test", source)]
+    main.lyrics_index.add("Blue Bird", "1. other song", url="https://example.com/blue-bird/", source="test")
+
+    result = main.search_all_sources("Blue Bird 2", sources=sources)
+    assert calls == ["Blue Bird 2"] and result["source"] == "test"
+
+    # The network result was remembered, so the same title is now answered locally
+    result = main.search_all_sources("Blue Bird 2", sources=sources)
+    assert calls == ["Blue Bird 2"] and result["source"] == "local_index"
+    assert result["text"] == LYRICS
+
+def test_the_newest_song_stored_under_a_key_gets_it(tmp_path):
+    path = str(tmp_path / "lyrics_index.sqlite3")
+    index = main.LyricsIndex(db_path=path)
+    index.add("Blue Bird", "1. old", url="https://example.com/blue-bird-cover/")
+    index.add("Blue Bird", LYRICS, url="https://example.com/blue-bird/")
+    assert index.lookup("Blue Bird", exact=True)["url"] == "https://example.com/blue-bird/"
+    assert index.lookup("Blue Birds")["url"] == "https://example.com/blue-bird/"
+    # The cover keeps its URL slug as a key of its own
+    assert index.lookup("blue bird cover", exact=True)["url"] == "https://example.com/blue-bird-cover/"
+    assert main.LyricsIndex(db_path=path).lookup("Blue Bird", exact=True)["url"] == "https://example.com/blue-bird/"
+
+def test_lookup_command_shows_fuzzy_matches(fresh_state, capsys):
+    main.lyrics_index.add("Blue Bird", LYRICS, url="https://example.com/blue-bird/")
+    assert main.cli(["lookup", "Blue Birds"]) == 0
+    out = capsys.readouterr().out
+    assert out.startswith("Blue Bird (similarity") and LYRICS in out
+    assert main.cli(["lookup", "Something Else Entirely"]) == 1
@@ -0,0 +1,79 @@
+import threading
+import time
+
+import main
+
+def test_quota_makes_later_calls_wait_for_the_window():
+    limiter = main.RateLimiter(3, 0.5)
+    start = time.monotonic()
+    for _ in range(3):
+        assert limiter.acquire(timeout=1)
+    assert time.monotonic() - start < 0.1
+    assert limiter.remaining() == 0
+    assert limiter.acquire(timeout=2)
+    assert time.monotonic() - start >= 0.45
+
+def test_calls_are_spaced_by_min_interval():
+    limiter = main.RateLimiter(100, 60, min_interval=0.1)
+    start = time.monotonic()
+    for _ in range(4):
+        assert limiter.acquire(timeout=1)
+    assert time.monotonic() - start >= 0.28
+    assert limiter.used() == 4
+
+def test_gives_up_at_once_when_the_slot_opens_after_the_timeout():
+    limiter = main.RateLimiter(1, 10)
+    assert limiter.acquire()
+    start = time.monotonic()
+    assert not limiter.acquire(timeout=0.5)
+    assert time.monotonic() - start < 0.1
+    assert limiter.used() == 1
+
+def test_cancel_event_releases_a_waiting_caller():
+    limiter = main.RateLimiter(1, 10)
+    limiter.acquire()
+    cancel = threading.Event()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(limiter.acquire(cancel_event=cancel)))
+    waiter.start()
+    time.sleep(0.2)
+    cancel.set()
+    waiter.join(1)
+    assert not waiter.is_alive()
+    assert results == [False]
+
+def test_waiting_callers_are_served_in_arrival_order():
+    limiter = main.RateLimiter(100, 60, min_interval=0.05)
+    order = []
+    threads = []
+    for i in range(5):
+        thread = threading.Thread(target=lambda i=i: limiter.acquire(timeout=5) and order.append(i))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.01)  # Arrive in index order
+    for thread in threads:
+        thread.join()
+    assert order == list(range(5))
+
+def test_window_slides():
+    limiter = main.RateLimiter(2, 0.3)
+    limiter.acquire()
+    limiter.acquire()
+    assert limiter.remaining() == 0
+    time.sleep(0.35)
+    assert limiter.remaining() == 2
+
+def test_acquire_async_sleeps_for_its_turn():
+    limiter = main.RateLimiter(100, 60, min_interval=0.1)
+
+    async def take(count):
+        return [await limiter.acquire_async(timeout=2) for _ in range(count)]
+
+    start = time.monotonic()
+    assert main.asyncio.run(take(3)) == [True, True, True]
+    assert time.monotonic() - start >= 0.18
+
+def test_acquire_async_respects_its_timeout():
+    limiter = main.RateLimiter(1, 10)
+    limiter.acquire()
+    assert main.asyncio.run(limiter.acquire_async(timeout=0.2)) is False
@@ -0,0 +1,46 @@
+import main
+
+SONG = "強くなれる理由を知った\n僕を連れて進め\n\n強くなれる理由を知った"
+
+def legacy_convert(text):
+    """convert_to_romaji before the shared converter: a new kakasi object per call"""
+    from pykakasi import kakasi
+    kakasi_obj = kakasi()
+    kakasi_obj.setMode("J", "a")
+    kakasi_obj.setMode("K", "a")
+    kakasi_obj.setMode("H", "a")
+    return kakasi_obj.getConverter().do(text)
+
+def test_conversion_matches_a_fresh_converter(line_cache):
+    assert main.convert_to_romaji(SONG) == legacy_convert(SONG)
+
+def test_repeated_lines_are_converted_once(line_cache):
+    main.convert_to_romaji(SONG)
+    stats = line_cache.stats()
+    assert len(line_cache._entries) == 2
+    main.convert_to_romaji(SONG)
+    assert line_cache.stats()["hits"] > stats["hits"]
+
+def test_lines_differing_only_in_width_share_an_entry(line_cache):
+    main.convert_to_romaji("ＡＢＣ")
+    main.convert_to_romaji("ABC")
+    assert len(line_cache._entries) == 1
+
+def test_least_recently_used_lines_are_evicted(monkeypatch):
+    cache = main.LineCache("romaji_lines", max_entries=2)
+    cache.put_many({"a": "1", "b": "2"})
+    cache.get("a")
+    cache.put_many({"c": "3"})
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+
+def test_line_cache_persists_to_sqlite(tmp_path):
+    path = str(tmp_path / "romaji.sqlite3")
+    main.LineCache("romaji_lines", db_path=path).put_many({"強く": "tsuyoku"})
+    assert main.LineCache("romaji_lines", db_path=path).get("強く") == "tsuyoku"
+
+def test_batch_keeps_input_order_and_shapes(line_cache):
+    texts = [SONG, "僕を連れて進め", ""]
+    assert main.convert_batch_to_romaji(texts) == [main.convert_to_romaji(text) for text in texts]
+    split = main.convert_batch_to_romaji(texts, split_lines=True)
+    assert [len(lines) for lines in split] == [4, 1, 1]
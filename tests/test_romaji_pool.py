@@ -0,0 +1,35 @@
+import threading
+
+import main
+
+def test_shards_keep_order_and_balance():
+    keys = [f"line {i} " + "あ" * (i % 7) for i in range(100)]
+    shards = main.shard_by_length(keys, 8)
+    assert [key for shard in shards for key in shard] == keys
+    assert len(shards) <= 8
+
+def test_worker_pool_matches_in_process_conversion(line_cache, monkeypatch):
+    monkeypatch.setattr(main, "ROMAJI_POOL_MIN_LINES", 10)
+    lines = [f"{i} 強くなれる理由を知った" for i in range(40)]
+    assert main.romanize_lines(lines, workers=2) == [main.get_romaji_converter().do(line) for line in lines]
+
+def test_pool_restarts_do_not_break_batches_in_flight(monkeypatch, capsys):
+    monkeypatch.setattr(main, "ROMAJI_POOL_MIN_LINES", 10)
+    errors = []
+
+    def convert(workers, n):
+        try:
+            for i in range(3):
+                lines = [f"{workers}-{n}-{i}-{j} 強くなれる" for j in range(200)]
+                assert len(main._convert_missing(lines, workers)) == 200
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=convert, args=(2 + k % 2, k)) for k in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(120)
+    assert errors == []
+    assert "worker pool failed" not in capsys.readouterr().out
+    assert main._romaji_pool_users == {}
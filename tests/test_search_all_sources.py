@@ -0,0 +1,98 @@
+import threading
+import time
+
+import main
+
+def answer(name, seconds, found=True):
+    def func(title, cancel_event):
+        # Stops early when the search no longer needs this source
+        if cancel_event.wait(seconds):
+            return None
+        return {"kind": "lyrics", "text": f"1. {name}", "url": f"https://example.com/{name}/"} if found else None
+    return func
+
+def test_a_better_source_is_waited_for(fresh_state, make_source):
+    sources = [make_source("best", answer("best", 0.3), 0), make_source("quick", answer("quick", 0.05), 1)]
+    result = main.search_all_sources("gurenge", sources=sources, use_index=False)
+    assert result["source"] == "best"
+
+def test_a_lower_source_wins_once_better_ones_have_nothing(fresh_state, make_source):
+    sources = [make_source("empty", answer("empty", 0.1, found=False), 0), make_source("quick", answer("quick", 0.05), 1)]
+    result = main.search_all_sources("gurenge", sources=sources, use_index=False)
+    assert result["source"] == "quick"
+    assert set(result["timings"]) >= {"empty", "quick"}
+
+def test_the_winner_returns_without_waiting_for_worse_sources(fresh_state, make_source):
+    stopped = threading.Event()
+
+    def slow(title, cancel_event):
+        cancel_event.wait(5)
+        stopped.set()
+        return None
+
+    sources = [make_source("best", answer("best", 0.05), 0), make_source("slow", slow, 1)]
+    start = time.monotonic()
+    assert main.search_all_sources("gurenge", sources=sources, use_index=False)["source"] == "best"
+    assert time.monotonic() - start < 1
+    assert stopped.wait(1)  # The losing source was cancelled
+
+def test_a_source_past_its_deadline_is_passed_over(fresh_state, make_source):
+    statuses = []
+    sources = [make_source("stuck", answer("stuck", 5), 0, deadline=0.2), make_source("quick", answer("quick", 0.05), 1)]
+    result = main.search_all_sources("gurenge", sources=sources, use_index=False,
+                                     on_status=lambda source, status: statuses.append((source.name, status)))
+    assert result["source"] == "quick"
+    assert ("stuck", "timed out") in statuses
+
+def test_cancelling_the_search_returns_none_promptly(fresh_state, make_source):
+    token = main.CancelToken()
+    threading.Timer(0.2, token.set).start()
+    start = time.monotonic()
+    assert main.search_all_sources("gurenge", sources=[make_source("slow", answer("slow", 5), 0)], cancel_event=token, use_index=False) is None
+    assert time.monotonic() - start < 1
+
+def test_offline_mode_runs_only_offline_sources(fresh_state, make_source, monkeypatch):
+    online = make_source("online", answer("online", 0), 0)
+    online.offline = False
+    monkeypatch.setattr(main, "offline_mode", True)
+    assert main.search_all_sources("gurenge", sources=[online], use_index=False) is None
+
+def test_a_source_that_misses_its_deadline_is_recorded_once(fresh_state, make_source):
+    def slow(title, cancel_event):
+        time.sleep(0.4)
+        return None
+
+    def slower(title, cancel_event):
+        time.sleep(0.8)
+        return None
+
+    sources = [make_source("slow", slow, deadline=0.2), make_source("slower", slower, priority=1)]
+    assert main.search_all_sources("gurenge", sources=sources, use_index=False) is None
+    time.sleep(0.3)  # Long after "slow" has returned on its own
+    assert main.source_stats.get("slow")["attempts"] == 1
+    assert main.source_stats.get("slower")["attempts"] == 1
+
+def links(name, calls):
+    def func(title, cancel_event):
+        calls.append(name)
+        return {"kind": "links", "text": f"https://example.com/{name}/", "url": None}
+    return func
+
+def test_link_sources_wait_for_the_lyrics_sources(fresh_state, make_source):
+    calls = []
+    sources = [make_source("lyrics", answer("lyrics", 0.2)), make_source("links", links("links", calls), priority=1, kind="links")]
+    assert main.search_all_sources("gurenge", sources=sources, use_index=False)["source"] == "lyrics"
+    assert calls == []
+
+def test_every_link_source_that_answers_is_listed(fresh_state, make_source):
+    calls = []
+    sources = [
+        make_source("lyrics", answer("lyrics", 0.05, found=False)),
+        make_source("first", links("first", calls), priority=1, kind="links"),
+        make_source("empty", lambda title, cancel_event: None, priority=2, kind="links"),
+        make_source("second", links("second", calls), priority=3, kind="links"),
+    ]
+    result = main.search_all_sources("gurenge", sources=sources, use_index=False)
+    assert result["kind"] == "links"
+    assert sorted(calls) == ["first", "second"]
+    assert result["text"].index("https://example.com/first/") < result["text"].index("https://example.com/second/")
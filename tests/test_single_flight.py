@@ -0,0 +1,173 @@
+import threading
+import time
+
+import pytest
+
+import main
+
+def run_concurrently(count, target):
+    results = [None] * count
+    errors = [None] * count
+
+    def call(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    return results, errors
+
+def test_concurrent_calls_for_one_key_run_once():
+    flight = main.SingleFlight("test")
+    calls = []
+
+    def work():
+        calls.append(1)
+        time.sleep(0.3)
+        return {"lyrics": "1. la"}
+
+    results, errors = run_concurrently(10, lambda: flight.do("key", work))
+    assert len(calls) == 1
+    assert errors == [None] * 10
+    assert all(result is results[0] for result in results)
+    assert flight.in_flight() == 0
+
+def test_different_keys_do_not_wait_for_each_other():
+    flight = main.SingleFlight("test")
+    calls = []
+
+    def work(key):
+        calls.append(key)
+        time.sleep(0.2)
+        return key
+
+    start = time.monotonic()
+    results, _ = run_concurrently(4, lambda: flight.do(threading.current_thread().name, lambda: work(threading.current_thread().name)))
+    assert len(calls) == 4
+    assert time.monotonic() - start < 0.6
+
+def test_followers_get_the_leaders_exception():
+    flight = main.SingleFlight("test")
+
+    def fail():
+        time.sleep(0.2)
+        raise ValueError("page gone")
+
+    _, errors = run_concurrently(5, lambda: flight.do("key", fail))
+    assert all(isinstance(error, ValueError) for error in errors)
+
+def test_a_finished_call_is_not_cached():
+    flight = main.SingleFlight("test")
+    calls = []
+    flight.do("key", lambda: calls.append(1))
+    flight.do("key", lambda: calls.append(1))
+    assert len(calls) == 2
+
+def test_followers_rerun_when_the_leader_was_cancelled():
+    flight = main.SingleFlight("test")
+    leader_token = main.CancelToken()
+    started = threading.Event()
+    calls = []
+
+    def leader_work():
+        calls.append("leader")
+        started.set()
+        leader_token.wait(2)
+        return None  # Cut short by the cancellation
+
+    def follower_work():
+        calls.append("follower")
+        return "lyrics"
+
+    leader = threading.Thread(target=lambda: flight.do("key", leader_work, leader_token))
+    leader.start()
+    started.wait(1)
+    follower_result = []
+    follower = threading.Thread(target=lambda: follower_result.append(flight.do("key", follower_work)))
+    follower.start()
+    time.sleep(0.1)
+    leader_token.set()
+    leader.join(2)
+    follower.join(2)
+    assert calls == ["leader", "follower"]
+    assert follower_result == ["lyrics"]
+
+def test_a_cancelled_follower_stops_waiting():
+    flight = main.SingleFlight("test")
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "done"
+
+    leader = threading.Thread(target=lambda: flight.do("key", slow))
+    leader.start()
+    started.wait(1)
+    token = main.CancelToken()
+    threading.Timer(0.1, token.set).start()
+    start = time.monotonic()
+    with pytest.raises(main.SearchCancelled):
+        flight.do("key", lambda: "unused", token)
+    assert time.monotonic() - start < 0.6
+    release.set()
+    leader.join(2)
+
+def test_async_calls_for_one_key_share_one_task():
+    flight = main.AsyncSingleFlight("test")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await main.asyncio.sleep(0.1)
+        return "lyrics"
+
+    async def run():
+        return await main.asyncio.gather(*(flight.do("key", work) for _ in range(10)))
+
+    assert main.asyncio.run(run()) == ["lyrics"] * 10
+    assert calls == [1]
+    assert flight.in_flight() == 0
+
+def test_async_cancelled_caller_does_not_cancel_the_shared_task():
+    flight = main.AsyncSingleFlight("test")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await main.asyncio.sleep(0.2)
+        return "lyrics"
+
+    async def run():
+        impatient = main.asyncio.ensure_future(flight.do("key", work))
+        patient = main.asyncio.ensure_future(flight.do("key", work))
+        await main.asyncio.sleep(0.05)
+        impatient.cancel()
+        return await patient, impatient.cancelled()
+
+    assert main.asyncio.run(run()) == ("lyrics", True)
+    assert calls == [1]
+
+def test_async_waiters_rerun_a_cancelled_shared_task():
+    flight = main.AsyncSingleFlight("test")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await main.asyncio.sleep(0.2 if len(calls) == 1 else 0)
+        return "lyrics"
+
+    async def run():
+        waiter = main.asyncio.ensure_future(flight.do("key", work))
+        await main.asyncio.sleep(0.05)
+        next(iter(flight._tasks.values())).cancel()
+        return await waiter
+
+    assert main.asyncio.run(run()) == "lyrics"
+    assert calls == [1, 1]
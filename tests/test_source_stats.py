@@ -0,0 +1,118 @@
+import time
+
+import pytest
+
+import main
+
+ENTRY = {"group": "test", "name": "test:example.com", "query": 'site:example.com "{title}"', "match": ("example.com",)}
+
+def miss(stats, name, times):
+    for _ in range(times):
+        stats.record(name, False, 1.0)
+
+def test_new_sources_start_from_the_prior():
+    stats = main.SourceStats()
+    prior_rate = main.SOURCE_PRIOR_HITS / main.SOURCE_PRIOR_ATTEMPTS
+    assert stats.expected_seconds("new") == pytest.approx(main.SOURCE_DEFAULT_LATENCY / prior_rate)
+    assert stats.get("new") is None
+
+def test_latency_is_a_moving_average():
+    stats = main.SourceStats()
+    stats.record("source", True, 1.0)
+    stats.record("source", True, 2.0)
+    entry = stats.get("source")
+    assert entry["attempts"] == 2 and entry["hits"] == 2
+    assert entry["latency"] == pytest.approx(1.0 + main.SOURCE_LATENCY_EWMA_ALPHA * 1.0)
+
+def test_pruned_only_after_enough_completed_misses():
+    stats = main.SourceStats()
+    miss(stats, "dead", main.SOURCE_PRUNE_AFTER - 1)
+    assert not stats.pruned("dead")
+    miss(stats, "dead", 1)
+    assert stats.pruned("dead")
+
+def test_a_single_hit_keeps_a_source_from_being_pruned():
+    stats = main.SourceStats()
+    stats.record("rare", True, 1.0)
+    miss(stats, "rare", main.SOURCE_PRUNE_AFTER * 2)
+    assert not stats.pruned("rare")
+
+def test_plan_skips_pruned_items_except_when_exploring(monkeypatch):
+    stats = main.SourceStats()
+    miss(stats, "dead", main.SOURCE_PRUNE_AFTER)
+    items = [{"name": "dead"}, {"name": "new"}]
+    monkeypatch.setattr(main.random, "random", lambda: 1.0)
+    assert stats.plan(items) == [{"name": "new"}]
+    monkeypatch.setattr(main.random, "random", lambda: 0.0)
+    assert {item["name"] for item in stats.plan(items)} == {"dead", "new"}
+    monkeypatch.setattr(main.random, "random", lambda: 1.0)
+    assert [item["name"] for item in stats.plan(items, prune=False)] == ["new", "dead"]
+
+def test_plan_puts_the_fastest_expected_hit_first():
+    stats = main.SourceStats()
+    for _ in range(5):
+        stats.record("slow", True, 3.0)
+        stats.record("fast", True, 0.5)
+        stats.record("fast_but_rare", False, 0.5)
+    names = [item["name"] for item in stats.plan([{"name": "slow"}, {"name": "fast_but_rare"}, {"name": "fast"}])]
+    assert names[0] == "fast"
+
+def test_stats_persist_across_instances(tmp_path):
+    path = str(tmp_path / "source_stats.sqlite3")
+    stats = main.SourceStats(db_path=path)
+    stats.record("source", True, 1.5)
+    stats.record("source", False, 1.5)
+    reloaded = main.SourceStats(db_path=path).get("source")
+    assert reloaded["attempts"] == 2 and reloaded["hits"] == 1
+
+def test_completed_site_queries_are_recorded(fresh_state, monkeypatch):
+    monkeypatch.setattr(main, "search", lambda query, num_results=10: iter(["https://example.com/song", "https://other.com/x"]))
+    assert main.run_site_query(ENTRY, "gurenge", 3) == ["https://example.com/song"]
+    monkeypatch.setattr(main, "search", lambda query, num_results=10: iter(["https://other.com/x"]))
+    assert main.run_site_query(ENTRY, "gurenge", 3) == []
+    entry = main.source_stats.get(ENTRY["name"])
+    assert entry["attempts"] == 2 and entry["hits"] == 1
+
+def test_failed_site_queries_are_not_misses(fresh_state, monkeypatch):
+    def offline(query, num_results=10):
+        raise OSError("429 Too Many Requests")
+
+    monkeypatch.setattr(main, "search", offline)
+    for _ in range(main.SOURCE_PRUNE_AFTER + 5):
+        assert main.run_site_query(ENTRY, "gurenge", 3) == []
+    assert main.source_stats.get(ENTRY["name"]) is None
+    assert not main.source_stats.pruned(ENTRY["name"])
+
+def test_rate_limited_and_cancelled_site_queries_are_not_recorded(fresh_state, monkeypatch):
+    monkeypatch.setattr(main, "search", lambda query, num_results=10: iter([]))
+    exhausted = main.RateLimiter(1, 60, name="exhausted")
+    exhausted.acquire()
+    monkeypatch.setattr(main, "search_limiter", exhausted)
+    monkeypatch.setattr(main, "SEARCH_QUEUE_TIMEOUT", 0.1)
+    with pytest.raises(main.RateLimitExceeded):
+        main.rate_limited_search("query", 3)
+    assert main.run_site_query(ENTRY, "gurenge", 3) == []
+    monkeypatch.setattr(main, "search_limiter", main.RateLimiter(10 ** 9, 1))
+    token = main.CancelToken()
+    token.set()
+    assert main.run_site_query(ENTRY, "gurenge", 3, cancel_event=token) == []
+    assert main.source_stats.get(ENTRY["name"]) is None
+
+def test_plan_sources_keeps_lyrics_ahead_of_links_and_prunes_nothing(fresh_state, make_source):
+    links = make_source("links", None, kind="links", priority=0)
+    lyrics = make_source("lyrics", None, priority=1)
+    miss(main.source_stats, "lyrics", main.SOURCE_PRUNE_AFTER * 2)
+    assert [source.name for source in main.plan_sources([links, lyrics])] == ["lyrics", "links"]
+
+def test_failing_sources_are_not_recorded(fresh_state, make_source):
+    def broken(title, cancel_event):
+        raise OSError("no connection")
+
+    def found(title, cancel_event):
+        time.sleep(0.1)
+        return {"kind": "lyrics", "text": "1. la", "url": "https://example.com/song/"}
+
+    result = main.search_all_sources("gurenge", sources=[make_source("broken", broken), make_source("found", found, priority=1)], use_index=False)
+    assert result["source"] == "found"
+    assert main.source_stats.get("broken") is None
+    assert main.source_stats.get("found")["hits"] == 1
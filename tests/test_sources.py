@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+import main
+
+class PageSource(main.LyricsSource):
+    """Fetches a page and extracts the lyrics from it"""
+    name = "page"
+    label = "Test page"
+    offline = True
+
+    def __init__(self, html, **settings):
+        super().__init__(**settings)
+        self.html = html
+        self.fetched = []
+
+    def fetch(self, song_title, cancel_event=None):
+        self.fetched.append(song_title)
+        return self.html
+
+    def extract(self, raw):
+        lyrics = main.extract_lyrics_from_html(raw)
+        return {"kind": "lyrics", "text": lyrics, "url": None} if lyrics else None
+
+PAGE = "<html><body><div class=\"lyrics\"><p>1.</p><p>強くなれる理由を知った</p></div></body></html>"
+
+def test_the_scheduler_extracts_what_fetch_returned(fresh_state):
+    source = PageSource(PAGE)
+    result = main.search_all_sources("gurenge", sources=[source], use_index=False)
+    assert source.fetched == ["gurenge"]
+    assert result["text"] == "1. 強くなれる理由を知った" and result["source"] == "page"
+
+def test_nothing_extracted_is_a_miss(fresh_state):
+    source = PageSource("<html><body>Not found</body></html>")
+    assert main.search_all_sources("gurenge", sources=[source], use_index=False) is None
+    assert main.source_stats.get("page")["hits"] == 0
+
+def test_the_async_scheduler_uses_the_same_adapter(fresh_state):
+    pytest.importorskip("aiohttp")
+
+    async def run():
+        async with main.create_async_http_session() as session:
+            return await main.async_search_all_sources("gurenge", session=session, sources=[PageSource(PAGE)], use_index=False)
+
+    assert asyncio.run(run())["text"] == "1. 強くなれる理由を知った"
+
+def test_register_source_appends_after_the_existing_sources(monkeypatch):
+    monkeypatch.setattr(main, "LYRICS_SOURCES", list(main.LYRICS_SOURCES))
+    source = main.register_source(PageSource(PAGE))
+    assert main.LYRICS_SOURCES[-1] is source
+    assert source.priority == max(existing.priority for existing in main.LYRICS_SOURCES[:-1]) + 1
+
+def test_unknown_settings_are_rejected():
+    with pytest.raises(TypeError):
+        main.FunctionSource(lambda title, cancel_event: None, name="x", dedline=5)
+
+def test_built_in_sources(monkeypatch):
+    assert len({source.name for source in main.LYRICS_SOURCES}) == len(main.LYRICS_SOURCES)
+    assert all(isinstance(source, main.LyricsSource) and source.label for source in main.LYRICS_SOURCES)
+    source = main.LyricalNonsenseSource()
+    url = "https://www.lyrical-nonsense.com/gurenge/"
+    monkeypatch.setattr(main, "find_lyrics_urls", lambda title, cancel_event=None: {"lyrical_nonsense": url})
+    monkeypatch.setattr(main, "get_lyrics_from_lyrical_nonsense", lambda url, cancel_event=None, on_line=None: "1. la")
+    assert source.extract(source.fetch("gurenge")) == {"kind": "lyrics", "text": "1. la", "url": url}
+    links = main.LinkSource(lambda title, cancel_event: "Try https://example.com/", name="links", label="Links")
+    assert links.extract(links.fetch("gurenge"))["kind"] == "links"
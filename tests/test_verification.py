@@ -0,0 +1,122 @@
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import main
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+from mock_openai_server import MockOpenAIHandler, start_server
+
+CHORUS = ["強くなれる理由を知った", "僕を連れて進め"]
+SONG_A = CHORUS + ["泥だらけの走馬灯に酔う"] + CHORUS
+SONG_B = ["こわばる心"] + CHORUS
+
+@pytest.fixture
+def mock_api(monkeypatch):
+    server = start_server()
+    MockOpenAIHandler.request_count = 0
+    monkeypatch.setattr(main, "OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setattr(main, "verification_cache", main.LineCache("chatgpt_verdicts"))
+    monkeypatch.setattr(main, "openai_limiter", main.RateLimiter(main.MAX_API_CALLS_PER_HOUR, 3600, name="test OpenAI API"))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def song(lines):
+    japanese = "\n".join(lines)
+    return japanese, main.convert_to_romaji(japanese)
+
+def test_songs_share_requests_and_repeated_lines_are_checked_once(mock_api):
+    results = main.verify_songs_with_chatgpt([song(SONG_A), song(SONG_B)], "test-key")
+    assert MockOpenAIHandler.request_count == 1
+    assert [len(verdicts) for verdicts in results] == [len(SONG_A), len(SONG_B)]
+    assert all(verdict["score"] == 10 for verdicts in results for verdict in verdicts)
+    assert [verdict["japanese"] for verdict in results[1]] == SONG_B
+
+def test_verified_lines_come_from_the_cache(mock_api):
+    main.verify_songs_with_chatgpt([song(SONG_A)], "test-key")
+    assert MockOpenAIHandler.request_count == 1
+    results = main.verify_songs_with_chatgpt([song(SONG_B)], "test-key")
+    # Only "こわばる心" is new
+    assert MockOpenAIHandler.request_count == 2
+    assert len(results[0]) == len(SONG_B)
+    main.verify_songs_with_chatgpt([song(SONG_A), song(SONG_B)], "test-key")
+    assert MockOpenAIHandler.request_count == 2
+
+def test_lines_are_split_to_fit_the_token_budget(mock_api):
+    lines = [f"{i} {line}" for i in range(40) for line in CHORUS]
+    budget = main.estimate_tokens(main.VERIFY_INSTRUCTIONS) + 200
+    results = main.verify_songs_with_chatgpt([song(lines)], "test-key", token_budget=budget)
+    assert MockOpenAIHandler.request_count > 1
+    assert len(results[0]) == len(lines)
+    assert all("error" not in verdict for verdict in results[0])
+
+def test_report_keeps_the_old_layout(mock_api):
+    japanese, romaji = song(SONG_A)
+    report = main.verify_romaji_with_chatgpt(japanese, romaji, "test-key")
+    assert report.startswith("Accuracy: 10.0/10")
+    assert "Corrections: None if accurate" in report
+
+def test_failed_requests_are_reported_and_not_cached(monkeypatch):
+    monkeypatch.setattr(main, "OPENAI_BASE_URL", "http://127.0.0.1:9/v1")
+    monkeypatch.setattr(main, "HTTP_RETRIES", 0)
+    monkeypatch.setattr(main, "verification_cache", main.LineCache("chatgpt_verdicts"))
+    monkeypatch.setattr(main, "openai_limiter", main.RateLimiter(main.MAX_API_CALLS_PER_HOUR, 3600, name="test OpenAI API"))
+    results = main.verify_songs_with_chatgpt([song(CHORUS)], "test-key")
+    assert all("error" in verdict for verdict in results[0])
+    assert main.verification_cache.get(main.verdict_key(CHORUS[0], results[0][0]["romaji"])) is None
+
+class FlakyHandler(MockOpenAIHandler):
+    """Answers 503 to the first `failures` requests, then answers like the mock API"""
+    failures = 0
+    headers_seen = []
+
+    def do_POST(self):
+        FlakyHandler.headers_seen.append(dict(self.headers))
+        if FlakyHandler.failures:
+            FlakyHandler.failures -= 1
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        super().do_POST()
+
+@pytest.fixture
+def flaky_api(monkeypatch):
+    FlakyHandler.failures = 0
+    FlakyHandler.headers_seen = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(main, "OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setattr(main, "verification_cache", main.LineCache("chatgpt_verdicts"))
+    monkeypatch.setattr(main, "openai_limiter", main.RateLimiter(main.MAX_API_CALLS_PER_HOUR, 3600, name="test OpenAI API"))
+    monkeypatch.setattr(main, "_backoff_delay", lambda attempt, retry_after=None: 0)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_every_retry_takes_a_rate_limiter_slot(flaky_api):
+    FlakyHandler.failures = 2
+    results = main.verify_songs_with_chatgpt([song(CHORUS)], "test-key")
+    assert all(verdict["score"] == 10 for verdict in results[0])
+    assert main.openai_limiter.used() == 3
+
+def test_retries_stop_when_the_quota_is_spent(flaky_api, monkeypatch):
+    FlakyHandler.failures = 5
+    monkeypatch.setattr(main, "openai_limiter", main.RateLimiter(2, 3600, name="test OpenAI API"))
+    monkeypatch.setattr(main, "API_QUEUE_TIMEOUT", 0.1)
+    results = main.verify_songs_with_chatgpt([song(CHORUS)], "test-key")
+    assert all(verdict["error"] == "API rate limit reached" for verdict in results[0])
+    assert len(FlakyHandler.headers_seen) == 2
+
+def test_only_the_api_headers_are_sent(flaky_api):
+    main.verify_songs_with_chatgpt([song(CHORUS)], "test-key")
+    headers = {name.lower(): value for name, value in FlakyHandler.headers_seen[0].items()}
+    assert headers["authorization"] == "Bearer test-key"
+    assert headers["content-type"] == "application/json"
+    assert headers.get("user-agent") != main.BROWSER_HEADERS["User-Agent"]
+    assert "accept-language" not in headers and "upgrade-insecure-requests" not in headers